@@ -0,0 +1,139 @@
+# Reading and normalizing banner dump records
+# Nothing here touches django so it can run in worker processes (see create_terms_parallel)
+import hashlib
+import json
+from datetime import datetime
+from typing import Iterator
+
+READ_CHUNK_SIZE = 64 * 1024
+
+DAY_KEYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+SECTION_KEYS = [
+    'term', 'courseNumber', 'subject', 'subjectDescription', 'courseTitle', 'creditHourLow',
+    'courseReferenceNumber', 'faculty', 'sequenceNumber', 'campusDescription', 'maximumEnrollment',
+]
+MEETING_KEYS = DAY_KEYS + [
+    'startDate', 'endDate', 'beginTime', 'endTime', 'building', 'buildingDescription', 'room',
+    'meetingType', 'meetingTypeDescription',
+]
+# in the order they were parsed when adding a meeting
+MEETING_FORMATS = [
+    ('startDate', "%m/%d/%Y"),
+    ('endDate', "%m/%d/%Y"),
+    ('beginTime', "%H%M"),
+    ('endTime', "%H%M"),
+]
+
+
+def read_records(path: str) -> Iterator[dict]:
+    """Yields the records of a json array one at a time so the whole dump is never in memory"""
+    decoder = json.JSONDecoder()
+    with open(path, 'r') as file:
+        buffer = ''
+        position = 0
+        is_eof = False
+        in_array = False
+        while True:
+            # skip to the start of the next record
+            while position < len(buffer) and (buffer[position].isspace() or buffer[position] in ',['):
+                in_array = in_array or buffer[position] == '['
+                position += 1
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            if position < len(buffer) and not in_array:
+                raise ValueError(f"{path} is not a json array")
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+                # a record at the very end of the buffer could still be cut off
+                if end == len(buffer) and not is_eof:
+                    raise json.JSONDecodeError("record might continue", buffer, end)
+            except json.JSONDecodeError:
+                if is_eof:
+                    if buffer[position:].strip():
+                        raise
+                    raise ValueError(f"{path} ends before its json array does")
+                chunk = file.read(READ_CHUNK_SIZE)
+                is_eof = chunk == ''
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield record
+            position = end
+
+
+def normalize_meeting_time(meeting: dict) -> dict:
+    normalized = {key: meeting[key] for key in MEETING_KEYS if key in meeting}
+    if not any(meeting.get(day_key) for day_key in DAY_KEYS):
+        return normalized
+    for key, date_format in MEETING_FORMATS:
+        # a missing key is a KeyError when the meeting gets added, so anything after it
+        #   is never parsed
+        if key not in meeting:
+            break
+        parsed = datetime.strptime(meeting[key], date_format)
+        normalized[key] = parsed if date_format == "%m/%d/%Y" else parsed.time()
+    return normalized
+
+
+def normalize_section(section: dict) -> dict:
+    """
+    Only keeps what the importer uses and parses the dates and times
+    (missing keys are left missing so they fail the same way when added)
+    """
+    normalized = {key: section[key] for key in SECTION_KEYS if key in section}
+    if 'meetingsFaculty' in section:
+        normalized['meetingsFaculty'] = [
+            {'meetingTime': normalize_meeting_time(meeting['meetingTime'])} if 'meetingTime' in meeting else {}
+            for meeting in section['meetingsFaculty']
+        ]
+    return normalized
+
+
+def hash_section(section: dict) -> str:
+    """Hash of a normalized section record, used to skip records that did not change"""
+    dumped = json.dumps(section, sort_keys=True, default=str)
+    return hashlib.sha1(dumped.encode()).hexdigest()
+
+
+def read_term(path: str, batches, batch_size: int) -> None:
+    """
+    Puts the normalized sections of the file on the (bounded) queue in batches so a worker
+    never holds more than a batch of a dump. Ends with None or the exception of the read
+    """
+    try:
+        batch = []
+        for section in read_records(path):
+            batch.append(normalize_section(section))
+            if len(batch) == batch_size:
+                batches.put(batch)
+                batch = []
+        if batch:
+            batches.put(batch)
+    except Exception as err:
+        batches.put(err)
+        return
+    batches.put(None)
+
+
+class QueuedSections:
+    """The sections that read_term puts on the queue"""
+
+    def __init__(self, batches) -> None:
+        self.batches = batches
+        self.is_done = False
+
+    def __iter__(self) -> Iterator[dict]:
+        while not self.is_done:
+            batch = self.batches.get()
+            self.is_done = batch is None or isinstance(batch, Exception)
+            if isinstance(batch, Exception):
+                raise batch
+            if batch is not None:
+                yield from batch
+
+    def drain(self):
+        """Reads what is left so the worker is not stuck on a full queue"""
+        while not self.is_done:
+            batch = self.batches.get()
+            self.is_done = batch is None or isinstance(batch, Exception)
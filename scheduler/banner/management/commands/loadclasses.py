@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand, CommandError, CommandParser
-from banner.management.create_classes import create_terms
+from banner.management.create_classes import create_terms, create_terms_parallel
 from django.db import transaction
 from django.conf import settings
 import os
@@ -9,9 +9,19 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser: CommandParser) -> None:
         parser.add_argument("years", nargs="+", type=str, help="The years used for the Year (XXXX) or 'all'")
+        parser.add_argument("--parallel", action="store_true", help="Read the term files in a process pool and commit each term on its own")
+        parser.add_argument("--sync", action="store_true", help="Also update the sections (and their meetings) whose banner record changed")
+        parser.add_argument("--workers", type=int, default=None, help="Number of processes used with --parallel (defaults to the number of cores)")
+
+    def import_terms(self, section_paths, options) -> None:
+        if not options["parallel"]:
+            with transaction.atomic():
+                create_terms(section_paths=section_paths, report=self.stdout.write, sync=options["sync"])
+            return
+        failed = create_terms_parallel(section_paths=section_paths, workers=options["workers"], report=self.stdout.write, sync=options["sync"])
+        if len(failed) != 0:
+            raise CommandError(f"{', '.join(failed)} could not be imported, the other terms were added")
 
-    
-    @transaction.atomic
     def handle(self, *_, **options) -> None:
         BANNER_DUMP_PATH = os.path.join(settings.BASE_DIR, 'banner', 'data', 'classes')
         
@@ -27,7 +37,7 @@ class Command(BaseCommand):
         
         if any(map(lambda term: term.upper() == 'ALL', options["years"])):
             section_paths = map(lambda f: os.path.join(BANNER_DUMP_PATH, f), sections)
-            create_terms(section_paths=section_paths)
+            self.import_terms(section_paths, options)
         else:
             invalid_years = []
             for year in options["years"]:
@@ -39,6 +49,6 @@ class Command(BaseCommand):
                 if any(year in section for year in options["years"]):
                     selected_sections.append(section) 
             section_paths = map(lambda f: os.path.join(BANNER_DUMP_PATH, f), selected_sections)
-            create_terms(section_paths=section_paths) 
+            self.import_terms(section_paths, options)
         
         self.stdout.write(self.style.SUCCESS('Successfully added class information to the database'))
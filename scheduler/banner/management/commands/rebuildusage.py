@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+from claim.models import AllocationUsage, Term
+
+class Command(BaseCommand):
+    help = "Recounts the department allocation usage of every term (or only checks it with --check)"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--term", type=int, default=None, help="Only this term (pk) instead of every term")
+        parser.add_argument("--check", action="store_true", help="Only report the usages that are out of date")
+
+    def handle(self, *_, **options) -> None:
+        term = options["term"]
+        if term is not None and not Term.objects.filter(pk=term).exists():
+            raise CommandError(f"There is no term with the pk {term}")
+
+        if options["check"]:
+            stale = AllocationUsage.get_stale(term)
+            for (term_pk, department, group), (stored, counted) in sorted(stale.items()):
+                self.stdout.write(f"term={term_pk}, department={department}, allocation group={group}: stored {stored} but counted {counted}")
+            if len(stale) != 0:
+                raise CommandError(f"{len(stale)} allocation usage(s) are out of date, run rebuildusage to fix them")
+            self.stdout.write(self.style.SUCCESS('Every allocation usage is up to date'))
+            return
+
+        with transaction.atomic():
+            count = AllocationUsage.rebuild(term)
+        self.stdout.write(self.style.SUCCESS(f'Successfully recounted {count} allocation usage(s)'))
@@ -1,8 +1,21 @@
-import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+from contextlib import contextmanager
+from itertools import zip_longest
+from datetime import time
+from time import perf_counter
+from typing import Callable, Iterable, TypeVar
+
 from django.conf import settings
+from django.db import models, transaction
 import claim.models as MaristDB
 from authentication.models import Professor as MaristDB_Professor
-from datetime import datetime
+from claim.course_search import CourseSearch
+from claim.signals import muted
+from claim.occupancy import TermOccupancy
+from claim.timetable import Timetable
+from .banner_records import QueuedSections, hash_section, normalize_section, read_records, read_term
 import os
 
 TERM_CODE_TO_SEASON = {
@@ -20,176 +33,578 @@ DAY_KEYS_TO_DB_CODE = {
     'sunday': MaristDB.Day.SUNDAY,
 }
 
+# The models in the order they have to be created in
+WRITE_ORDER: list[type[models.Model]] = [
+    MaristDB.Subject,
+    MaristDB.Course,
+    MaristDB.Term,
+    MaristDB_Professor,
+    MaristDB.StartEndTime,
+    MaristDB.TimeBlock,
+    MaristDB.Building,
+    MaristDB.Room,
+    MaristDB.Section,
+    MaristDB.Meeting,
+]
 
-def add_course(course: dict):
-    try:
-        department = MaristDB.Department.objects.get(code=course.get('departmentCode'))
-    except MaristDB.Department.DoesNotExist:
-        department = MaristDB.Department.objects.get(code="OT")
+PROGRESS_INTERVAL = 500
+# the planned rows are written every this many records so memory does not grow with a dump
+FLUSH_INTERVAL = 1000
+# sections a reading worker can be ahead of the import of its term
+READ_BATCH_SIZE = 200
+READ_QUEUE_BATCHES = 4
 
-    subject, _ = MaristDB.Subject.objects.get_or_create(
-        code=course['subjectCode'],
-        department=department,
-        defaults= {
-            'description': course.get('subjectDescription'),
-        }
-    )
-
-    MaristDB.Course.objects.get_or_create(
-        code=course['courseNumber'],
-        subject=subject,
-        defaults={
-            'banner_id': course['id'],
-            'credits': course['creditHourLow'],
-            'title': course['courseTitle'],
-            'description': course.get('course_details'),
-            'prerequisite': course.get('pre_reqs_desc'),
-            'corequisite': course.get('co_reqs_desc'),
-        }
-    )
-
-
-def add_section(section: dict):
-    course_number = section['courseNumber']
-    subject_code = section['subject']
-    subject_description = section.get('subjectDescription')
-
-    subject = MaristDB.Subject.objects.filter(code=subject_code).first()
-    if subject is None:
-        subject = MaristDB.Subject(
-                code=subject_code,
-                description=subject_description,
-                department=MaristDB.Department.objects.get(code="OT"))
-        subject.save()
-
-    course, _ = MaristDB.Course.objects.get_or_create(
-        code=course_number,
-        subject=subject,
-        defaults={
-            'title': section['courseTitle'],
-            'credits': section['creditHourLow'],
-            'banner_id': section["courseReferenceNumber"],
+# what a sync compares (and updates) of the existing rows
+SYNC_SECTION_FIELDS = ["soft_cap", "banner_course", "primary_professor"]
+SYNC_MEETING_FIELDS = [
+    "start_date",
+    "end_date",
+    "style_code",
+    "style_description",
+    "time_block",
+    "professor",
+    "room_classification",
+    "room_is_general_purpose",
+]
+
+# natural keys (what the old get_or_create calls looked up by)
+SubjectKey = tuple[str, int]
+CourseKey = tuple[str, SubjectKey]
+TermKey = tuple[int, str]
+ProfessorKey = tuple[str, str, str | None]
+SectionKey = tuple[str, str, TermKey, CourseKey]
+TimeKey = tuple[time, time]
+TimeBlockKey = tuple[str, TimeKey]
+BuildingKey = tuple[str, str]
+RoomKey = tuple[BuildingKey, str]
+
+K = TypeVar("K")
+M = TypeVar("M", bound=models.Model)
+
+
+class ClassImporter:
+    """
+    Imports the banner dumps in stages instead of a get_or_create per row:
+    every existing natural key is loaded once, the rows are planned in memory
+    (with the same rules as adding them one by one) and every FLUSH_INTERVAL
+    records each model is bulk created in dependency order
+    """
+
+    def __init__(self, report: Callable[[str], None] | None = None, sync: bool = False):
+        self.report = report or (lambda _: None)
+        # whether existing sections whose record changed get updated
+        self.sync = sync
+        self.summary: Counter[str] = Counter()
+        self.new: dict[type[models.Model], list[models.Model]] = {
+            model: [] for model in WRITE_ORDER
         }
-        )
+        # time block -> allocation groups to add after the time blocks exist
+        self.new_allocation_groups: list[tuple[MaristDB.TimeBlock, int]] = []
+
+        self.departments: dict[str, int] = {}
+        self.subjects: dict[SubjectKey, MaristDB.Subject] = {}
+        self.subjects_by_code: dict[str, MaristDB.Subject] = {}
+        self.courses: dict[CourseKey, MaristDB.Course] = {}
+        self.terms: dict[TermKey, MaristDB.Term] = {}
+        self.professors: dict[ProfessorKey, MaristDB_Professor] = {}
+        self.sections: dict[SectionKey, MaristDB.Section | None] = {}
+        # sections that were already imported -> (pk, banner hash)
+        self.existing_sections: dict[SectionKey, tuple[int, str | None]] = {}
+        # existing sections with a changed record -> the meetings they should have now
+        self.changed_sections: list[tuple[MaristDB.Section, list[MaristDB.Meeting]]] = []
+        self.start_end_times: dict[TimeKey, MaristDB.StartEndTime] = {}
+        self.time_blocks: dict[TimeBlockKey, MaristDB.TimeBlock] = {}
+        self.buildings: dict[BuildingKey, MaristDB.Building] = {}
+        self.rooms: dict[RoomKey, MaristDB.Room] = {}
+        # (day, start, end, first allocation group) of the official time blocks
+        self.official_time_blocks: list[tuple[str, time, time, int | None]] = []
+
+        # what was written by the flushes so far (see refresh_terms)
+        self.written_terms: set[int] = set()
+        self.has_new_time_blocks = False
+        self.planned = 0
+
+    @contextmanager
+    def stage(self, name: str):
+        start = perf_counter()
+        yield
+        self.report(f"{name} took {perf_counter() - start:.2f}s")
+
+    def get_or_add(self, rows: dict[K, M], key: K, create: Callable[[], M]) -> tuple[M, bool]:
+        row = rows.get(key)
+        if row is not None:
+            return row, False
+        row = create()
+        rows[key] = row
+        self.new[type(row)].append(row)
+        return row, True
+
+    def preload(self):
+        for pk, code in MaristDB.Department.objects.order_by("-pk").values_list("pk", "code"):
+            self.departments[code] = pk
+
+        subject_keys: dict[int, SubjectKey] = {}
+        for subject in MaristDB.Subject.objects.order_by("pk"):
+            key = (subject.code, subject.department_id)  # pyright: ignore
+            subject_keys[subject.pk] = key
+            self.subjects.setdefault(key, subject)
+            self.subjects_by_code.setdefault(subject.code, subject)
+
+        course_keys: dict[int, CourseKey] = {}
+        for course in MaristDB.Course.objects.order_by("pk"):
+            key = (course.code, subject_keys[course.subject_id])  # pyright: ignore
+            course_keys[course.pk] = key
+            self.courses.setdefault(key, course)
+
+        term_keys: dict[int, TermKey] = {}
+        for term in MaristDB.Term.objects.order_by("pk"):
+            term_keys[term.pk] = (term.year, term.season)
+            self.terms.setdefault((term.year, term.season), term)
 
-    term_year = int(section['term'][:4])
-    term_season = TERM_CODE_TO_SEASON[section['term'][-2:]]
-    term, _ = MaristDB.Term.objects.get_or_create(
-        year=term_year,
-        season=term_season
-    )
-
-    primary_professor = None
-    secondary_professor = None
-    for prof in section['faculty']:
-        last_name, first_name = prof['displayName'].split(', ')
-        professor, _ = MaristDB_Professor.objects.get_or_create(
-            first_name=first_name,
-            last_name=last_name,
-            email=prof.get('emailAddress')
+        for professor in MaristDB_Professor.objects.order_by("pk"):
+            key = (professor.first_name, professor.last_name, professor.email)
+            self.professors.setdefault(key, professor)
+
+        sections = MaristDB.Section.objects.values_list("pk", "number", "campus", "term", "course", "banner_hash")
+        for pk, number, campus, term_pk, course_pk, banner_hash in sections:
+            key = (number, campus, term_keys[term_pk], course_keys[course_pk])
+            self.sections[key] = None
+            self.existing_sections.setdefault(key, (pk, banner_hash))
+
+        time_keys: dict[int, TimeKey] = {}
+        for start_end_time in MaristDB.StartEndTime.objects.order_by("pk"):
+            key = (start_end_time.start, start_end_time.end)
+            time_keys[start_end_time.pk] = key
+            self.start_end_times.setdefault(key, start_end_time)
+
+        first_groups: dict[int, int] = {}
+        through = MaristDB.TimeBlock.allocation_groups.through
+        for time_block_pk, group_pk in through.objects.values_list("timeblock", "allocationgroup"):
+            first_groups[time_block_pk] = min(group_pk, first_groups.get(time_block_pk, group_pk))
+
+        for time_block in MaristDB.TimeBlock.objects.order_by("pk"):
+            time_key = time_keys[time_block.start_end_time_id]  # pyright: ignore
+            self.time_blocks.setdefault((time_block.day, time_key), time_block)
+            if time_block.number is not None:
+                self.official_time_blocks.append(
+                    (time_block.day, *time_key, first_groups.get(time_block.pk))
+                )
+
+        building_keys: dict[int, BuildingKey] = {}
+        for building in MaristDB.Building.objects.order_by("pk"):
+            building_keys[building.pk] = (building.name, building.code)
+            self.buildings.setdefault((building.name, building.code), building)
+
+        for room in MaristDB.Room.objects.filter(building__isnull=False).order_by("pk"):
+            key = (building_keys[room.building_id], room.number)  # pyright: ignore
+            self.rooms.setdefault(key, room)
+
+    def department(self, code: str | None) -> int:
+        department = self.departments.get(code)  # pyright: ignore
+        if department is None:
+            return self.departments["OT"]
+        return department
+
+    def add_course(self, course: dict):
+        department = self.department(course.get('departmentCode'))
+
+        subject_key = (course['subjectCode'], department)
+        subject, _ = self.get_or_add(self.subjects, subject_key, lambda: MaristDB.Subject(
+            code=course['subjectCode'],
+            department_id=department,
+            description=course.get('subjectDescription'),
+        ))
+        self.subjects_by_code.setdefault(subject.code, subject)
+
+        self.get_or_add(self.courses, (course['courseNumber'], subject_key), lambda: MaristDB.Course(
+            code=course['courseNumber'],
+            subject=subject,
+            banner_id=course['id'],
+            credits=course['creditHourLow'],
+            title=course['courseTitle'],
+            description=course.get('course_details'),
+            prerequisite=course.get('pre_reqs_desc'),
+            corequisite=course.get('co_reqs_desc'),
+        ))
+
+    def add_section(self, section: dict):
+        course_number = section['courseNumber']
+        subject_code = section['subject']
+        subject_description = section.get('subjectDescription')
+
+        subject = self.subjects_by_code.get(subject_code)
+        if subject is None:
+            subject, _ = self.get_or_add(self.subjects, (subject_code, self.departments["OT"]), lambda: MaristDB.Subject(
+                    code=subject_code,
+                    description=subject_description,
+                    department_id=self.departments["OT"]))
+            self.subjects_by_code[subject_code] = subject
+        subject_key = (subject.code, subject.department_id)  # pyright: ignore
+
+        course_key = (course_number, subject_key)
+        course, _ = self.get_or_add(self.courses, course_key, lambda: MaristDB.Course(
+            code=course_number,
+            subject=subject,
+            title=section['courseTitle'],
+            credits=section['creditHourLow'],
+            banner_id=section["courseReferenceNumber"],
+        ))
+
+        term_year = int(section['term'][:4])
+        term_season = TERM_CODE_TO_SEASON[section['term'][-2:]]
+        term_key = (term_year, term_season)
+        term, _ = self.get_or_add(self.terms, term_key, lambda: MaristDB.Term(
+            year=term_year,
+            season=term_season
+        ))
+
+        primary_professor = None
+        secondary_professor = None
+        for prof in section['faculty']:
+            last_name, first_name = prof['displayName'].split(', ')
+            email = prof.get('emailAddress')
+            professor, _ = self.get_or_add(self.professors, (first_name, last_name, email), lambda: MaristDB_Professor(
+                first_name=first_name,
+                last_name=last_name,
+                email=email
+            ))
+            if prof['primaryIndicator']:
+                primary_professor = professor
+            else:
+                secondary_professor = professor
+
+        section_key = (section['sequenceNumber'], section['campusDescription'], term_key, course_key)
+        section_hash = hash_section(section)
+        existing = None
+        if section_key in self.sections:
+            # only the first record of a section is used
+            existing = self.existing_sections.pop(section_key, None) if self.sync else None
+            if existing is None: return
+            if existing[1] == section_hash:
+                self.summary["unchanged sections"] += 1
+                return
+        section_db = MaristDB.Section(
+            pk=None if existing is None else existing[0],
+            number=section['sequenceNumber'],
+            campus=section['campusDescription'],
+            term=term,
+            course=course,
+            soft_cap=section['maximumEnrollment'],
+            banner_course=section['courseReferenceNumber'],
+            primary_professor=primary_professor,
+            banner_hash=section_hash,
         )
-        if prof['primaryIndicator']:
-            primary_professor = professor
-        else:
-            secondary_professor = professor
-
-    section_db, section_is_new = MaristDB.Section.objects.get_or_create(
-        number=section['sequenceNumber'],
-        campus=section['campusDescription'],
-        term=term,
-        course=course,
-        defaults={
-            "soft_cap": section['maximumEnrollment'],
-            "banner_course": section['courseReferenceNumber'],
-            "primary_professor": primary_professor,
-        }
-    )
 
-    if not section_is_new: return
+        meetings: list[MaristDB.Meeting] = []
+        next_professor = primary_professor
+        for meeting in section['meetingsFaculty']:
+            try:
+                self.add_meeting(meeting['meetingTime'], section_db, next_professor, meetings)
+            except KeyError as err:
+                # One meetingTime didn't have a beginTime for some reason
+                break
+            if secondary_professor is not None:
+                next_professor = secondary_professor
 
-    next_professor = primary_professor
-    for meeting in section['meetingsFaculty']:
-        try:
-            add_meeting(meeting['meetingTime'], section_db, next_professor)
-        except KeyError as err:
-            # One meetingTime didn't have a beginTime for some reason
+        if existing is not None:
+            self.changed_sections.append((section_db, meetings))
             return
-        if secondary_professor is not None:
-            next_professor = secondary_professor
+        self.sections[section_key] = section_db
+        self.new[MaristDB.Section].append(section_db)
+        self.new[MaristDB.Meeting].extend(meetings)
+        self.summary["new sections"] += 1
+        self.summary["new meetings"] += len(meetings)
 
+    def add_meeting(self, meeting: dict, section: MaristDB.Section, professor: MaristDB_Professor | None, meetings: list[MaristDB.Meeting]):
+        for day_key, db_code in DAY_KEYS_TO_DB_CODE.items():
+            if not meeting.get(day_key): continue
+            # parsed by normalize_section
+            start_date = meeting['startDate']
+            end_date = meeting['endDate']
+            start_time = meeting['beginTime']
+            end_time = meeting['endTime']
 
-def add_meeting(meeting: dict, section: MaristDB.Section, professor: MaristDB_Professor | None):
-    for day_key, db_code in DAY_KEYS_TO_DB_CODE.items():
-        if not meeting.get(day_key): continue
-        start_date = datetime.strptime(meeting['startDate'], "%m/%d/%Y")
-        end_date = datetime.strptime(meeting['endDate'], "%m/%d/%Y")
-        start_time = datetime.strptime(meeting['beginTime'], "%H%M").time()
-        end_time= datetime.strptime(meeting['endTime'], "%H%M").time()
+            time_key = (start_time, end_time)
+            start_end_time, _ = self.get_or_add(self.start_end_times, time_key, lambda: MaristDB.StartEndTime(
+                start=start_time,
+                end=end_time
+            ))
+            time_block, time_block_is_new = self.get_or_add(self.time_blocks, (db_code, time_key), lambda: MaristDB.TimeBlock(
+                day=db_code,
+                start_end_time=start_end_time,
+            ))
 
-        start_end_time, _ = MaristDB.StartEndTime.objects.get_or_create(
-            start=start_time,
-            end=end_time
-        )
-        time_block, time_block_is_new = MaristDB.TimeBlock.objects.get_or_create(
-            day=db_code,
-            start_end_time=start_end_time,
-        )
+            if time_block_is_new:
+                self.add_allocation_groups(time_block, db_code, start_time, end_time)
 
-        if time_block_is_new:
-            time_block.add_allocation_groups()
+            classification = MaristDB.Room.LECTURE
+            is_general_purpose = False
 
-        classification = MaristDB.Room.LECTURE
-        is_general_purpose = False
+            name = meeting.get('buildingDescription')
+            code = meeting.get('building')
+            room = meeting.get('room')
+            if (name is not None) and (code is not None) and (room is not None):
+                building_key = (name, code)
+                building, _ = self.get_or_add(self.buildings, building_key, lambda: MaristDB.Building(
+                    name=name,
+                    code=code
+                ))
+                if meeting['meetingType'] == "LAB":
+                    classification = MaristDB.Room.LAB
 
-        name = meeting.get('buildingDescription')
-        code = meeting.get('building')
-        room = meeting.get('room')
-        if (name is not None) and (code is not None) and (room is not None):
-            building, _ = MaristDB.Building.objects.get_or_create(
-                name=name,
-                code=code
-            )
-            if meeting['meetingType'] == "LAB":
-                classification = MaristDB.Room.LAB
-
-            room, _ = MaristDB.Room.objects.get_or_create(
-                building=building,
-                number=room,
-                defaults={
-                    "classification": classification,
-                }
+                room, _ = self.get_or_add(self.rooms, (building_key, room), lambda: MaristDB.Room(
+                    building=building,
+                    number=room,
+                    classification=classification,
+                ))
+                is_general_purpose = room.is_general_purpose
+
+            meeting_db: MaristDB.Meeting = MaristDB.Meeting(
+                start_date=start_date,
+                end_date=end_date,
+                style_code=meeting['meetingType'],
+                style_description=meeting['meetingTypeDescription'],
+                section=section,
+                time_block=time_block,
+                professor=professor,
+                # do not set the room data used for no room
+                room_classification=classification,
+                room_is_general_purpose=is_general_purpose,
             )
-            is_general_purpose = room.is_general_purpose
-
-        meeting_db: MaristDB.Meeting = MaristDB.Meeting(
-            start_date=start_date,
-            end_date=end_date,
-            style_code=meeting['meetingType'],
-            style_description=meeting['meetingTypeDescription'],
-            section=section,
-            time_block=time_block,
-            professor=professor,
-            # do not set the room data used for no room
-            room_classification=classification,
-            room_is_general_purpose=is_general_purpose,
-        )
 
-        meeting_db.save()
+            meetings.append(meeting_db)
+
+    def add_allocation_groups(self, time_block: MaristDB.TimeBlock, day: str, start: time, end: time):
+        # same as TimeBlock.add_allocation_groups
+        groups = set()
+        for tm_day, tm_start, tm_end, group in self.official_time_blocks:
+            if tm_day == day and tm_start <= end and tm_end >= start and group is not None:
+                groups.add(group)
+        for group in groups:
+            self.new_allocation_groups.append((time_block, group))
+
+    def record_planned(self):
+        self.planned += 1
+        if self.planned % FLUSH_INTERVAL == 0:
+            self.flush()
+
+    def flush(self):
+        """Writes the rows planned so far and forgets them (only their natural keys are kept)"""
+        # new meetings only belong to new or changed sections
+        sections = self.new[MaristDB.Section] + [section for section, _ in self.changed_sections]
+        for model in WRITE_ORDER:
+            # the meetings that have to be inserted are only known after the diff
+            if model is MaristDB.Meeting and self.changed_sections:
+                self.sync_sections()
+
+            rows = self.new[model]
+            if not rows: continue
+            start = perf_counter()
+            model.objects.bulk_create(rows)  # pyright: ignore
+            self.report(f"  created {len(rows)} {model.__name__} rows in {perf_counter() - start:.2f}s")
+
+            if model is MaristDB.TimeBlock and self.new_allocation_groups:
+                through = MaristDB.TimeBlock.allocation_groups.through
+                through.objects.bulk_create(
+                    through(timeblock_id=time_block.pk, allocationgroup_id=group)
+                    for time_block, group in self.new_allocation_groups
+                )
+
+        self.written_terms.update(related_pk(section, "term") for section in sections)
+        self.has_new_time_blocks = self.has_new_time_blocks or bool(self.new[MaristDB.TimeBlock])
+        for rows in self.new.values():
+            rows.clear()
+        self.new_allocation_groups.clear()
+        self.changed_sections.clear()
+        # only whether a section was seen is needed from now on
+        for key in self.sections:
+            self.sections[key] = None
+
+    def save(self):
+        self.flush()
+        self.refresh_terms()
+
+    def refresh_terms(self):
+        """
+        The bulk writes skip the signals so the allocation usage of the written terms is
+        recounted (one query each) and their stamps are changed once, in the same transaction
+        """
+        term_pks = self.written_terms
+        for term_pk in term_pks:
+            MaristDB.AllocationUsage.rebuild(term_pk)
+        if self.has_new_time_blocks:
+            Timetable.invalidate()
+        if term_pks:
+            MaristDB.SnapshotVersion.bump(*map(MaristDB.SnapshotVersion.term_name, term_pks))
+
+    def sync_sections(self):
+        """Updates the changed sections and inserts/ updates/ deletes only the meetings that differ"""
+        start = perf_counter()
+        changed = {section.pk: (section, meetings) for section, meetings in self.changed_sections}
+        existing_sections = MaristDB.Section.objects.in_bulk(changed)
+        existing_meetings: dict[int, list[MaristDB.Meeting]] = {}
+        for meeting in MaristDB.Meeting.objects.filter(section__in=changed).order_by("pk"):
+            existing_meetings.setdefault(meeting.section_id, []).append(meeting)  # pyright: ignore
+
+        updated_sections: list[MaristDB.Section] = []
+        updated_meetings: list[MaristDB.Meeting] = []
+        deleted_meetings: list[int] = []
+        for pk, (section, meetings) in changed.items():
+            existing_section = existing_sections[pk]
+            is_updated = copy_changes(section, existing_section, SYNC_SECTION_FIELDS)
+            existing_section.banner_hash = section.banner_hash
+            updated_sections.append(existing_section)
+
+            # meetings at the same time are matched first so their pks (and requests) stay
+            remaining = existing_meetings.get(pk, [])
+            unmatched: list[MaristDB.Meeting] = []
+            for meeting in meetings:
+                time_block = related_pk(meeting, "time_block")
+                match = next((m for m in remaining if m.time_block_id == time_block), None)  # pyright: ignore
+                if match is None:
+                    unmatched.append(meeting)
+                    continue
+                remaining.remove(match)
+                if copy_changes(meeting, match, SYNC_MEETING_FIELDS):
+                    updated_meetings.append(match)
+                    self.summary["updated meetings"] += 1
+                    is_updated = True
+            for meeting, match in zip_longest(unmatched, remaining):
+                is_updated = True
+                if match is None:
+                    self.new[MaristDB.Meeting].append(meeting)
+                    self.summary["new meetings"] += 1
+                elif meeting is None:
+                    deleted_meetings.append(match.pk)
+                    self.summary["deleted meetings"] += 1
+                else:
+                    copy_changes(meeting, match, SYNC_MEETING_FIELDS)
+                    updated_meetings.append(match)
+                    self.summary["updated meetings"] += 1
+            self.summary["updated sections" if is_updated else "unchanged sections"] += 1
+
+        MaristDB.Section.objects.bulk_update(updated_sections, SYNC_SECTION_FIELDS + ["banner_hash"])
+        MaristDB.Meeting.objects.bulk_update(updated_meetings, SYNC_MEETING_FIELDS)
+        # refresh_terms recounts and changes the stamps once for all of them
+        with muted():
+            MaristDB.Meeting.objects.filter(pk__in=deleted_meetings).delete()
+        self.report(f"  synced {len(changed)} changed Section records in {perf_counter() - start:.2f}s")
+
+    def add_courses(self):
+        """Adds the courses from courses.json, only done if there are no subjects yet"""
+        if MaristDB.Subject.objects.first() is not None: return
+        BANNER_DUMP_PATH = os.path.join(settings.BASE_DIR, 'banner', 'data', 'classes')
+        for course in read_records(os.path.join(BANNER_DUMP_PATH, 'courses.json')):
+            self.add_course(course)
+            self.record_planned()
+
+    def add_sections(self, sections: Iterable[dict], name: str):
+        count = 0
+        for section in sections:
+            self.add_section(section)
+            self.record_planned()
+            count += 1
+            if count % PROGRESS_INTERVAL == 0:
+                self.report(f"  planned {count} sections of {name}")
+        self.report(f"  planned {count} sections of {name}")
+
+
+def related_pk(row: models.Model, name: str) -> int | None:
+    # the related row might only have gotten its pk after it was assigned
+    field = row._meta.get_field(name)
+    if field.is_cached(row):  # pyright: ignore
+        related = getattr(row, name)
+        return None if related is None else related.pk
+    return getattr(row, field.attname)  # pyright: ignore
+
+
+def copy_changes(source: models.Model, target: models.Model, fields: list[str]) -> bool:
+    """Copies the fields that differ from source to target, returns whether any did"""
+    is_changed = False
+    for name in fields:
+        field = source._meta.get_field(name)
+        if field.is_relation:
+            is_different = related_pk(source, name) != related_pk(target, name)
+        else:
+            is_different = field.get_prep_value(getattr(source, name)) != field.get_prep_value(getattr(target, name))  # pyright: ignore
+        if is_different:
+            setattr(target, name, getattr(source, name))
+            is_changed = True
+    return is_changed
+
+
+def report_summary(importer: ClassImporter):
+    if not importer.summary:
+        importer.report("no changes")
+        return
+    importer.report(", ".join(f"{count} {change}" for change, count in sorted(importer.summary.items())))
+
+
+def invalidate_caches():
+    """After loadgeneral, what every term depends on could have changed"""
+    # bulk_create skips the signals that would have done this
+    Timetable.invalidate()
+    TermOccupancy.invalidate()
+    MaristDB.AllocationUsage.rebuild()
+    CourseSearch.rebuild()
+
+
+def create_terms(section_paths: Iterable[str], report: Callable[[str], None] | None = None, sync: bool = False):
+    importer = ClassImporter(report, sync=sync)
+
+    with importer.stage("preload"):
+        importer.preload()
+
+    # the records are planned as they are read
+    with importer.stage("read and plan"):
+        importer.add_courses()
+        for path in section_paths:
+            importer.add_sections(map(normalize_section, read_records(path)), os.path.basename(path))
+
+    with importer.stage("write"):
+        importer.save()
 
-def create_terms(section_paths):
-    BANNER_DUMP_PATH = os.path.join(settings.BASE_DIR, 'banner', 'data', 'classes')
-    
-    if MaristDB.Subject.objects.first() is None:
-        with open(os.path.join(BANNER_DUMP_PATH, 'courses.json'), 'r') as file:
-            courses = json.load(file)
-            for course in courses:
-                add_course(course)
+    report_summary(importer)
+    # the terms were already refreshed by ClassImporter.save
+    CourseSearch.rebuild()
 
-    for path in section_paths:
-        with open(path, 'r') as file:
-            sections = json.load(file)
-            for section in sections:
-                add_section(section)
 
-    
+def create_terms_parallel(
+    section_paths: Iterable[str],
+    workers: int | None = None,
+    report: Callable[[str], None] | None = None,
+    sync: bool = False,
+) -> list[str]:
+    """
+    Reads and normalizes the term files in a process pool while the terms are written one
+    at a time each in their own transaction. Returns the files of the terms that failed.
+    The workers hand the sections over in batches through bounded queues so neither side
+    holds a whole dump
+    """
+    report = report or (lambda _: None)
+    failed: list[str] = []
+    with Manager() as manager, ProcessPoolExecutor(max_workers=workers) as pool:
+        # every file starts being read right away but is written in the given order
+        reads = []
+        for path in section_paths:
+            batches = manager.Queue(maxsize=READ_QUEUE_BATCHES)
+            reads.append((path, QueuedSections(batches), pool.submit(read_term, path, batches, READ_BATCH_SIZE)))
+        for path, sections, read in reads:
+            name = os.path.basename(path)
+            importer = ClassImporter(report, sync=sync)
+            try:
+                with importer.stage(f"importing {name}"), transaction.atomic():
+                    importer.preload()
+                    # courses are part of the first term that goes through
+                    importer.add_courses()
+                    importer.add_sections(sections, name)
+                    importer.save()
+                report_summary(importer)
+            except Exception as err:
+                report(f"{name} was rolled back: {err!r}")
+                failed.append(name)
+            sections.drain()
+            read.result()
 
+    CourseSearch.rebuild()
+    return failed
@@ -1,71 +1,96 @@
 # Creates DB instances of /static/*.csv if they are not already created
 from django.conf import settings
+from django.db import models
+from banner.management.create_classes import invalidate_caches
 import claim.models as MaristDB
 import pandas as pd
-from functools import lru_cache
 import datetime
 import ast
 
 
 # helper functions
-def add_buildings(buildings_df: pd.DataFrame) -> None:
-    for _, build_row in buildings_df.iterrows():
+def get_or_create_all(model: type[models.Model], rows: pd.DataFrame, fields: list[str]) -> pd.Series:
+    """
+    Does a get_or_create (with the given fields as the lookup) of every row at once.
+    Rows that are not in the database yet are bulk created in order and the pk of every row is returned
+    """
+    def existing_keys(queryset: models.QuerySet) -> pd.DataFrame:
+        existing = pd.DataFrame.from_records(list(queryset.values_list(*fields, "pk")), columns=[*fields, "pk"])
+        return existing.astype(object).drop_duplicates(fields)
+
+    keys = rows[fields].astype(object)
+    existing = existing_keys(model.objects.order_by("pk"))  # pyright: ignore
+    found = keys.merge(existing, on=fields, how="left")
+    missing = found.loc[found["pk"].isna(), fields].drop_duplicates()
+    created = model.objects.bulk_create(model(**row) for row in missing.to_dict("records"))  # pyright: ignore
+    missing["pk"] = [row.pk for row in created]
+
+    pks = keys.merge(pd.concat([existing, missing.astype(object)]), on=fields, how="left")["pk"]
+    pks.index = rows.index
+    return pks.astype(int)
+
 
-        MaristDB.Building.objects.get_or_create(name=build_row["name"], code=build_row["code"])
+def add_buildings(buildings_df: pd.DataFrame) -> None:
+    buildings_df["pk"] = get_or_create_all(MaristDB.Building, buildings_df, ["name", "code"])
 
 def add_departments(department_df: pd.DataFrame) -> None:
-    for _, dep_row in department_df.iterrows():
-        MaristDB.Department.objects.get_or_create(name=dep_row["name"], code=dep_row["code"])
+    department_df["pk"] = get_or_create_all(MaristDB.Department, department_df, ["name", "code"])
 
 def add_start_end_times(start_end_times_df: pd.DataFrame) -> None:
-    for _, time_row in start_end_times_df.iterrows():
-        MaristDB.StartEndTime.objects.get_or_create(start=time_row["start"], end=time_row["end"])
-        
+    start_end_times_df["pk"] = get_or_create_all(MaristDB.StartEndTime, start_end_times_df, ["start", "end"])
+
 def add_time_blocks(time_block_df: pd.DataFrame) -> None:
-    for _, timeb_row in time_block_df.iterrows():
-        MaristDB.TimeBlock.objects.get_or_create(
-            start_end_time=timeb_row["start_end_time"],
-            number=timeb_row["number"], 
-            day=timeb_row["day"]
-        )
-        
-def add_allocation_groups(allocation_group_df: pd.DataFrame) -> None:
-    for _, allo_row in allocation_group_df.iterrows():
-        allo_group = MaristDB.AllocationGroup()
-        time_blocks = allo_row["time_blocks"]
-        allo_group.save()
-        for time_block in time_blocks:
-            time_block: MaristDB.TimeBlock = time_block
-            time_block.save()
-            time_block.allocation_groups.add(allo_group)
+    time_block_df["pk"] = get_or_create_all(MaristDB.TimeBlock, time_block_df, ["start_end_time_id", "number", "day"])
+
+def add_allocation_groups(allocation_group_df: pd.DataFrame, time_block_df: pd.DataFrame) -> None:
+    # a group is the same group if it has the same time blocks so this can be ran again
+    #   only the official time blocks count, the classes add their own (unnumbered) ones to the groups
+    through = MaristDB.TimeBlock.allocation_groups.through
+    official = through.objects.filter(timeblock__number__isnull=False)
+    through_df = pd.DataFrame.from_records(
+        list(official.values_list("timeblock_id", "allocationgroup_id")),
+        columns=["timeblock_id", "allocationgroup_id"],
+    )
+    existing_groups: dict[frozenset, int] = {}
+    for group, time_blocks in through_df.groupby("allocationgroup_id")["timeblock_id"]:
+        existing_groups.setdefault(frozenset(time_blocks), int(group))  # pyright: ignore
+
+    group_time_blocks = (
+        allocation_group_df["time_blocks"].explode().rename("time_block_index").to_frame()
+        .merge(time_block_df[["pk"]], left_on="time_block_index", right_index=True)
+    )
+    group_keys = group_time_blocks.groupby(level=0)["pk"].agg(frozenset).reindex(allocation_group_df.index)
+    allocation_group_df["pk"] = group_keys.map(existing_groups)
+
+    missing = allocation_group_df.index[allocation_group_df["pk"].isna()]
+    created = MaristDB.AllocationGroup.objects.bulk_create(MaristDB.AllocationGroup() for _ in missing)
+    allocation_group_df.loc[missing, "pk"] = [group.pk for group in created]
+    allocation_group_df["pk"] = allocation_group_df["pk"].astype(int)
+
+    new_through = group_time_blocks.loc[group_time_blocks.index.isin(missing)].join(allocation_group_df["pk"].rename("group"))
+    through.objects.bulk_create(
+        (through(timeblock_id=row.pk, allocationgroup_id=row.group) for row in new_through.itertuples()),
+        ignore_conflicts=True,
+    )
 
 def add_department_allocations(department_allocation: pd.DataFrame) -> None:
-    for _, dep_allo_row in department_allocation.iterrows():
-        MaristDB.DepartmentAllocation.objects.get_or_create(
-            department=dep_allo_row['department'],
-            allocation_group=dep_allo_row['allocation_group'],
-            number_of_classrooms=dep_allo_row['allocation'],
-        )
+    get_or_create_all(MaristDB.DepartmentAllocation, department_allocation, ["department_id", "allocation_group_id", "number_of_classrooms"])
 
 def add_general_purpose_classes(gp_df: pd.DataFrame) -> None:
-    for _, gp_row in gp_df.iterrows():
-        MaristDB.Room.objects.get_or_create(
-            building = gp_row['building'],
-            number=gp_row['number'],
-            capacity=gp_row['capacity'],
-            classification=gp_row['classification'],
-            is_general_purpose=True,
-        )
+    gp_df["is_general_purpose"] = True
+    get_or_create_all(MaristDB.Room, gp_df, ["building_id", "number", "capacity", "classification", "is_general_purpose"])
 
 
 # driver function
 def create_all():
     STATIC_DATA_PATH: str = f"{settings.BASE_DIR}/banner/data/static"
 
-    # Loading data frames and creating/ getting objects
+    # Loading data frames and getting/ creating all of the rows of a model at once
+    #   foreign keys are resolved by joining with the data frame of the related model
 
     # Buildings
-    add_buildings(pd.read_csv(f"{STATIC_DATA_PATH}/Building.csv"))
+    buildings_df: pd.DataFrame = pd.read_csv(f"{STATIC_DATA_PATH}/Building.csv")
+    add_buildings(buildings_df)
 
     # Departments
     department_df: pd.DataFrame = pd.read_csv(f"{STATIC_DATA_PATH}/Department.csv")
@@ -79,45 +104,33 @@ def create_all():
     start_end_times_df: pd.DataFrame = pd.read_csv(f"{STATIC_DATA_PATH}/StartEndTime.csv", converters={"start": time_convertor, "end": time_convertor})
     add_start_end_times(start_end_times_df)
 
-    # Time blocks
-    @lru_cache
-    def start_end_time_convertor(start_end_time) -> MaristDB.StartEndTime:
-        time_row = start_end_times_df.iloc[int(start_end_time)]
-        return MaristDB.StartEndTime.objects.get(start=time_row["start"], end=time_row["end"])
-    time_blocks_df: pd.DataFrame = pd.read_csv(f"{STATIC_DATA_PATH}/TimeBlock.csv", converters={"start_end_time": start_end_time_convertor})
+    # Time blocks (start_end_time is the row of StartEndTime.csv)
+    time_blocks_df: pd.DataFrame = pd.read_csv(f"{STATIC_DATA_PATH}/TimeBlock.csv")
+    time_blocks_df["start_end_time_id"] = time_blocks_df["start_end_time"].map(start_end_times_df["pk"])
     add_time_blocks(time_blocks_df)
 
-    # Department time block allocations
-    def time_blocks_convertor(time_block):
-        time_blocks: list[int] = ast.literal_eval(time_block)
-        time_blocks: map[pd.Series] = map( lambda t_id: time_blocks_df.iloc[t_id], time_blocks)
-        time_blocks: map[MaristDB.TimeBlock] = map(lambda t: 
-                   (MaristDB.TimeBlock.objects.get(start_end_time=t["start_end_time"], number=t["number"], day=t["day"])),
-                time_blocks)
-        return list(time_blocks)
+    # Department time block allocations (time_blocks are rows of TimeBlock.csv)
     allocation_group_df = pd.read_csv(f"{STATIC_DATA_PATH}/AllocationGroup.csv", converters={
-        "time_blocks": time_blocks_convertor})
-    add_allocation_groups(allocation_group_df)
-    
-
-    @lru_cache
-    def department_convertor(department) -> MaristDB.Department:
-        return MaristDB.Department.objects.get(code=department)
-    @lru_cache
-    def allocation_group_convertor(allocation_group) -> list[MaristDB.AllocationGroup]:
-        allocation_group_row = allocation_group_df.iloc[int(allocation_group)]
-        return list(allocation_group_row["time_blocks"])[0].allocation_groups.first()
-    
-    add_department_allocations(pd.read_csv(f"{STATIC_DATA_PATH}/DepartmentAllocation.csv", converters={
-        "department": department_convertor,
-        "allocation_group": allocation_group_convertor,
-    }))
-    
-    @lru_cache
-    def building_convertor(building_code) -> MaristDB.Building:
-        return MaristDB.Building.objects.get(code=building_code)
-    gp_df = pd.read_csv(f"{STATIC_DATA_PATH}/GeneralPurposeClasses.csv", converters={
-        "building": building_convertor,
-    })
+        "time_blocks": ast.literal_eval})
+    add_allocation_groups(allocation_group_df, time_blocks_df)
+
+    # same as the first time block of the group's .allocation_groups.first()
+    through = MaristDB.TimeBlock.allocation_groups.through
+    first_groups = pd.DataFrame.from_records(
+        list(through.objects.values_list("timeblock_id", "allocationgroup_id")),
+        columns=["timeblock_id", "allocationgroup_id"],
+    ).groupby("timeblock_id")["allocationgroup_id"].min()
+    allocation_group_df["first_group"] = allocation_group_df["time_blocks"].str[0].map(time_blocks_df["pk"]).map(first_groups)
+
+    department_allocation_df = pd.read_csv(f"{STATIC_DATA_PATH}/DepartmentAllocation.csv")
+    department_allocation_df["department_id"] = department_allocation_df["department"].map(
+        department_df.drop_duplicates("code").set_index("code")["pk"])
+    department_allocation_df["allocation_group_id"] = department_allocation_df["allocation_group"].map(allocation_group_df["first_group"])
+    department_allocation_df["number_of_classrooms"] = department_allocation_df["allocation"]
+    add_department_allocations(department_allocation_df)
+
+    gp_df = pd.read_csv(f"{STATIC_DATA_PATH}/GeneralPurposeClasses.csv")
+    gp_df["building_id"] = gp_df["building"].map(buildings_df.drop_duplicates("code").set_index("code")["pk"])
     add_general_purpose_classes(gp_df)
 
+    invalidate_caches()
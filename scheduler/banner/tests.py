@@ -0,0 +1,459 @@
+import copy
+import json
+import os
+import tempfile
+from datetime import datetime, time
+from unittest import mock
+
+from authentication.models import Professor
+from claim.models import (
+    AllocationGroup,
+    Building,
+    Course,
+    Department,
+    Meeting,
+    Room,
+    Section,
+    StartEndTime,
+    Subject,
+    Term,
+    TimeBlock,
+)
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from banner.management.banner_records import normalize_section, read_records
+from banner.management.create_classes import (
+    DAY_KEYS_TO_DB_CODE,
+    TERM_CODE_TO_SEASON,
+    ClassImporter,
+    create_terms,
+    create_terms_parallel,
+)
+from banner.management.create_static import create_all
+
+# Wednesday 8:00 to 10:45 is not an official time block so it gets its own
+#   (unnumbered) time block in the allocation groups of the blocks it overlaps
+SECTION_RECORD = {
+    "term": "202340",
+    "courseNumber": "289L",
+    "subject": "ENG",
+    "subjectDescription": "English",
+    "courseTitle": "SPEC TOPICS ENG",
+    "creditHourLow": 1,
+    "courseReferenceNumber": "10000",
+    "faculty": [],
+    "sequenceNumber": "115",
+    "campusDescription": "Main",
+    "maximumEnrollment": 22,
+    "meetingsFaculty": [
+        {
+            "meetingTime": {
+                "monday": False,
+                "tuesday": False,
+                "wednesday": True,
+                "thursday": False,
+                "friday": False,
+                "saturday": False,
+                "sunday": False,
+                "startDate": "09/01/2023",
+                "endDate": "12/15/2023",
+                "beginTime": "0800",
+                "endTime": "1045",
+                "building": "DN",
+                "buildingDescription": "Donnelly",
+                "room": "225",
+                "meetingType": "LEC",
+                "meetingTypeDescription": "Lecture",
+            }
+        }
+    ],
+}
+
+
+class LoadGeneralTest(TestCase):
+    def counts(self) -> tuple[int, int]:
+        through = TimeBlock.allocation_groups.through
+        return AllocationGroup.objects.count(), through.objects.count()
+
+    def test_loading_again_after_the_classes_adds_nothing(self):
+        create_all()
+        importer = ClassImporter()
+        importer.preload()
+        importer.add_sections([normalize_section(SECTION_RECORD)], "test")
+        importer.save()
+        meeting = Meeting.objects.get()
+        self.assertIsNone(meeting.time_block.number)
+        self.assertTrue(meeting.time_block.allocation_groups.exists())
+
+        counts = self.counts()
+        create_all()
+        self.assertEqual(self.counts(), counts)
+
+
+class ReadRecordsTest(SimpleTestCase):
+    def write(self, text: str) -> str:
+        file, path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(file, "w") as json_file:
+            json_file.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_same_as_json_load(self):
+        records = [SECTION_RECORD, {"a": [1, 2.5, None], "b": "] , [ \u00e9"}, {}, 12, "x"]
+        for text in (json.dumps(records), json.dumps(records, indent=4), "[]", " [ ] "):
+            path = self.write(text)
+            with open(path) as json_file:
+                expected = json.load(json_file)
+            for chunk_size in (1, 2, 3, 7, 64 * 1024):
+                with mock.patch("banner.management.banner_records.READ_CHUNK_SIZE", chunk_size):
+                    self.assertEqual(list(read_records(path)), expected)
+
+    def test_truncated_file(self):
+        for text in ('[{"a": 1}', '[{"a": 1}, ', '[{"a": 1}, {"b"', "[", ""):
+            path = self.write(text)
+            for chunk_size in (1, 64 * 1024):
+                with mock.patch("banner.management.banner_records.READ_CHUNK_SIZE", chunk_size):
+                    with self.assertRaises(ValueError):
+                        list(read_records(path))
+
+    def test_not_an_array(self):
+        for text in ('{"a": 1}', "12", '"[1]"'):
+            with self.assertRaises(ValueError):
+                list(read_records(self.write(text)))
+
+
+def meeting_time(days: list[str], begin: str, end: str, building: tuple[str, str] | None = None, room: str | None = None, style: str = "LEC") -> dict:
+    meeting = {day: day in days for day in DAY_KEYS_TO_DB_CODE}
+    meeting.update({
+        "startDate": "09/01/2023",
+        "endDate": "12/15/2023",
+        "beginTime": begin,
+        "endTime": end,
+        "meetingType": style,
+        "meetingTypeDescription": "Lab" if style == "LAB" else "Lecture",
+    })
+    if building is not None:
+        meeting["buildingDescription"], meeting["building"] = building
+        meeting["room"] = room
+    return {"meetingTime": meeting}
+
+
+def section_record(term: str, subject: str, course: str, number: str, crn: str, meetings: list[dict], faculty: list[dict] | None = None, cap: int = 30) -> dict:
+    return {
+        "term": term,
+        "courseNumber": course,
+        "subject": subject,
+        "subjectDescription": f"{subject} subject",
+        "courseTitle": f"{subject} {course}",
+        "creditHourLow": 4,
+        "courseReferenceNumber": crn,
+        "faculty": faculty or [],
+        "sequenceNumber": number,
+        "campusDescription": "Main",
+        "maximumEnrollment": cap,
+        "meetingsFaculty": meetings,
+    }
+
+
+def faculty(name: str, is_primary: bool) -> dict:
+    return {"displayName": f"Last{name}, First{name}", "emailAddress": f"{name}@x.edu", "primaryIndicator": is_primary}
+
+
+COURSE_RECORDS = [
+    {"id": 1, "courseNumber": "120L", "subjectCode": "CMPT", "departmentCode": "CC", "courseTitle": "INTRO", "creditHourLow": 4, "subjectDescription": "Computing"},
+    # an unknown department goes to OT (so there are two CMPT subjects)
+    {"id": 2, "courseNumber": "221L", "subjectCode": "CMPT", "departmentCode": "XX", "courseTitle": "DATA", "creditHourLow": 4},
+    {"id": 3, "courseNumber": "120L", "subjectCode": "ENG", "departmentCode": "LA", "courseTitle": "WRITING", "creditHourLow": 3, "course_details": "Essays"},
+]
+
+FALL_RECORDS = [
+    section_record("202340", "CMPT", "120L", "111", "10001", [
+        meeting_time(["monday", "thursday"], "0800", "0915", ("Donnelly", "DN"), "225"),
+        # not an official time block, the secondary professor teaches it
+        meeting_time(["wednesday"], "0800", "1045"),
+    ], faculty=[faculty("A", True), faculty("B", False)]),
+    # only the first record of a section is used
+    section_record("202340", "CMPT", "120L", "111", "10099", [], cap=99),
+    # a subject and course that are not in the courses
+    section_record("202340", "MATH", "130L", "112", "10002", [
+        meeting_time(["tuesday"], "0930", "1045", ("Lab Hall", "LH"), "101", style="LAB"),
+    ], faculty=[faculty("B", True)]),
+    section_record("202340", "ENG", "120L", "113", "10003", [
+        meeting_time(["friday"], "0800", "0915", ("Hancock", "HC"), "1021"),
+        # the meetings stop at the first meeting without a beginTime
+        {"meetingTime": {"friday": True, "startDate": "09/01/2023", "endDate": "12/15/2023"}},
+        meeting_time(["monday"], "1100", "1215"),
+    ]),
+]
+
+SPRING_RECORDS = [
+    section_record("202420", "CMPT", "120L", "111", "20001", [
+        meeting_time(["monday", "thursday"], "0800", "0915", ("Donnelly", "DN"), "225"),
+    ], faculty=[faculty("A", True)]),
+    section_record("202420", "CMPT", "221L", "211", "20002", [
+        meeting_time([], "0800", "0915"),
+    ]),
+]
+
+# the rows an import creates (banner_hash is only set by the staged importer)
+IMPORTED_MODELS = [Subject, Course, Term, Professor, StartEndTime, TimeBlock, TimeBlock.allocation_groups.through, Building, Room, Section, Meeting]
+
+
+def imported_rows() -> dict[str, list[dict]]:
+    rows = {}
+    for model in IMPORTED_MODELS:
+        values = list(model.objects.order_by("pk").values())
+        for value in values:
+            value.pop("banner_hash", None)
+        rows[model.__name__] = values
+    return rows
+
+
+def reference_create_terms(courses: list[dict], dumps: list[list[dict]]):
+    """The get_or_create per row importer the staged one replaced"""
+    other = Department.objects.get(code="OT")
+    if Subject.objects.first() is None:
+        for course in courses:
+            department = Department.objects.filter(code=course.get("departmentCode")).first() or other
+            subject, _ = Subject.objects.get_or_create(code=course["subjectCode"], department=department, defaults={"description": course.get("subjectDescription")})
+            Course.objects.get_or_create(code=course["courseNumber"], subject=subject, defaults={
+                "banner_id": course["id"],
+                "credits": course["creditHourLow"],
+                "title": course["courseTitle"],
+                "description": course.get("course_details"),
+                "prerequisite": course.get("pre_reqs_desc"),
+                "corequisite": course.get("co_reqs_desc"),
+            })
+
+    for section in (section for dump in dumps for section in dump):
+        subject = Subject.objects.filter(code=section["subject"]).first()
+        if subject is None:
+            subject = Subject.objects.create(code=section["subject"], description=section.get("subjectDescription"), department=other)
+        course, _ = Course.objects.get_or_create(code=section["courseNumber"], subject=subject, defaults={
+            "title": section["courseTitle"],
+            "credits": section["creditHourLow"],
+            "banner_id": section["courseReferenceNumber"],
+        })
+        term, _ = Term.objects.get_or_create(year=int(section["term"][:4]), season=TERM_CODE_TO_SEASON[section["term"][-2:]])
+        primary_professor = None
+        secondary_professor = None
+        for prof in section["faculty"]:
+            last_name, first_name = prof["displayName"].split(", ")
+            professor, _ = Professor.objects.get_or_create(first_name=first_name, last_name=last_name, email=prof.get("emailAddress"))
+            if prof["primaryIndicator"]:
+                primary_professor = professor
+            else:
+                secondary_professor = professor
+        section_db, section_is_new = Section.objects.get_or_create(
+            number=section["sequenceNumber"], campus=section["campusDescription"], term=term, course=course,
+            defaults={"soft_cap": section["maximumEnrollment"], "banner_course": section["courseReferenceNumber"], "primary_professor": primary_professor},
+        )
+        if not section_is_new: continue
+
+        next_professor = primary_professor
+        for meeting in (m["meetingTime"] for m in section["meetingsFaculty"]):
+            if "beginTime" not in meeting: break
+            for day_key, day in DAY_KEYS_TO_DB_CODE.items():
+                if not meeting.get(day_key): continue
+                start_end_time, _ = StartEndTime.objects.get_or_create(
+                    start=datetime.strptime(meeting["beginTime"], "%H%M").time(),
+                    end=datetime.strptime(meeting["endTime"], "%H%M").time(),
+                )
+                time_block, time_block_is_new = TimeBlock.objects.get_or_create(day=day, start_end_time=start_end_time)
+                if time_block_is_new:
+                    time_block.add_allocation_groups()
+                classification = Room.LECTURE
+                is_general_purpose = False
+                if meeting.get("building") is not None:
+                    building, _ = Building.objects.get_or_create(name=meeting["buildingDescription"], code=meeting["building"])
+                    if meeting["meetingType"] == "LAB":
+                        classification = Room.LAB
+                    room, _ = Room.objects.get_or_create(building=building, number=meeting["room"], defaults={"classification": classification})
+                    is_general_purpose = room.is_general_purpose
+                Meeting.objects.create(
+                    start_date=datetime.strptime(meeting["startDate"], "%m/%d/%Y"),
+                    end_date=datetime.strptime(meeting["endDate"], "%m/%d/%Y"),
+                    style_code=meeting["meetingType"],
+                    style_description=meeting["meetingTypeDescription"],
+                    section=section_db,
+                    time_block=time_block,
+                    professor=next_professor,
+                    room_classification=classification,
+                    room_is_general_purpose=is_general_purpose,
+                )
+            if secondary_professor is not None:
+                next_professor = secondary_professor
+
+
+class BannerDumpTestCase(TestCase):
+    """Imports banner dumps written to a temporary BASE_DIR (with courses.json)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_all()
+
+    def setUp(self):
+        self.base_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.base_dir.cleanup)
+        self.dump_dir = os.path.join(self.base_dir.name, "banner", "data", "classes")
+        os.makedirs(self.dump_dir)
+        self.write("courses.json", COURSE_RECORDS)
+
+    def write(self, name: str, records: list[dict]) -> str:
+        path = os.path.join(self.dump_dir, name)
+        with open(path, "w") as json_file:
+            json.dump(records, json_file)
+        return path
+
+    def create_terms(self, dumps: dict[str, list[dict]], sync: bool = False) -> list[str]:
+        paths = [self.write(name, records) for name, records in dumps.items()]
+        messages = []
+        with override_settings(BASE_DIR=self.base_dir.name):
+            create_terms(paths, report=messages.append, sync=sync)
+        return messages
+
+    def rows_after(self, load) -> dict[str, list[dict]]:
+        """The imported rows after load, which is then rolled back"""
+        with self.assertRaises(Rollback), transaction.atomic():
+            load()
+            rows = imported_rows()
+            raise Rollback
+        return rows
+
+
+class Rollback(Exception):
+    pass
+
+
+class ClassImporterTest(BannerDumpTestCase):
+    def test_same_rows_as_get_or_create(self):
+        dumps = {"sections_fall_2023.json": FALL_RECORDS, "sections_spring_2024.json": SPRING_RECORDS}
+        # the staged importer goes first so the reference cannot leave anything cached
+        rows = self.rows_after(lambda: self.create_terms(dumps))
+        expected = self.rows_after(lambda: reference_create_terms(COURSE_RECORDS, list(dumps.values())))
+        self.assertEqual(rows, expected)
+
+        # the cases the dumps are there for did happen
+        self.assertEqual(len(rows["Term"]), 2)
+        self.assertEqual(len(rows["Section"]), 5)
+        self.assertNotIn(99, [s["soft_cap"] for s in rows["Section"]])
+        self.assertEqual(len(rows["Meeting"]), 7)
+        self.assertEqual(sorted(s["code"] for s in rows["Subject"]), ["CMPT", "CMPT", "ENG", "MATH"])
+        self.assertTrue(any(t["number"] is None for t in rows["TimeBlock"]))
+        self.assertTrue(any(m["room_is_general_purpose"] for m in rows["Meeting"]))
+
+    def test_flushing_every_record(self):
+        dumps = {"sections_fall_2023.json": FALL_RECORDS, "sections_spring_2024.json": SPRING_RECORDS}
+        expected = self.rows_after(lambda: self.create_terms(dumps))
+        with mock.patch("banner.management.create_classes.FLUSH_INTERVAL", 1):
+            rows = self.rows_after(lambda: self.create_terms(dumps))
+        self.assertEqual(rows, expected)
+
+    def test_loading_again_adds_nothing(self):
+        dumps = {"sections_fall_2023.json": FALL_RECORDS}
+        self.create_terms(dumps)
+        rows = imported_rows()
+        self.create_terms(dumps)
+        self.assertEqual(imported_rows(), rows)
+
+
+class SyncTest(BannerDumpTestCase):
+    def setUp(self):
+        super().setUp()
+        self.records = copy.deepcopy(FALL_RECORDS)
+        self.create_terms({"sections_fall_2023.json": self.records})
+
+    def sync(self) -> list[str]:
+        return self.create_terms({"sections_fall_2023.json": self.records}, sync=True)
+
+    def meetings(self, number: str) -> dict[int, tuple[str, time]]:
+        """pk -> (day, start) of the meetings of the fall section"""
+        meetings = Meeting.objects.filter(section__number=number, section__term__season=Term.FALL)
+        return {
+            pk: (day, start)
+            for pk, day, start in meetings.values_list("pk", "time_block__day", "time_block__start_end_time__start")
+        }
+
+    def test_changed_cap(self):
+        before = self.meetings("111")
+        self.records[0]["maximumEnrollment"] = 45
+        self.sync()
+        self.assertEqual(Section.objects.get(number="111").soft_cap, 45)
+        self.assertEqual(self.meetings("111"), before)
+
+    def test_dropped_meeting(self):
+        before = self.meetings("111")
+        self.records[0]["meetingsFaculty"][0]["meetingTime"]["thursday"] = False
+        self.sync()
+        self.assertEqual(self.meetings("111"), {pk: m for pk, m in before.items() if m[0] != "TH"})
+
+    def test_moved_meeting(self):
+        (pk, (day, _)), = self.meetings("112").items()
+        self.records[2]["meetingsFaculty"][0]["meetingTime"].update(beginTime="1100", endTime="1215")
+        self.sync()
+        # the meeting keeps its pk (and with it its requests)
+        self.assertEqual(self.meetings("112"), {pk: (day, time(11, 0))})
+
+    def test_added_meeting(self):
+        before = self.meetings("113")
+        self.records[3]["meetingsFaculty"][0]["meetingTime"]["tuesday"] = True
+        self.sync()
+        after = self.meetings("113")
+        self.assertEqual({pk: after[pk] for pk in before}, before)
+        self.assertEqual(set(after.values()) - set(before.values()), {("TU", time(8, 0))})
+
+    def test_changes_in_different_flushes(self):
+        (pk, (day, _)), = self.meetings("112").items()
+        self.records[0]["maximumEnrollment"] = 45
+        self.records[2]["meetingsFaculty"][0]["meetingTime"].update(beginTime="1100", endTime="1215")
+        with mock.patch("banner.management.create_classes.FLUSH_INTERVAL", 1):
+            self.sync()
+        self.assertEqual(Section.objects.get(number="111").soft_cap, 45)
+        self.assertEqual(self.meetings("112"), {pk: (day, time(11, 0))})
+
+    def test_unchanged_record_is_skipped(self):
+        section = Section.objects.get(number="113")
+        section.soft_cap = 1
+        section.save()
+        Meeting.objects.filter(section=section).update(style_description="Edited")
+        messages = self.sync()
+        # the record hash did not change so nothing of the section was compared
+        self.assertEqual(Section.objects.get(number="113").soft_cap, 1)
+        self.assertFalse(Meeting.objects.filter(section=section).exclude(style_description="Edited").exists())
+        self.assertIn("3 unchanged sections", messages)
+
+
+class ParallelTest(BannerDumpTestCase):
+    def test_failed_term_is_rolled_back(self):
+        broken = copy.deepcopy(SPRING_RECORDS)
+        # only fails when the sections are written, after the subjects, courses and term
+        broken[1]["maximumEnrollment"] = "lots"
+        paths = [self.write("sections_spring_2024.json", broken), self.write("sections_fall_2023.json", FALL_RECORDS)]
+
+        def load():
+            with override_settings(BASE_DIR=self.base_dir.name):
+                self.failed = create_terms_parallel(paths, workers=2)
+
+        rows = self.rows_after(load)
+        expected = self.rows_after(lambda: self.create_terms({"sections_fall_2023.json": FALL_RECORDS}))
+        self.assertEqual(self.failed, ["sections_spring_2024.json"])
+        # the courses went in with the fall term, nothing of the spring term is left
+        self.assertEqual(rows, expected)
+        self.assertEqual([(t["year"], t["season"]) for t in rows["Term"]], [(2023, Term.FALL)])
+
+    def test_sections_are_streamed_in_batches(self):
+        dumps = {"sections_fall_2023.json": FALL_RECORDS, "sections_spring_2024.json": SPRING_RECORDS}
+        paths = [self.write(name, records) for name, records in dumps.items()]
+
+        def load():
+            with override_settings(BASE_DIR=self.base_dir.name):
+                self.failed = create_terms_parallel(paths, workers=2)
+
+        expected = self.rows_after(lambda: self.create_terms(dumps))
+        # a queue of one section at a time makes the reads wait on the import
+        with mock.patch("banner.management.create_classes.READ_BATCH_SIZE", 1), \
+                mock.patch("banner.management.create_classes.READ_QUEUE_BATCHES", 1):
+            rows = self.rows_after(load)
+        self.assertEqual(self.failed, [])
+        self.assertEqual(rows, expected)
@@ -7,6 +7,7 @@ admin.site.register(TimeBlock)
 admin.site.register(Department)
 admin.site.register(AllocationGroup)
 admin.site.register(DepartmentAllocation)
+admin.site.register(AllocationUsage)
 admin.site.register(Subject)
 admin.site.register(Course)
 admin.site.register(Section)
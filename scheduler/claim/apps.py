@@ -5,3 +5,6 @@ class MyAppConfig(AppConfig):
     name = 'claim'
     verbose_name = 'Teacher Claim'
     version = '1.0'
+
+    def ready(self) -> None:
+        from . import signals  # noqa: F401
@@ -0,0 +1,110 @@
+import re
+from typing import Iterable
+
+from django.db import connection
+from django.db.models import FloatField, Q, QuerySet
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+from .models import Course
+
+# The course live search runs on every keystroke so instead of icontains scans over every
+#   course it matches word prefixes in a SQLite FTS5 table (see the 0013 migration).
+# The import commands rebuild the table and saving a course/ subject updates its rows
+#   (see claim/signals.py). Other databases fall back to Course.live_search_filter
+
+TABLE = "claim_course_search"
+# what the table splits the columns into
+WORD = re.compile(r"\w+")
+# bm25 weights of the columns in the order they are declared
+WEIGHTS = {
+    "subject_code": 10.0,
+    "code": 10.0,
+    "title": 5.0,
+    "description": 1.0,
+}
+# the 0013 migration has its own copy of this
+INSERT_COURSES = f"""
+    INSERT INTO {TABLE}(rowid, subject_code, code, title, description)
+    SELECT course.id, subject.code, course.code, course.title, COALESCE(course.description, '')
+    FROM claim_course AS course
+    INNER JOIN claim_subject AS subject ON subject.id = course.subject_id
+"""
+
+
+class CourseSearch:
+    # database name -> if it has the table (the tests run on another database)
+    _is_available: dict[str, bool] = {}
+
+    @staticmethod
+    def is_available() -> bool:
+        name = connection.settings_dict["NAME"]
+        if name not in CourseSearch._is_available:
+            CourseSearch._is_available[name] = (
+                connection.vendor == "sqlite"
+                and TABLE in connection.introspection.table_names()
+            )
+        return CourseSearch._is_available[name]
+
+    @staticmethod
+    def rebuild():
+        if not CourseSearch.is_available():
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE}")
+            cursor.execute(INSERT_COURSES)
+
+    @staticmethod
+    def update_courses(course_pks: Iterable[int]):
+        """Replaces the rows of the courses (courses that no longer exist are only removed)"""
+        course_pks = list(course_pks)
+        if not course_pks or not CourseSearch.is_available():
+            return
+        placeholders = ", ".join(["%s"] * len(course_pks))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({placeholders})", course_pks)
+            cursor.execute(f"{INSERT_COURSES} WHERE course.id IN ({placeholders})", course_pks)
+
+    @staticmethod
+    def match_expression(search_query: str) -> str | None:
+        """
+        Every word has to be the start of a word in one of the columns. None when the query
+        is not only words (like "C++" or "-") since the table cannot match the rest of it
+        """
+        items = search_query.replace("&nbsp", "").split()
+        if not items or not all(WORD.fullmatch(item) for item in items):
+            return None
+        return " AND ".join(f'"{item}"*' for item in items)
+
+    @staticmethod
+    def search(courses: QuerySet[Course], search_query: str) -> QuerySet[Course]:
+        """
+        The courses that match the query, best matches first. Queries the table cannot
+        answer fall back to Course.live_search_filter and the courses that only it matches
+        (like "ology" that is in the middle of a word) come after the ones the table matches
+        """
+        live_search = Course.live_search_filter(search_query)
+        expression = CourseSearch.match_expression(search_query)
+        if expression is None or not CourseSearch.is_available():
+            return courses.filter(live_search)
+
+        matches = RawSQL(f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s", (expression,))
+        weights = ", ".join(str(weight) for weight in WEIGHTS.values())
+        # an annotation so the result pages can seek on the rank, bm25 is below 0 for
+        #   every match so the other courses go last
+        search_rank = Coalesce(
+            RawSQL(
+                f"""
+                SELECT bm25({TABLE}, {weights}) FROM {TABLE}
+                WHERE {TABLE} MATCH %s AND {TABLE}.rowid = {Course._meta.db_table}.id
+                """,
+                (expression,),
+            ),
+            0.0,
+            output_field=FloatField(),
+        )
+        return (
+            courses.filter(Q(pk__in=matches) | live_search)
+            .annotate(search_rank=search_rank)
+            .order_by("search_rank", "title")
+        )
@@ -0,0 +1,151 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Iterable, Iterator, TypeVar
+
+from django.conf import settings
+from django.db import models
+from django.http import HttpRequest, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=models.Model)
+T = TypeVar("T")
+
+# The related rows that are pretty much always used after looking one of these up
+SELECT_RELATED: dict[str, tuple[str, ...]] = {
+    "claim.Section": ("term", "primary_professor", "course__subject__department"),
+    "claim.Room": ("building",),
+    "claim.TimeBlock": ("start_end_time",),
+    "claim.Meeting": (
+        "time_block__start_end_time",
+        "room__building",
+        "professor",
+        "section__term",
+        "section__course__subject__department",
+    ),
+}
+
+
+@dataclass
+class IdentityMap:
+    """
+    Request scoped cache so that each row is only fetched once per request.
+    Outside of a request (or IdentityMap.scope) everything just goes to the database
+    """
+
+    instances: dict[tuple[type[models.Model], Any], models.Model] = field(
+        default_factory=dict
+    )
+    values: dict[Hashable, Any] = field(default_factory=dict)
+    hits: int = 0
+    misses: int = 0
+
+    @staticmethod
+    def current() -> "IdentityMap | None":
+        return _current_identity_map.get()
+
+    @staticmethod
+    @contextmanager
+    def scope() -> Iterator["IdentityMap"]:
+        identity_map = IdentityMap()
+        token = _current_identity_map.set(identity_map)
+        try:
+            yield identity_map
+        finally:
+            _current_identity_map.reset(token)
+
+    @staticmethod
+    def queryset(model: type[M]) -> models.QuerySet[M]:
+        return model.objects.select_related(  # pyright: ignore
+            *SELECT_RELATED.get(model._meta.label, ())
+        )
+
+    @staticmethod
+    def get(model: type[M], pk: Any) -> M:
+        pk = model._meta.pk.to_python(pk)  # pyright: ignore
+        identity_map = IdentityMap.current()
+        if identity_map is None:
+            return IdentityMap.queryset(model).get(pk=pk)
+        instance = identity_map.instances.get((model, pk))
+        if instance is not None:
+            identity_map.hits += 1
+            return instance  # pyright: ignore
+        identity_map.misses += 1
+        instance = IdentityMap.queryset(model).get(pk=pk)
+        identity_map.instances[(model, pk)] = instance
+        return instance
+
+    @staticmethod
+    def get_many(model: type[M], pks: Iterable[Any]) -> dict[Any, M]:
+        """Like in_bulk but only the rows that were not already seen are queried"""
+        pks = {model._meta.pk.to_python(pk) for pk in pks}  # pyright: ignore
+        identity_map = IdentityMap.current()
+        if identity_map is None:
+            return IdentityMap.queryset(model).in_bulk(pks)
+
+        found: dict[Any, M] = {}
+        missing = []
+        for pk in pks:
+            instance = identity_map.instances.get((model, pk))
+            if instance is None:
+                missing.append(pk)
+            else:
+                found[pk] = instance  # pyright: ignore
+        identity_map.hits += len(found)
+        if missing:
+            identity_map.misses += len(missing)
+            for pk, instance in IdentityMap.queryset(model).in_bulk(missing).items():
+                identity_map.instances[(model, pk)] = instance
+                found[pk] = instance
+        return found
+
+    @staticmethod
+    def remember(*instances: models.Model):
+        identity_map = IdentityMap.current()
+        if identity_map is None:
+            return
+        for instance in instances:
+            identity_map.instances.setdefault((type(instance), instance.pk), instance)
+
+    @staticmethod
+    def memoize(key: Hashable, factory: Callable[[], T]) -> T:
+        """For derived values (like recommendations) that are asked for a lot in a request"""
+        identity_map = IdentityMap.current()
+        if identity_map is None:
+            return factory()
+        if key in identity_map.values:
+            identity_map.hits += 1
+            return identity_map.values[key]
+        identity_map.misses += 1
+        value = factory()
+        identity_map.values[key] = value
+        return value
+
+    @staticmethod
+    def forget(key: Hashable):
+        """So the next memoize of the key asks the factory again"""
+        identity_map = IdentityMap.current()
+        if identity_map is not None:
+            identity_map.values.pop(key, None)
+
+
+_current_identity_map: ContextVar[IdentityMap | None] = ContextVar(
+    "identity_map", default=None
+)
+
+
+class IdentityMapMiddleware:
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        with IdentityMap.scope() as identity_map:
+            response = self.get_response(request)
+
+        if settings.DEBUG:
+            counter = f"hits={identity_map.hits}; misses={identity_map.misses}"
+            logger.debug("identity map %s %s", request.path, counter)
+            response["X-Identity-Map"] = counter
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-18 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('claim', '0010_meeting_room_is_general_purpose'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='section',
+            name='banner_hash',
+            field=models.CharField(blank=True, default=None, max_length=40, null=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.4 on 2026-10-18 20:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_allocation_usage(apps, schema_editor):
+    Meeting = apps.get_model("claim", "Meeting")
+    AllocationUsage = apps.get_model("claim", "AllocationUsage")
+    rows = (
+        Meeting.objects.filter(
+            room__is_general_purpose=True,
+            section__course__subject__department__isnull=False,
+            time_block__allocation_groups__isnull=False,
+        )
+        .values_list(
+            "section__term",
+            "section__course__subject__department",
+            "time_block__allocation_groups",
+        )
+        .annotate(used_rooms=models.Count("room", distinct=True))
+        .order_by()
+    )
+    AllocationUsage.objects.bulk_create(
+        AllocationUsage(term_id=term, department_id=department, allocation_group_id=group, used_rooms=used)
+        for term, department, group, used in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('claim', '0011_section_banner_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AllocationUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('used_rooms', models.IntegerField(default=0)),
+                ('allocation_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocation_usages', to='claim.allocationgroup')),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocation_usages', to='claim.department')),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocation_usages', to='claim.term')),
+            ],
+            options={
+                'unique_together': {('term', 'department', 'allocation_group')},
+            },
+        ),
+        migrations.RunPython(count_allocation_usage, migrations.RunPython.noop),
+    ]
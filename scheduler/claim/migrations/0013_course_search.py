@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_course_search(apps, schema_editor):
+    # only SQLite has FTS5, the other databases use the icontains search
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE claim_course_search "
+            "USING fts5(subject_code, code, title, description, prefix='1 2 3')"
+        )
+    except OperationalError:
+        # SQLite was built without FTS5
+        return
+    # a frozen copy of claim.course_search.INSERT_COURSES, a migration has to keep doing
+    #   what it did when it was written even if the app code changes later
+    schema_editor.execute(
+        "INSERT INTO claim_course_search(rowid, subject_code, code, title, description) "
+        "SELECT course.id, subject.code, course.code, course.title, COALESCE(course.description, '') "
+        "FROM claim_course AS course "
+        "INNER JOIN claim_subject AS subject ON subject.id = course.subject_id"
+    )
+
+
+def drop_course_search(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS claim_course_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('claim', '0012_allocationusage'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_course_search, drop_course_search),
+    ]
@@ -1,12 +1,18 @@
 import math
+import uuid
 from dataclasses import dataclass
 from datetime import time, timedelta
 from typing import TYPE_CHECKING, TypedDict
 
 from authentication.models import Professor
-from django.db import models
-from django.db.models import Case, Count, IntegerField, Q, Value, When
+from django.db import models, transaction
+from django.db.models import Case, Count, IntegerField, Prefetch, Q, Value, When
 from django.db.models.query import QuerySet
+from django.http import QueryDict
+
+from .identity_map import IdentityMap
+from .pagination import KeysetPage
+from .timetable import OfficialTimeBlock, Timetable
 
 if TYPE_CHECKING:
     from request.models import *
@@ -77,64 +83,119 @@ class Building(models.Model):
         include_general: bool,
         sections_to_exclude: set["Section"] | None = None,
     ) -> QuerySet["Room"]:
-        in_time_frame = Q(
-            meetings__section__term=term,
-            meetings__time_block__day=day,
-            meetings__time_block__start_end_time__start__lte=end_time,
-            meetings__time_block__start_end_time__end__gte=start_time,
+        taken_meetings = Meeting.objects.filter(
+            room__isnull=False,
+            section__term=term,
+            time_block__day=day,
+            time_block__start_end_time__start__lte=end_time,
+            time_block__start_end_time__end__gte=start_time,
         )
-        # I am not sure why an exclude does not work
-        if sections_to_exclude is None:
-            taken_rooms = self.rooms.filter(in_time_frame)
-            open_rooms = self.rooms.exclude(pk__in=taken_rooms)
-        else:
-            taken_rooms = self.rooms.filter(
-                (~Q(meetings__section__in=sections_to_exclude)) & in_time_frame
-            )
-            open_rooms = self.rooms.exclude(pk__in=taken_rooms)
+        if sections_to_exclude is not None:
+            taken_meetings = taken_meetings.exclude(section__in=sections_to_exclude)
+        open_rooms = self.rooms.exclude(pk__in=taken_meetings.values("room"))
 
         if include_general:
             return open_rooms
 
         return open_rooms.exclude(is_general_purpose=True)
 
+    def get_available_rooms_in_windows(
+        self,
+        windows: list[tuple[str, time | timedelta, time | timedelta]],
+        term: "Term",
+        include_general: bool | list[bool],
+        sections_to_exclude: set["Section"] | None = None,
+    ) -> list[list["Room"]]:
+        """
+        get_available_rooms for every (day, start, end) window at once,
+        include_general can also be given for each window
+        """
+        from .occupancy import TermOccupancy
+
+        occupancy = TermOccupancy.get(term.pk)
+        available_room_pks = occupancy.available_rooms_in_windows(
+            building=self.pk,
+            windows=windows,
+            include_general=include_general,
+            sections_to_exclude=None
+            if sections_to_exclude is None
+            else {section.pk for section in sections_to_exclude},
+        )
+        rooms = IdentityMap.get_many(
+            Room, {room_pk for room_pks in available_room_pks for room_pk in room_pks}
+        )
+        return [[rooms[room_pk] for room_pk in room_pks] for room_pks in available_room_pks]
+
     def get_available_rooms_in_number(
         self, number: int, term: "Term", include_general: bool, both_open: bool = True
-    ):
-        in_time_blocks = Q()
-
-        for time_block in TimeBlock.objects.filter(number=number).all():
-            in_time_block = Q(
-                meetings__section__term=term,
-                meetings__time_block__day=time_block.day,
-                meetings__time_block__start_end_time__start__lte=time_block.start_end_time.end,
-                meetings__time_block__start_end_time__end__gte=time_block.start_end_time.start,
+    ) -> QuerySet["Room"]:
+        return Building.get_rooms_available_in_number(
+            number, term, include_general, both_open, buildings=[self]
+        )
+
+    @staticmethod
+    def get_rooms_available_in_number(
+        number: int,
+        term: "Term",
+        include_general: bool,
+        both_open: bool = True,
+        buildings: list["Building"] | None = None,
+    ) -> QuerySet["Room"]:
+        """
+        Rooms (of the buildings or of every building) that are open in every time block
+        of the number or with both_open=False in at least one of them
+        """
+        time_blocks = [
+            time_block
+            for time_block in Timetable.get().official_time_blocks
+            if time_block.number == number
+        ]
+        if not time_blocks:
+            return Room.objects.none()
+
+        # how many meetings of the term overlap each time block
+        overlaps = {
+            f"overlaps_{i}": Count(
+                "meetings",
+                filter=Q(
+                    meetings__section__term=term,
+                    meetings__time_block__day=time_block.day,
+                    meetings__time_block__start_end_time__start__lte=time_block.end,
+                    meetings__time_block__start_end_time__end__gte=time_block.start,
+                ),
             )
+            for i, time_block in enumerate(time_blocks)
+        }
+        is_open = [Q(**{overlap: 0}) for overlap in overlaps]
+        open_in_number = Q()
+        for is_open_in_time_block in is_open:
             if both_open:
-                in_time_blocks |= in_time_block
+                open_in_number &= is_open_in_time_block
             else:
-                in_time_blocks &= in_time_block
-
-        taken_rooms = self.rooms.filter(in_time_blocks)
-        open_rooms = self.rooms.exclude(pk__in=taken_rooms)
+                open_in_number |= is_open_in_time_block
 
+        rooms = Room.objects.filter(building__isnull=False)
+        if buildings is not None:
+            rooms = rooms.filter(building__in=buildings)
         if not include_general:
-            return open_rooms.distinct()
-
-        return open_rooms.exclude(is_general_purpose=True).distinct()
+            rooms = rooms.exclude(is_general_purpose=True)
+        return (
+            rooms.annotate(**overlaps)
+            .filter(open_in_number)
+            .order_by("building", "number")
+        )
 
     @staticmethod
-    def recommend(course: "Course", term: "Term") -> "Building":
-        building_counts = Building.objects.annotate(
-            count=Count(
-                "rooms__meetings__section",
-                filter=Q(
-                    rooms__meetings__section__course=course,
-                    rooms__meetings__section__term=term,
-                ),
-            )
+    def recommend(course: "Course", term: "Term") -> "Building | None":
+        from .recommendations import BuildingRecommendations
+
+        building = BuildingRecommendations.get(term).recommend(
+            course.pk, course.subject_id  # pyright: ignore
         )
-        return building_counts.order_by("-count")[0]
+        if building is None:
+            # nothing in the term has a room yet (None if there are no buildings either)
+            return Building.objects.order_by("pk").first()
+        return IdentityMap.get(Building, building)
 
 
 class Room(models.Model):
@@ -244,22 +305,249 @@ class DepartmentAllocation(models.Model):
     def __repr__(self) -> str:
         return f"number of classroom={self.number_of_classrooms}, time block={self.allocation_group.time_blocks.all()}, department={self.department}"
 
-    def count_rooms(self, term: "Term") -> int:
-        return (
-            Room.objects.filter(
-                meetings__section__course__subject__department=self.department,
-                meetings__section__term=term,
-                is_general_purpose=True,
-                meetings__time_block__in=self.allocation_group.time_blocks.all(),
+    @staticmethod
+    def get_usage(term: "Term | int | str") -> dict[tuple[int, int], int]:
+        """(department, allocation group) -> general purpose rooms used in the term"""
+        term_pk = term.pk if isinstance(term, Term) else int(term)
+
+        def usage() -> dict[tuple[int, int], int]:
+            rows = AllocationUsage.objects.filter(term=term_pk).values_list(
+                "department", "allocation_group", "used_rooms"
             )
-            .distinct()
-            .count()
+            return {(department, group): used for department, group, used in rows}
+
+        return IdentityMap.memoize((ALLOCATION_USAGE_KEY, term_pk), usage)
+
+    def count_rooms(self, term: "Term | int | str") -> int:
+        return DepartmentAllocation.get_usage(term).get(
+            (self.department_id, self.allocation_group_id), 0  # pyright: ignore
         )
 
-    def exceeds_allocation(self, term: "Term", amount_adding=1):
+    def exceeds_allocation(self, term: "Term | int | str", amount_adding=1):
         return self.count_rooms(term) + amount_adding > self.number_of_classrooms
 
 
+# (term, department, allocation group)
+AllocationUsageKey = tuple[int, int, int]
+ALLOCATION_USAGE_KEY = "allocation_usage"
+
+
+class AllocationUsage(models.Model):
+    """
+    How many general purpose rooms a department uses in an allocation group for a term.
+    Kept up to date when meetings/ rooms are saved (see claim/signals.py) so
+    DepartmentAllocation.count_rooms does not have to count them
+    """
+
+    verbose_name = "Allocation Usage"
+
+    used_rooms = models.IntegerField(default=0)
+
+    term = models.ForeignKey(
+        "Term", related_name="allocation_usages", on_delete=models.CASCADE
+    )
+    department = models.ForeignKey(
+        Department, related_name="allocation_usages", on_delete=models.CASCADE
+    )
+    allocation_group = models.ForeignKey(
+        AllocationGroup, related_name="allocation_usages", on_delete=models.CASCADE
+    )
+
+    class Meta:  # pyright: ignore
+        unique_together = ("term", "department", "allocation_group")
+
+    def __repr__(self) -> str:
+        return f"term={self.term_id}, department={self.department_id}, allocation group={self.allocation_group_id}, used rooms={self.used_rooms}"  # pyright: ignore
+
+    @staticmethod
+    def count(meetings: QuerySet["Meeting"]) -> dict[AllocationUsageKey, int]:
+        """Counts the usage from the meetings themselves"""
+        rows = (
+            meetings.filter(
+                room__is_general_purpose=True,
+                section__course__subject__department__isnull=False,
+                time_block__allocation_groups__isnull=False,
+            )
+            .values_list(
+                "section__term",
+                "section__course__subject__department",
+                "time_block__allocation_groups",
+            )
+            .annotate(used_rooms=Count("room", distinct=True))
+            .order_by()
+        )
+        return {(term, department, group): used for term, department, group, used in rows}
+
+    @staticmethod
+    def keys_of(meetings: QuerySet["Meeting"]) -> set[AllocationUsageKey]:
+        """The usages that the meetings count towards (whatever their room is)"""
+        return set(
+            meetings.filter(
+                section__course__subject__department__isnull=False,
+                time_block__allocation_groups__isnull=False,
+            )
+            .values_list(
+                "section__term",
+                "section__course__subject__department",
+                "time_block__allocation_groups",
+            )
+            .distinct()
+        )
+
+    @staticmethod
+    def save_counts(counts: dict[AllocationUsageKey, int]):
+        AllocationUsage.objects.bulk_create(
+            [
+                AllocationUsage(
+                    term_id=term,
+                    department_id=department,
+                    allocation_group_id=group,
+                    used_rooms=used,
+                )
+                for (term, department, group), used in counts.items()
+                if used
+            ],
+            update_conflicts=True,
+            unique_fields=["term", "department", "allocation_group"],
+            update_fields=["used_rooms"],
+        )
+
+    @staticmethod
+    def refresh(keys: set[AllocationUsageKey]):
+        """Recounts the usages of the keys (in the current transaction)"""
+        if not keys:
+            return
+        terms, departments, groups = (set(column) for column in zip(*keys))
+        counts = AllocationUsage.count(
+            Meeting.objects.filter(
+                section__term__in=terms,
+                section__course__subject__department__in=departments,
+                time_block__allocation_groups__in=groups,
+            )
+        )
+        counts = {key: counts.get(key, 0) for key in keys}
+
+        unused = Q(pk__in=[])
+        for (term, department, group), used in counts.items():
+            if not used:
+                unused |= Q(term=term, department=department, allocation_group=group)
+        AllocationUsage.objects.filter(unused).delete()
+        AllocationUsage.save_counts(counts)
+        # so the rest of the request sees the new counts
+        for term in terms:
+            IdentityMap.forget((ALLOCATION_USAGE_KEY, term))
+
+    @staticmethod
+    def rebuild(term: "Term | int | None" = None) -> int:
+        """Recounts every usage (of the term) from scratch"""
+        usages = AllocationUsage.objects.all()
+        meetings = Meeting.objects.all()
+        if term is not None:
+            usages = usages.filter(term=term)
+            meetings = meetings.filter(section__term=term)
+        counts = AllocationUsage.count(meetings)
+        usages.delete()
+        AllocationUsage.save_counts(counts)
+        term_pks = (
+            Term.objects.values_list("pk", flat=True)
+            if term is None
+            else [term.pk if isinstance(term, Term) else term]
+        )
+        for term_pk in term_pks:
+            IdentityMap.forget((ALLOCATION_USAGE_KEY, term_pk))
+        return len(counts)
+
+    @staticmethod
+    def get_stale(
+        term: "Term | int | None" = None,
+    ) -> dict[AllocationUsageKey, tuple[int, int]]:
+        """key -> (stored, counted) of every usage that is out of date"""
+        usages = AllocationUsage.objects.all()
+        meetings = Meeting.objects.all()
+        if term is not None:
+            usages = usages.filter(term=term)
+            meetings = meetings.filter(section__term=term)
+        stored = {
+            (term_pk, department, group): used
+            for term_pk, department, group, used in usages.values_list(
+                "term", "department", "allocation_group", "used_rooms"
+            )
+        }
+        counted = AllocationUsage.count(meetings)
+        return {
+            key: (stored.get(key, 0), counted.get(key, 0))
+            for key in stored.keys() | counted.keys()
+            if stored.get(key, 0) != counted.get(key, 0)
+        }
+
+
+class SnapshotVersion(models.Model):
+    """
+    Stamps of the data the process snapshots (claim/occupancy.py, claim/timetable.py...)
+    are built from. A stamp is changed in the same transaction as its data so every
+    process can tell that its snapshot is out of date. Random stamps instead of a counter
+    so a rolled back change can never be mistaken for a later one
+    """
+
+    verbose_name = "Snapshot Version"
+    TIMETABLE = "timetable"
+
+    name = models.CharField(max_length=50, unique=True)
+    stamp = models.CharField(max_length=32, default="")
+
+    def __repr__(self) -> str:
+        return f"name={self.name}, stamp={self.stamp}"
+
+    @staticmethod
+    def term_name(term: "Term | int") -> str:
+        term_pk = term.pk if isinstance(term, Term) else term
+        return f"term.{term_pk}"
+
+    @staticmethod
+    def current() -> dict[str, str]:
+        """name -> stamp (read once per request)"""
+
+        def stamps() -> dict[str, str]:
+            return dict(SnapshotVersion.objects.values_list("name", "stamp"))
+
+        return IdentityMap.memoize(SNAPSHOT_VERSIONS_KEY, stamps)
+
+    @staticmethod
+    def stamp_of(name: str) -> str:
+        return SnapshotVersion.current().get(name, "")
+
+    @staticmethod
+    def bump(*names: str) -> dict[str, tuple[str, str]]:
+        """New stamps for the names (in the current transaction), name -> (previous, new)"""
+        stamps: dict[str, tuple[str, str]] = {}
+        # no savepoint, it is part of the change that called it
+        with transaction.atomic(savepoint=False):
+            versions = SnapshotVersion.objects.select_for_update().in_bulk(
+                names, field_name="name"
+            )
+            for name in names:
+                version = versions.get(name)
+                stamps[name] = ("" if version is None else version.stamp, uuid.uuid4().hex)
+            SnapshotVersion.objects.bulk_create(
+                [SnapshotVersion(name=name, stamp=new) for name, (_, new) in stamps.items()],
+                update_conflicts=True,
+                unique_fields=["name"],
+                update_fields=["stamp"],
+            )
+        # so the rest of the request sees the new stamps
+        IdentityMap.forget(SNAPSHOT_VERSIONS_KEY)
+        return stamps
+
+    @staticmethod
+    def bump_terms() -> dict[str, tuple[str, str]]:
+        return SnapshotVersion.bump(
+            *map(SnapshotVersion.term_name, Term.objects.values_list("pk", flat=True))
+        )
+
+
+SNAPSHOT_VERSIONS_KEY = "snapshot_versions"
+
+
 class NumberIcon(TypedDict):
     start: time
     end: time
@@ -312,42 +600,40 @@ class TimeBlock(models.Model):
     @staticmethod
     def get_official_time_blocks(
         start: time | timedelta | None, end: time | timedelta, day: str | None
-    ) -> QuerySet["TimeBlock"]:
-        time_blocks = TimeBlock.objects.filter(number__isnull=False).filter(
-            day=day, start_end_time__start__lte=end, start_end_time__end__gte=start
-        )
-        return time_blocks
+    ) -> list[OfficialTimeBlock]:
+        return Timetable.get().official(start, end, day)
 
     @staticmethod
     def get_number_icons() -> list[NumberIcon]:
+        official_time_blocks = Timetable.get().official_time_blocks
         number_icons: list[NumberIcon] = []
-        time_blocks = (
-            TimeBlock.objects.filter(number__isnull=False)
-            .exclude(number__in=TimeBlock.LONG_NIGHT_NUMBERS)
-            .exclude(number__in=TimeBlock.SHORT_NIGHT_NUMBERS)
-        )
-        for time_block in time_blocks.all():
+        for time_block in official_time_blocks:
+            if time_block.number in TimeBlock.LONG_NIGHT_NUMBERS:
+                continue
+            if time_block.number in TimeBlock.SHORT_NIGHT_NUMBERS:
+                continue
             number_icons.append(
                 {
                     "day": time_block.day,
-                    "start": time_block.start_end_time.start,
-                    "end": time_block.start_end_time.end,
+                    "start": time_block.start,
+                    "end": time_block.end,
                     "numbers": str(time_block.number),
                 }
             )
-        other_time_blocks = TimeBlock.objects.filter(number__isnull=False).filter(
-            number__in=TimeBlock.SHORT_NIGHT_NUMBERS
-        )
-        for time_block in other_time_blocks.all():
-            bigger_time_block = TimeBlock.objects.get(
-                number__in=TimeBlock.LONG_NIGHT_NUMBERS, day=time_block.day
-            )
+        long_night_numbers = {
+            time_block.day: time_block.number
+            for time_block in official_time_blocks
+            if time_block.number in TimeBlock.LONG_NIGHT_NUMBERS
+        }
+        for time_block in official_time_blocks:
+            if time_block.number not in TimeBlock.SHORT_NIGHT_NUMBERS:
+                continue
             number_icons.append(
                 {
                     "day": time_block.day,
-                    "start": time_block.start_end_time.start,
-                    "end": time_block.start_end_time.end,
-                    "numbers": f"{time_block.number}/{bigger_time_block.number}",
+                    "start": time_block.start,
+                    "end": time_block.end,
+                    "numbers": f"{time_block.number}/{long_night_numbers[time_block.day]}",
                 }
             )
 
@@ -384,49 +670,35 @@ class TimeBlock(models.Model):
 
         if block not in blocks:
             block = TimeBlock.ONE_BLOCK
+        time_blocks = [
+            time_block
+            for time_block in Timetable.get().official_time_blocks
+            if time_block.day == day_code
+        ]
         start_end_times: list[tuple[time, time]] = []
-        # could def write a better query with something like .values()
         if block == TimeBlock.ONE_BLOCK:
-            time_blocks = (
-                TimeBlock.objects.exclude(number__in=TimeBlock.LONG_NIGHT_NUMBERS)
-                .filter(day=day_code)
-                .filter(number__isnull=False)
-            )
-            for time_block in time_blocks.all():
-                start_end_times.append(
-                    (time_block.start_end_time.start, time_block.start_end_time.end)
-                )
+            for time_block in time_blocks:
+                if time_block.number in TimeBlock.LONG_NIGHT_NUMBERS:
+                    continue
+                start_end_times.append((time_block.start, time_block.end))
         elif block == TimeBlock.DOUBLE_BLOCK:
-            time_blocks = (
-                TimeBlock.objects.exclude(number__in=TimeBlock.LONG_NIGHT_NUMBERS)
-                .filter(day=day_code)
-                .filter(number__isnull=False)
-                .exclude(start_end_time__start=time(hour=20))
-                .exclude(start_end_time__start=time(hour=15, minute=30), day=Day.FRIDAY)
-            )
-            for time_block in time_blocks.all():
-                start = time_block.start_end_time.start
+            for time_block in time_blocks:
+                if time_block.number in TimeBlock.LONG_NIGHT_NUMBERS:
+                    continue
+                start = time_block.start
+                if start == time(hour=20):
+                    continue
+                if start == time(hour=15, minute=30) and day_code == Day.FRIDAY:
+                    continue
                 start_end_times.append(
                     (start, sum_unlike(start, TimeBlock.DOUBLE_BLOCK))
                 )
-        elif block == TimeBlock.DOUBLE_BLOCK_NIGHT:
-            time_blocks = TimeBlock.objects.filter(day=day_code).filter(
-                number__in=TimeBlock.LONG_NIGHT_NUMBERS
-            )
-            for time_block in time_blocks.all():
-                start = time_block.start_end_time.start
-                start_end_times.append(
-                    (start, sum_unlike(start, TimeBlock.DOUBLE_BLOCK_NIGHT))
-                )
-        elif block == TimeBlock.TRIPLE_NIGHT:
-            time_blocks = TimeBlock.objects.filter(day=day_code).filter(
-                number__in=TimeBlock.LONG_NIGHT_NUMBERS
-            )
-            for time_block in time_blocks.all():
-                start = time_block.start_end_time.start
-                start_end_times.append(
-                    (start, sum_unlike(start, TimeBlock.TRIPLE_NIGHT))
-                )
+        elif block in (TimeBlock.DOUBLE_BLOCK_NIGHT, TimeBlock.TRIPLE_NIGHT):
+            for time_block in time_blocks:
+                if time_block.number not in TimeBlock.LONG_NIGHT_NUMBERS:
+                    continue
+                start = time_block.start
+                start_end_times.append((start, sum_unlike(start, block)))
 
         return start_end_times
 
@@ -540,7 +812,11 @@ class Course(models.Model):
         department: Department | None = None,
         subject: Subject | None = None,
     ) -> tuple[QuerySet["Course"], bool]:
-        courses = Course.objects.filter(sections__term=term_pk).distinct()
+        from .course_search import CourseSearch
+
+        courses = Course.objects.filter(
+            pk__in=Section.objects.filter(term=term_pk).values("course")
+        ).order_by("title")
         courses_less_filtered = courses
         if subject is None:
             if department is not None:
@@ -549,15 +825,13 @@ class Course(models.Model):
         else:
             courses = courses.filter(subject=subject)
 
-        query_filter = None
         if query is not None:
-            query_filter = Course.live_search_filter(query)
-            courses = courses.filter(query_filter)
-        if len(courses) > 0:
+            courses = CourseSearch.search(courses, query)
+        if courses.exists():
             return courses, True
 
-        if query_filter is not None:
-            courses_less_filtered = courses_less_filtered.filter(query_filter)
+        if query is not None:
+            courses_less_filtered = CourseSearch.search(courses_less_filtered, query)
         return courses_less_filtered, False
 
 
@@ -607,6 +881,8 @@ class Section(models.Model):
     campus = models.CharField(max_length=20)
 
     soft_cap = models.IntegerField(blank=True, default=0)
+    # hash of the banner record this section was last imported from
+    banner_hash = models.CharField(max_length=40, blank=True, null=True, default=None)
 
     term = models.ForeignKey(
         Term, on_delete=models.CASCADE, related_name="sections", max_length=20
@@ -637,8 +913,12 @@ class Section(models.Model):
     def __str__(self) -> str:
         return f"{self.course.subject} {self.course.code}-{self.number}"
 
-    def meetings_sorted(self) -> QuerySet["Meeting"]:
-        return self.meetings.order_by(
+    # filled by Section.with_rows
+    sorted_meetings: list["Meeting"]
+
+    @staticmethod
+    def meeting_order() -> tuple:
+        return (
             models.Case(
                 models.When(time_block__day=Day.MONDAY, then=1),
                 models.When(time_block__day=Day.TUESDAY, then=2),
@@ -651,6 +931,22 @@ class Section(models.Model):
             "time_block__start_end_time__start",
         )
 
+    def meetings_sorted(self) -> QuerySet["Meeting"]:
+        return self.meetings.order_by(*Section.meeting_order())
+
+    @staticmethod
+    def with_rows(section_qs: QuerySet["Section"]) -> QuerySet["Section"]:
+        """
+        Everything a row of sections.html shows so a page of sections is 2 queries.
+        The meetings are in section.sorted_meetings in the order of meetings_sorted
+        """
+        meetings = Meeting.objects.select_related(
+            "time_block__start_end_time", "room__building"
+        ).order_by(*Section.meeting_order())
+        return section_qs.select_related("course__subject").prefetch_related(
+            Prefetch("meetings", queryset=meetings, to_attr="sorted_meetings")
+        )
+
     @staticmethod
     def sort_sections(
         section_qs: QuerySet, sort_column: str | None, sort_type: str | None
@@ -670,6 +966,22 @@ class Section(models.Model):
 
         return section_qs
 
+    @staticmethod
+    def paginate(section_qs: QuerySet["Section"], data: QueryDict) -> KeysetPage["Section"]:
+        """The page of the (sorted) sections asked for by the after/ before cursors of the data"""
+        try:
+            start = int(data.get("start", 0))
+        except ValueError:
+            start = 0
+        return KeysetPage.paginate(
+            section_qs,
+            Section.SEARCH_INTERVAL,
+            after=data.get("after"),
+            before=data.get("before"),
+            start=start,
+            count=True,
+        )
+
 
 class Meeting(models.Model):
     verbose_name = "Meeting"
@@ -726,6 +1038,29 @@ class Meeting(models.Model):
     )
     student_minimum = models.IntegerField(null=True, blank=True)
 
+    # what the allocation usage of a meeting depends on
+    USAGE_FIELDS = ("section_id", "time_block_id", "room_id")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        meeting = super().from_db(db, field_names, values)
+        if all(name in field_names for name in Meeting.USAGE_FIELDS):
+            meeting.remember_usage_fields()
+        return meeting
+
+    def remember_usage_fields(self):
+        """What the usage receivers compare the next save with (see claim/signals.py)"""
+        self._loaded_usage_fields = {
+            name: getattr(self, name) for name in Meeting.USAGE_FIELDS
+        }
+
+    def are_unchanged(self, *names: str) -> bool:
+        """If the fields are the same as when the meeting was loaded/ last saved"""
+        loaded: dict | None = getattr(self, "_loaded_usage_fields", None)
+        return loaded is not None and all(
+            loaded[name] == getattr(self, name) for name in names
+        )
+
     def get_duration(self) -> timedelta:
         time_block = self.time_block
         if time_block is None:
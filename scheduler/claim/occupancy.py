@@ -0,0 +1,600 @@
+import dataclasses
+import threading
+from dataclasses import dataclass, field
+from datetime import time, timedelta
+from typing import Iterable
+
+import numpy as np
+from django.db.models import QuerySet
+
+from .models import (
+    Day,
+    DepartmentAllocation,
+    Meeting,
+    Room,
+    SnapshotVersion,
+    Term,
+    TimeBlock,
+)
+from .timetable import OfficialTimeBlock, Timetable, time_to_minutes
+
+# Loading every meeting of a term once and answering the open slot questions in python
+#   is a lot faster than building giant OR'd Q objects for every calendar refresh.
+# Each index is shared by the whole process and knows the SnapshotVersion stamp of its
+#   term it was loaded at. Saving/ deleting a meeting (or anything else an index is built
+#   from) changes the stamp in the same transaction so every process reloads the term.
+#   The process that saved a meeting swaps in a copy with the meeting moved instead, an
+#   index is never changed once other threads can read it. See claim/signals.py
+
+
+@dataclass(frozen=True)
+class Occupation:
+    meeting: int
+    section: int
+    course: int
+    department: int | None
+    room: int | None
+    professor: int | None
+    time_block: int
+    day: str
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class RoomInfo:
+    pk: int
+    building: int | None
+    is_general_purpose: bool
+    capacity: int | None = None
+
+
+# used so days can be compared in numpy arrays
+DAY_TO_INDEX = {code: i for i, code in enumerate(Day.CODE_TO_VERBOSE)}
+
+# The room bitmap has a bit for every 5 minutes of a day. Overlaps are inclusive so
+#   both the start and the end point of an occupation get a bit
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES + 1
+
+
+def _slots(start: int, end: int) -> slice:
+    # rounded outwards so times that are not on a slot boundary are never missed
+    return slice(start // SLOT_MINUTES, -(-end // SLOT_MINUTES) + 1)
+
+
+def _is_on_slots(start: int, end: int) -> bool:
+    return start % SLOT_MINUTES == 0 and end % SLOT_MINUTES == 0
+
+
+@dataclass(frozen=True)
+class OccupancyArrays:
+    """Column arrays of every occupation in a term, nullable foreign keys are -1"""
+
+    meeting: np.ndarray
+    section: np.ndarray
+    room: np.ndarray
+    professor: np.ndarray
+    day: np.ndarray
+    start: np.ndarray
+    end: np.ndarray
+
+
+# occupations of one room/ professor/ course sorted by their start for each day
+DayIntervals = dict[str, list[Occupation]]
+# (day, start, end)
+Window = tuple[str, time | timedelta, time | timedelta]
+
+
+def _add_interval(intervals: dict[int, DayIntervals], key: int, occupation: Occupation):
+    intervals.setdefault(key, {}).setdefault(occupation.day, []).append(occupation)
+
+
+def _set_day(
+    intervals: dict[int, DayIntervals], key: int, day: str, occupations: list[Occupation]
+):
+    # a new dict so the index this one was copied from keeps its intervals
+    days = dict(intervals.get(key, {}))
+    days[day] = occupations
+    intervals[key] = days
+
+
+def _interval_order(occupation: Occupation) -> tuple[int, int, int]:
+    return occupation.start, occupation.end, occupation.meeting
+
+
+def _sort_intervals(intervals: dict[int, DayIntervals]):
+    for days in intervals.values():
+        for occupations in days.values():
+            occupations.sort(key=_interval_order)
+
+
+@dataclass
+class TermOccupancy:
+    term: int
+    # SnapshotVersion stamp of the term
+    version: str = ""
+    # stamp of the timetable the time blocks and allocations below were taken from
+    timetable_version: str = ""
+    occupations: dict[int, Occupation] = field(default_factory=dict)
+    rooms: dict[int, RoomInfo] = field(default_factory=dict)
+    # position of each room in the bitmap
+    room_positions: dict[int, int] = field(default_factory=dict)
+    building_rooms: dict[int, list[int]] = field(default_factory=dict)
+    by_room: dict[int, DayIntervals] = field(default_factory=dict)
+    by_professor: dict[int, DayIntervals] = field(default_factory=dict)
+    by_course: dict[int, DayIntervals] = field(default_factory=dict)
+    official_time_blocks: list[OfficialTimeBlock] = field(default_factory=list)
+    time_block_groups: dict[int, frozenset[int]] = field(default_factory=dict)
+    # (department, allocation group) -> number of classrooms (the rooms used are counted
+    #   by AllocationUsage)
+    department_allocations: dict[tuple[int, int], int] = field(default_factory=dict)
+    _arrays: OccupancyArrays | None = field(default=None, repr=False)
+    _room_slots: np.ndarray | None = field(default=None, repr=False)
+    # rooms with occupations that are not on slot boundaries (their bits are only a hint)
+    _inexact_rooms: set[int] = field(default_factory=set, repr=False)
+
+    _indexes = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get(term: Term | int) -> "TermOccupancy":
+        term_pk = term if isinstance(term, int) else term.pk
+        version = SnapshotVersion.stamp_of(SnapshotVersion.term_name(term_pk))
+        with TermOccupancy._lock:
+            index = TermOccupancy._indexes.get(term_pk)
+        if (
+            index is not None
+            and index.version == version
+            and index.timetable_version == Timetable.current_version()
+        ):
+            return index
+        index = TermOccupancy.load(term_pk, version)
+        with TermOccupancy._lock:
+            TermOccupancy._indexes[term_pk] = index
+        return index
+
+    @staticmethod
+    def invalidate(term_pk: int | None = None):
+        """
+        Every process reloads the term (or every term) once the transaction commits. The
+        building recommendations are kept by the same term stamps so they are reloaded too
+        """
+        if term_pk is None:
+            SnapshotVersion.bump_terms()
+        else:
+            SnapshotVersion.bump(SnapshotVersion.term_name(term_pk))
+
+    @staticmethod
+    def load(term_pk: int, version: str = "") -> "TermOccupancy":
+        index = TermOccupancy(term=term_pk, version=version)
+
+        for room in Room.objects.values("pk", "building", "is_general_purpose", "capacity"):
+            index.rooms[room["pk"]] = RoomInfo(
+                pk=room["pk"],
+                building=room["building"],
+                is_general_purpose=room["is_general_purpose"] is True,
+                capacity=room["capacity"],
+            )
+            index.room_positions[room["pk"]] = len(index.room_positions)
+            if room["building"] is not None:
+                index.building_rooms.setdefault(room["building"], []).append(room["pk"])
+
+        timetable = Timetable.get()
+        index.timetable_version = timetable.version
+        index.official_time_blocks = timetable.official_time_blocks
+        index.time_block_groups = timetable.time_block_groups
+        for department_allocation in timetable.department_allocations:
+            key = (
+                department_allocation.department_id,  # pyright: ignore
+                department_allocation.allocation_group_id,  # pyright: ignore
+            )
+            # same as .filter(...).first()
+            index.department_allocations.setdefault(
+                key, department_allocation.number_of_classrooms
+            )
+
+        for _, occupation in TermOccupancy.occupations_of(
+            Meeting.objects.filter(section__term=term_pk)
+        ):
+            index.add(occupation)
+        _sort_intervals(index.by_room)
+        _sort_intervals(index.by_professor)
+        _sort_intervals(index.by_course)
+
+        return index
+
+    @staticmethod
+    def occupations_of(meetings: QuerySet[Meeting]) -> Iterable[tuple[int, Occupation]]:
+        """(term, occupation) of every meeting with a time block"""
+        meetings = meetings.filter(time_block__isnull=False).values(
+            "pk",
+            "section",
+            "section__term",
+            "section__course",
+            "section__course__subject__department",
+            "room",
+            "professor",
+            "time_block",
+            "time_block__day",
+            "time_block__start_end_time__start",
+            "time_block__start_end_time__end",
+        )
+        for meeting in meetings:
+            yield meeting["section__term"], Occupation(
+                meeting=meeting["pk"],
+                section=meeting["section"],
+                course=meeting["section__course"],
+                department=meeting["section__course__subject__department"],
+                room=meeting["room"],
+                professor=meeting["professor"],
+                time_block=meeting["time_block"],
+                day=meeting["time_block__day"],
+                start=time_to_minutes(meeting["time_block__start_end_time__start"]),
+                end=time_to_minutes(meeting["time_block__start_end_time__end"]),
+            )
+
+    @staticmethod
+    def update_meeting(meeting_pk: int, term_pk: int, previous: str, version: str):
+        """
+        Moves a meeting that was saved/ deleted in the loaded index of its term instead of
+        throwing the whole term away. previous/ version are the stamps of the term before/
+        after the change, an index that missed other changes is left to be reloaded
+        """
+        with TermOccupancy._lock:
+            index = TermOccupancy._indexes.get(term_pk)
+        if index is None or index.version != previous:
+            return
+        occupations = TermOccupancy.occupations_of(Meeting.objects.filter(pk=meeting_pk))
+        occupation = next((occupation for _, occupation in occupations), None)
+        moved = index.moved(meeting_pk, occupation, version)
+        with TermOccupancy._lock:
+            # unless another thread already reloaded the term
+            if TermOccupancy._indexes.get(term_pk) is index:
+                TermOccupancy._indexes[term_pk] = moved
+
+    def moved(
+        self, meeting_pk: int, occupation: Occupation | None, version: str
+    ) -> "TermOccupancy":
+        """A copy with the meeting moved to the occupation (or removed), self is unchanged"""
+        index = dataclasses.replace(
+            self,
+            version=version,
+            occupations=dict(self.occupations),
+            by_room=dict(self.by_room),
+            by_professor=dict(self.by_professor),
+            by_course=dict(self.by_course),
+            _arrays=None,
+            _room_slots=None if self._room_slots is None else self._room_slots.copy(),
+            _inexact_rooms=set(self._inexact_rooms),
+        )
+        index.remove(meeting_pk)
+        if occupation is not None:
+            index.insert(occupation)
+        return index
+
+    def add(self, occupation: Occupation):
+        """Only while loading, insert/ remove are for copies (see moved)"""
+        self.occupations[occupation.meeting] = occupation
+        self._arrays = None
+        if occupation.room is not None:
+            _add_interval(self.by_room, occupation.room, occupation)
+        if occupation.professor is not None:
+            _add_interval(self.by_professor, occupation.professor, occupation)
+        _add_interval(self.by_course, occupation.course, occupation)
+
+    def _interval_sources(
+        self, occupation: Occupation
+    ) -> list[tuple[dict[int, DayIntervals], int | None]]:
+        return [
+            (self.by_room, occupation.room),
+            (self.by_professor, occupation.professor),
+            (self.by_course, occupation.course),
+        ]
+
+    def insert(self, occupation: Occupation):
+        self.occupations[occupation.meeting] = occupation
+        self._arrays = None
+        for intervals, key in self._interval_sources(occupation):
+            if key is None:
+                continue
+            occupations = intervals.get(key, {}).get(occupation.day, []) + [occupation]
+            _set_day(intervals, key, occupation.day, sorted(occupations, key=_interval_order))
+        if occupation.room is not None:
+            self._update_room_slots(occupation.room, occupation.day)
+
+    def remove(self, meeting_pk: int):
+        occupation = self.occupations.pop(meeting_pk, None)
+        if occupation is None:
+            return
+        self._arrays = None
+        for intervals, key in self._interval_sources(occupation):
+            days = intervals.get(key)  # pyright: ignore
+            if not days or occupation.day not in days:
+                continue
+            _set_day(
+                intervals,
+                key,  # pyright: ignore
+                occupation.day,
+                [o for o in days[occupation.day] if o.meeting != meeting_pk],
+            )
+        if occupation.room is not None:
+            self._update_room_slots(occupation.room, occupation.day)
+
+    @staticmethod
+    def overlapping(
+        intervals: DayIntervals | None,
+        day: str,
+        start: int,
+        end: int,
+        sections_to_exclude: set[int] | None = None,
+    ) -> Iterable[Occupation]:
+        if not intervals:
+            return
+        for occupation in intervals.get(day, []):
+            # sorted by start so nothing after this can overlap
+            if occupation.start > end:
+                break
+            if occupation.end < start:
+                continue
+            if sections_to_exclude and occupation.section in sections_to_exclude:
+                continue
+            yield occupation
+
+    def conflicting(
+        self,
+        room: int | None,
+        professor: int | None,
+        courses: Iterable[int],
+        sections_to_exclude: set[int],
+    ) -> list[Occupation]:
+        """The same meetings as EditMeeting.get_conflicting_meetings"""
+        sources: list[DayIntervals] = []
+        if professor is not None:
+            sources.append(self.by_professor.get(professor, {}))
+        if room is not None:
+            sources.append(self.by_room.get(room, {}))
+        for course in courses:
+            sources.append(self.by_course.get(course, {}))
+
+        seen: set[int] = set()
+        conflicts: list[Occupation] = []
+        for days in sources:
+            for occupations in days.values():
+                for occupation in occupations:
+                    if occupation.meeting in seen:
+                        continue
+                    if occupation.section in sections_to_exclude:
+                        continue
+                    seen.add(occupation.meeting)
+                    conflicts.append(occupation)
+        return conflicts
+
+    def open_time_blocks(
+        self,
+        conflicts: Iterable[Occupation],
+        duration: timedelta,
+        exclude_numbers: Iterable[int] = (),
+    ) -> list[OfficialTimeBlock]:
+        """
+        Official time blocks where a meeting of the given duration starting at the block
+        would not overlap any of the conflicts
+        """
+        duration_after_time_block = time_to_minutes(duration - TimeBlock.ONE_BLOCK)
+        conflicts_by_day: dict[str, list[Occupation]] = {}
+        for conflict in conflicts:
+            conflicts_by_day.setdefault(conflict.day, []).append(conflict)
+
+        exclude_numbers = set(exclude_numbers)
+        open_time_blocks = []
+        for time_block in self.official_time_blocks:
+            if time_block.number in exclude_numbers:
+                continue
+            start = time_block.start_minutes()
+            end = time_block.end_minutes()
+            if any(
+                start <= conflict.end
+                and end >= conflict.start - duration_after_time_block
+                for conflict in conflicts_by_day.get(time_block.day, [])
+            ):
+                continue
+            open_time_blocks.append(time_block)
+        return open_time_blocks
+
+    def allocation(
+        self, department: int, allocation_group: int | None
+    ) -> tuple[int, int] | None:
+        """(number of classrooms, general purpose rooms used) of a department allocation"""
+        if allocation_group is None:
+            return None
+        key = (department, allocation_group)
+        allocation_max = self.department_allocations.get(key)
+        if allocation_max is None:
+            return None
+        return allocation_max, DepartmentAllocation.get_usage(self.term).get(key, 0)
+
+    def uses_room(self, department: int, allocation_group: int, room: int) -> bool:
+        """If the department already counts the room in the allocation group"""
+        return any(
+            occupation.department == department
+            and allocation_group in self.time_block_groups.get(occupation.time_block, ())
+            for occupations in self.by_room.get(room, {}).values()
+            for occupation in occupations
+        )
+
+    def room_slots(self) -> np.ndarray:
+        """(rooms x days x packed 5 minute slots) bitmap of when each room is taken"""
+        if self._room_slots is None:
+            # only shared once it is filled in
+            room_slots = np.zeros(
+                (len(self.room_positions), len(DAY_TO_INDEX), -(-SLOTS_PER_DAY // 8)),
+                dtype=np.uint8,
+            )
+            for room_pk, days in self.by_room.items():
+                for day in days:
+                    self._fill_room_slots(room_slots, room_pk, day)
+            self._room_slots = room_slots
+        return self._room_slots
+
+    def _update_room_slots(self, room_pk: int, day: str):
+        if self._room_slots is not None:
+            self._fill_room_slots(self._room_slots, room_pk, day)
+
+    def _fill_room_slots(self, room_slots: np.ndarray, room_pk: int, day: str):
+        position = self.room_positions.get(room_pk)
+        day_index = DAY_TO_INDEX.get(day)
+        if position is None or day_index is None:
+            return
+        day_slots = np.zeros(SLOTS_PER_DAY, dtype=bool)
+        for occupation in self.by_room.get(room_pk, {}).get(day, []):
+            day_slots[_slots(occupation.start, occupation.end)] = True
+            if not _is_on_slots(occupation.start, occupation.end):
+                self._inexact_rooms.add(room_pk)
+        room_slots[position, day_index] = np.packbits(day_slots)
+
+    def free_rooms(
+        self,
+        room_pks: list[int],
+        windows: list[Window],
+        sections_to_exclude: set[int] | None = None,
+    ) -> np.ndarray:
+        """(windows x rooms) of which rooms have nothing overlapping each window"""
+        room_slots = self.room_slots()
+        sections_to_exclude = sections_to_exclude or set()
+        free = np.ones((len(windows), len(room_pks)), dtype=bool)
+        if not windows or not room_pks:
+            return free
+
+        day_indexes = np.array([DAY_TO_INDEX.get(day, -1) for day, _, _ in windows])
+        minutes = [(time_to_minutes(start), time_to_minutes(end)) for _, start, end in windows]
+        window_slots = np.zeros((len(windows), SLOTS_PER_DAY), dtype=bool)
+        for i, (start, end) in enumerate(minutes):
+            window_slots[i, _slots(start, end)] = True
+        positions = np.array([self.room_positions[room_pk] for room_pk in room_pks])
+        taken = (
+            room_slots[positions][:, np.maximum(day_indexes, 0)]
+            & np.packbits(window_slots, axis=-1)[None, :, :]
+        ).any(axis=-1).T
+        taken &= (day_indexes >= 0)[:, None]
+
+        # the bits can only say that a room might be taken when times are between slots
+        #   or when the meeting taking it is from a section that is excluded
+        arrays = self.arrays()
+        excluded_rooms = set(
+            arrays.room[np.isin(arrays.section, list(sections_to_exclude))].tolist()
+        )
+        for i, j in zip(*np.nonzero(taken)):
+            room_pk = room_pks[j]
+            start, end = minutes[i]
+            if (
+                _is_on_slots(start, end)
+                and room_pk not in excluded_rooms
+                and room_pk not in self._inexact_rooms
+            ):
+                free[i, j] = False
+                continue
+            overlapping = self.overlapping(
+                self.by_room.get(room_pk), windows[i][0], start, end, sections_to_exclude
+            )
+            free[i, j] = next(overlapping, None) is None
+        return free
+
+    def building_room_pks(self, building: int | None, include_general: bool) -> list[int]:
+        """Rooms of a building (or every room) in the same order as building.rooms"""
+        room_pks = (
+            list(self.rooms) if building is None else self.building_rooms.get(building, [])
+        )
+        if include_general:
+            return room_pks
+        return [room_pk for room_pk in room_pks if not self.rooms[room_pk].is_general_purpose]
+
+    def available_rooms(
+        self,
+        building: int,
+        day: str,
+        start: time | timedelta,
+        end: time | timedelta,
+        include_general: bool,
+        sections_to_exclude: set[int] | None = None,
+    ) -> list[int]:
+        """The same rooms as Building.get_available_rooms (in the same order)"""
+        return self.available_rooms_in_windows(
+            building, [(day, start, end)], include_general, sections_to_exclude
+        )[0]
+
+    def available_rooms_in_windows(
+        self,
+        building: int,
+        windows: list[Window],
+        include_general: bool | list[bool],
+        sections_to_exclude: set[int] | None = None,
+    ) -> list[list[int]]:
+        """available_rooms of every (day, start, end) window at once"""
+        if isinstance(include_general, bool):
+            include_general = [include_general] * len(windows)
+        room_pks = self.building_room_pks(building, include_general=True)
+        free = self.free_rooms(room_pks, windows, sections_to_exclude)
+        is_general = np.array(
+            [self.rooms[room_pk].is_general_purpose for room_pk in room_pks], dtype=bool
+        )
+        free &= np.array(include_general, dtype=bool)[:, None] | ~is_general[None, :]
+        return [[room_pks[j] for j in np.flatnonzero(room_free)] for room_free in free]
+
+    def available_rooms_in_all_windows(
+        self,
+        building: int | None,
+        windows: list[Window],
+        include_general: bool,
+        sections_to_exclude: set[int] | None = None,
+    ) -> list[int]:
+        """Rooms of a building (or of every building) that are free in every window"""
+        room_pks = self.building_room_pks(building, include_general)
+        free = self.free_rooms(room_pks, windows, sections_to_exclude).all(axis=0)
+        return [room_pks[j] for j in np.flatnonzero(free)]
+
+    def arrays(self) -> OccupancyArrays:
+        if self._arrays is not None:
+            return self._arrays
+        occupations = sorted(self.occupations.values(), key=lambda o: o.meeting)
+
+        def column(get, dtype=np.int64) -> np.ndarray:
+            return np.fromiter(map(get, occupations), dtype=dtype, count=len(occupations))
+
+        self._arrays = OccupancyArrays(
+            meeting=column(lambda o: o.meeting),
+            section=column(lambda o: o.section),
+            room=column(lambda o: -1 if o.room is None else o.room),
+            professor=column(lambda o: -1 if o.professor is None else o.professor),
+            day=column(lambda o: DAY_TO_INDEX.get(o.day, -1), np.int8),
+            start=column(lambda o: o.start, np.int32),
+            end=column(lambda o: o.end, np.int32),
+        )
+        return self._arrays
+
+    def overlap_matrix(
+        self,
+        days: list[str | None],
+        starts: list[int | None],
+        ends: list[int | None],
+        sections_to_exclude: set[int],
+    ) -> np.ndarray:
+        """
+        (number of windows x number of occupations) matrix of which occupations overlap
+        each window. Windows without a day or start never overlap anything
+        """
+        arrays = self.arrays()
+        window_days = np.array(
+            [-2 if d is None else DAY_TO_INDEX.get(d, -2) for d in days], dtype=np.int8
+        )
+        is_valid = np.array([s is not None for s in starts], dtype=bool)
+        window_starts = np.array([s or 0 for s in starts], dtype=np.int32)
+        window_ends = np.array([e or 0 for e in ends], dtype=np.int32)
+        is_excluded = np.isin(arrays.section, list(sections_to_exclude))
+
+        return (
+            (arrays.day[None, :] == window_days[:, None])
+            & (arrays.start[None, :] <= window_ends[:, None])
+            & (arrays.end[None, :] >= window_starts[:, None])
+            & is_valid[:, None]
+            & ~is_excluded[None, :]
+        )
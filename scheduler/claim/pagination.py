@@ -0,0 +1,134 @@
+import base64
+import json
+from dataclasses import dataclass, field
+from typing import Any, Generic, TypeVar
+
+from django.db.models import F, Model, Q, QuerySet
+
+M = TypeVar("M", bound=Model)
+
+# The result lists used to count every row (len(queryset)) and then slice with an OFFSET
+#   so every later page read all of the rows before it. A page now seeks past the sort
+#   values of the row it ended on (the pk breaks ties) so a deep page costs the same as
+#   the first one. The cursors are those sort values of the first/ last row of a page
+
+KEY_PREFIX = "keyset_"
+
+
+def ordering_of(queryset: QuerySet) -> list[str]:
+    """The order_by of the queryset with the pk added to break ties"""
+    ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+    if not all(isinstance(name, str) and name != "?" for name in ordering):
+        raise ValueError(f"Keyset pagination needs field names to order by not {ordering}")
+    if not any(name.lstrip("-") in ("pk", "id") for name in ordering):
+        ordering.append("pk")
+    return ordering
+
+
+def encode_cursor(values: list[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(cursor: str | None, length: int) -> list[Any] | None:
+    """None when there is no cursor or it is not one of encode_cursor's"""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != length:
+        return None
+    return values
+
+
+def seek_filter(ordering: list[str], values: list[Any], backwards: bool = False) -> Q:
+    """The rows that come after (or before) the row with the values"""
+    seek = Q()
+    for i, name in enumerate(ordering):
+        descending = name.startswith("-") != backwards
+        condition = Q(**{f"{KEY_PREFIX}{i}__{'lt' if descending else 'gt'}": values[i]})
+        for j in range(i):
+            condition &= Q(**{f"{KEY_PREFIX}{j}": values[j]})
+        seek |= condition
+    return seek
+
+
+def reverse_ordering(ordering: list[str]) -> list[str]:
+    return [name[1:] if name.startswith("-") else f"-{name}" for name in ordering]
+
+
+@dataclass
+class KeysetPage(Generic[M]):
+    items: list[M] = field(default_factory=list)
+    ordering: list[str] = field(default_factory=list)
+    # position of the first item in the whole list (only used for displaying)
+    start: int = 0
+    has_previous: bool = False
+    has_next: bool = False
+    # only counted when asked for
+    count: int | None = None
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.items)
+
+    def cursor_of(self, item: M) -> str:
+        return encode_cursor(
+            [getattr(item, f"{KEY_PREFIX}{i}") for i in range(len(self.ordering))]
+        )
+
+    @property
+    def first_cursor(self) -> str:
+        return self.cursor_of(self.items[0]) if self.items else ""
+
+    @property
+    def last_cursor(self) -> str:
+        return self.cursor_of(self.items[-1]) if self.items else ""
+
+    @staticmethod
+    def paginate(
+        queryset: QuerySet[M],
+        size: int,
+        after: str | None = None,
+        before: str | None = None,
+        start: int = 0,
+        count: bool = False,
+    ) -> "KeysetPage[M]":
+        """
+        The size rows after the after cursor (or before the before cursor) in the order of
+        the queryset. Without either cursor it is the first page
+        """
+        ordering = ordering_of(queryset)
+        page = KeysetPage(ordering=ordering, start=max(start, 0))
+        if count:
+            page.count = queryset.count()
+
+        queryset = queryset.annotate(
+            **{f"{KEY_PREFIX}{i}": F(name.lstrip("-")) for i, name in enumerate(ordering)}
+        )
+        values = decode_cursor(after, len(ordering))
+        backwards = values is None and before is not None
+        if backwards:
+            values = decode_cursor(before, len(ordering))
+            backwards = values is not None
+        if values is not None:
+            queryset = queryset.filter(seek_filter(ordering, values, backwards))
+        if backwards:
+            queryset = queryset.order_by(*reverse_ordering(ordering))
+        else:
+            queryset = queryset.order_by(*ordering)
+
+        items = list(queryset[: size + 1])
+        has_more = len(items) > size
+        page.items = items[:size]
+        if backwards:
+            page.items.reverse()
+            page.has_previous = has_more
+            page.has_next = True
+        else:
+            page.has_previous = values is not None
+            page.has_next = has_more
+        if not page.has_previous:
+            page.start = 0
+        return page
@@ -1,4 +1,5 @@
 from django.contrib.auth.decorators import login_required
+from django.db.transaction import atomic
 from django.db.utils import IntegrityError
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import render
@@ -6,7 +7,9 @@ from django.urls import reverse
 from django.views.decorators.http import require_http_methods
 from request.models import *
 
+from .identity_map import IdentityMap
 from .models import *
+from .pagination import KeysetPage
 
 
 @login_required
@@ -18,12 +21,12 @@ def get_course_search(request: HttpRequest) -> HttpResponse:
     if department_pk == "any":
         department = None
     else:
-        department = Department.objects.get(pk=department_pk)
+        department = IdentityMap.get(Department, department_pk)
     subject_pk = request.GET.get("subject")
     if subject_pk == "any":
         subject = None
     else:
-        subject = Subject.objects.get(pk=subject_pk)
+        subject = IdentityMap.get(Subject, subject_pk)
     course_query = request.GET.get("course_query")
     is_department_change = request.GET.get("isDepartmentChange") == "True"
 
@@ -43,7 +46,7 @@ def get_course_search(request: HttpRequest) -> HttpResponse:
     preferences = Preferences.get_or_create_from_professor(professor)
     preferences.claim_department = department
     preferences.claim_subject = subject
-    preferences.claim_term = Term.objects.get(pk=term_pk)
+    preferences.claim_term = IdentityMap.get(Term, term_pk)
     preferences.save()
 
     context = {
@@ -59,33 +62,33 @@ def get_course_search(request: HttpRequest) -> HttpResponse:
 
 @login_required
 @require_http_methods(["GET"])
-def get_course_results(request: HttpRequest, offset: int) -> HttpResponse:
+def get_course_results(request: HttpRequest) -> HttpResponse:
     data = request.GET
     term_pk = data.get("term")
-    term = Term.objects.get(pk=term_pk)
+    term = IdentityMap.get(Term, term_pk)
 
     department_pk = request.GET.get("department")
     if department_pk == "any":
         department = None
     else:
-        department = Department.objects.get(pk=department_pk)
+        department = IdentityMap.get(Department, department_pk)
     subject_pk = data.get("subject")
     if subject_pk == "any":
         subject = None
     else:
-        subject = Subject.objects.get(pk=subject_pk)
+        subject = IdentityMap.get(Subject, subject_pk)
 
     course_query = data.get("course_query")
+    # ordered by how well they match (or by title without a query)
     courses, has_results = Course.search(course_query, term.pk, department, subject)
-    courses = courses.order_by("title")
     # TODO implement if can be made faster
     # courses = Course.sort_with_prof(courses, professor=request.user.professor)
 
+    page = KeysetPage.paginate(courses, Course.SEARCH_INTERVAL, after=data.get("after"))
+
     context = {
-        "courses": courses.all()[offset : offset + Course.SEARCH_INTERVAL],
-        "offset": offset,
-        "get_more": len(courses) > (offset + Course.SEARCH_INTERVAL),
-        "next_offset": offset + Course.SEARCH_INTERVAL,
+        "courses": page.items,
+        "page": page,
         "has_results": has_results,
     }
 
@@ -98,7 +101,7 @@ def add_course_pill(request: HttpRequest, course: int) -> HttpResponse:
     data = QueryDict(request.body) # pyright: ignore
     search_type = data["searchType"]
     professor = Professor.objects.get(user=request.user)
-    course_obj = Course.objects.get(pk=course)
+    course_obj = IdentityMap.get(Course, course)
 
     if search_type == "claim":
         try:
@@ -161,9 +164,9 @@ def remove_course_pill(request: HttpRequest, course: int) -> HttpResponse:
 def get_meetings(request: HttpRequest, professor_pk: int) -> HttpResponse:
 
     term = request.GET.get("term")
-    term = Term.objects.get(pk=term)
+    term = IdentityMap.get(Term, term)
     requester = Professor.objects.get(user=request.user)
-    professor = Professor.objects.get(pk=professor_pk)
+    professor = IdentityMap.get(Professor, professor_pk)
     meetings = professor.meetings.filter(section__term=term).order_by("section__pk")
     sections_without_meetings = (
         professor.sections.exclude(meetings__professor=professor)
@@ -192,7 +195,7 @@ def get_meetings(request: HttpRequest, professor_pk: int) -> HttpResponse:
 def get_meeting_details(request: HttpRequest) -> HttpResponse:
     meeting = request.GET.get("meeting")  # pyright: ignore
     in_edit_mode = request.GET.get("inEditMode") == "True"
-    meeting: Meeting = Meeting.objects.get(pk=meeting)
+    meeting: Meeting = IdentityMap.get(Meeting, meeting)
 
     is_shared_section = meeting.section.meetings.exclude(
         professor=meeting.section.primary_professor
@@ -231,18 +234,13 @@ def section_search(request: HttpRequest) -> HttpResponse:
 
     sort_column = request.GET.get("sortColumn")
     sort_type = request.GET.get("sortType")
-    start_slice = int(request.GET.get("startSlice", 0))
-    end_slice = int(request.GET.get("endSlice", Section.SEARCH_INTERVAL))
-    original_length = 0
     context = {
         "refresh_url": reverse(request.resolver_match.view_name),
         "sections": [],
+        "page": KeysetPage(count=0),
         "claim": True,
         "sort_column": sort_column,
         "sort_type": sort_type,
-        "start_slice": start_slice,
-        "end_slice": min(end_slice, original_length),
-        "original_length": original_length,
         "search_interval": Section.SEARCH_INTERVAL,
     }
 
@@ -278,11 +276,9 @@ def section_search(request: HttpRequest) -> HttpResponse:
     section_qs = Section.sort_sections(
         section_qs=section_qs.distinct(), sort_column=sort_column, sort_type=sort_type
     )
-    original_length = len(section_qs)
-    sections = section_qs[start_slice:end_slice]
-    context["sections"] = sections
-    context["end_slice"] = min(end_slice, original_length)
-    context["original_length"] = original_length
+    page = Section.paginate(Section.with_rows(section_qs), request.GET)
+    context["sections"] = page.items
+    context["page"] = page
 
     return render(request, "sections.html", context=context)
 
@@ -290,7 +286,7 @@ def section_search(request: HttpRequest) -> HttpResponse:
 @login_required
 @require_http_methods(["GET"])
 def get_claim_info(request: HttpRequest, section_pk: int) -> HttpResponse:
-    section = Section.objects.get(pk=section_pk)
+    section = IdentityMap.get(Section, section_pk)
     has_primary = section.primary_professor != None
     available = section.meetings.filter(professor=None).first() != None
     can_claim = (not has_primary) or (available)
@@ -305,9 +301,10 @@ def get_claim_info(request: HttpRequest, section_pk: int) -> HttpResponse:
 
 @login_required
 @require_http_methods(["PUT"])
+@atomic
 def claim_section(request: HttpRequest, section_pk: int) -> HttpResponse:
     professor: Professor = request.user.professor  # pyright: ignore
-    section = Section.objects.get(pk=section_pk)
+    section = IdentityMap.get(Section, section_pk)
     data = QueryDict(request.body)  # pyright: ignore
     if section.primary_professor is None:
         section.primary_professor = professor
@@ -0,0 +1,297 @@
+import itertools
+import threading
+from dataclasses import dataclass, field
+from datetime import time, timedelta
+
+import numpy as np
+
+from .models import Course, TimeBlock
+from .occupancy import DAY_TO_INDEX
+from .timetable import Timetable, time_to_minutes
+
+# Every legal meeting and every legal set of meetings (a pattern) only depend on the
+#   official time blocks so they are worked out once per version of the timetable
+#   instead of on every recommendation. Recommending and checking meetings are then
+#   lookups into these tables. Patterns of the credit values are built with the table,
+#   the patterns for what is left of a section that already has meetings when they are
+#   first asked for
+
+# at most this many meetings are in a pattern
+MAX_MEETINGS = 3
+
+
+@dataclass(frozen=True)
+class Placement:
+    """One meeting of a pattern"""
+
+    time_block: int
+    # number of the official time block it starts in
+    number: int
+    day: str
+    start: int
+    end: int
+    duration: timedelta
+    # numbers of the official time blocks it overlaps
+    numbers: frozenset[int]
+    allocation_groups: frozenset[int]
+
+    def overlaps(self, day: str, start: int, end: int) -> bool:
+        return self.day == day and self.start <= end and self.end >= start
+
+    def order(self) -> tuple[int, int]:
+        return DAY_TO_INDEX.get(self.day, len(DAY_TO_INDEX)), self.start
+
+
+@dataclass(frozen=True)
+class Pattern:
+    """Meetings on different days (ordered by day) that make up a section"""
+
+    placements: tuple[Placement, ...]
+    time_blocks: frozenset[int]
+    allocation_groups: frozenset[int]
+
+    @staticmethod
+    def of(placements: tuple[Placement, ...]) -> "Pattern":
+        placements = tuple(sorted(placements, key=Placement.order))
+        return Pattern(
+            placements=placements,
+            time_blocks=frozenset(p.time_block for p in placements),
+            allocation_groups=frozenset(g for p in placements for g in p.allocation_groups),
+        )
+
+    @property
+    def duration(self) -> timedelta:
+        return sum((p.duration for p in self.placements), timedelta())
+
+    @property
+    def is_night(self) -> bool:
+        return any(p.number in TimeBlock.LONG_NIGHT_NUMBERS for p in self.placements)
+
+
+def duration_combinations(duration: timedelta) -> list[tuple[timedelta, ...]]:
+    """Meeting durations (longest first) that add up to the duration"""
+    combinations = []
+    for count in range(1, MAX_MEETINGS + 1):
+        for combination in itertools.combinations_with_replacement(
+            sorted(set(TimeBlock.DURATIONS), reverse=True), count
+        ):
+            if sum(combination, timedelta()) == duration:
+                combinations.append(combination)
+    return combinations
+
+
+@dataclass
+class PatternTable:
+    version: str
+    timetable: Timetable
+    # duration -> every legal meeting of the duration
+    placements: dict[timedelta, list[Placement]] = field(default_factory=dict)
+    # (day, start, duration) -> the legal meeting
+    by_start: dict[tuple[str, int, timedelta], Placement] = field(default_factory=dict)
+    # (durations, one block meetings that are not paired) -> patterns
+    patterns: dict[tuple[tuple[timedelta, ...], int], list[Pattern]] = field(
+        default_factory=dict
+    )
+    # credits -> (durations, 0) keys of the patterns a section of the credits can have
+    credit_combinations: dict[int, list[tuple[timedelta, ...]]] = field(default_factory=dict)
+    # number -> days it is on
+    number_days: dict[int, frozenset[str]] = field(default_factory=dict)
+    # every placement of every duration so far and its position in that list
+    indexed_placements: list[Placement] = field(default_factory=list)
+    placement_positions: dict[Placement, int] = field(default_factory=dict)
+    # same keys as patterns, (patterns x meetings) positions of their placements
+    pattern_matrices: dict[tuple[tuple[timedelta, ...], int], np.ndarray] = field(
+        default_factory=dict
+    )
+
+    _snapshot = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get() -> "PatternTable":
+        timetable = Timetable.get()
+        with PatternTable._lock:
+            snapshot: PatternTable | None = PatternTable._snapshot
+        if snapshot is not None and snapshot.version == timetable.version:
+            return snapshot
+        snapshot = PatternTable.load(timetable)
+        with PatternTable._lock:
+            PatternTable._snapshot = snapshot
+        return snapshot
+
+    @staticmethod
+    def load(timetable: Timetable) -> "PatternTable":
+        table = PatternTable(version=timetable.version, timetable=timetable)
+        number_days: dict[int, set[str]] = {}
+        for time_block in timetable.official_time_blocks:
+            number_days.setdefault(time_block.number, set()).add(time_block.day)
+        table.number_days = {n: frozenset(days) for n, days in number_days.items()}
+
+        for duration in TimeBlock.DURATIONS:
+            table.placements_of(duration)
+
+        for credits, durations in Course.CREDIT_HOUR_POSSIBILITIES.items():
+            combinations = table.credit_combinations.setdefault(credits, [])
+            for duration in sorted(durations):
+                for combination in duration_combinations(duration):
+                    if combination not in combinations:
+                        combinations.append(combination)
+                    table.patterns_of(combination)
+        return table
+
+    def placements_of(self, duration: timedelta) -> list[Placement]:
+        """Every legal meeting of the duration"""
+        placements = self.placements.get(duration)
+        if placements is not None:
+            return placements
+        placements = self.build_placements(duration)
+        with PatternTable._lock:
+            if duration in self.placements:
+                return self.placements[duration]
+            self.placements[duration] = placements
+            for placement in placements:
+                self.by_start.setdefault(
+                    (placement.day, placement.start, duration), placement
+                )
+                self.placement_positions[placement] = len(self.indexed_placements)
+                self.indexed_placements.append(placement)
+        return placements
+
+    def build_placements(self, duration: timedelta) -> list[Placement]:
+        minutes = time_to_minutes(duration)
+        ends = {
+            (time_block.day, time_block.end_minutes())
+            for time_block in self.timetable.official_time_blocks
+        }
+        is_night = duration in (TimeBlock.DOUBLE_BLOCK_NIGHT, TimeBlock.TRIPLE_NIGHT)
+        placements = []
+        for time_block in self.timetable.official_time_blocks:
+            start = time_block.start_minutes()
+            if is_night:
+                # night classes start with the long night blocks (TimeBlock.get_time_intervals)
+                if time_block.number not in TimeBlock.LONG_NIGHT_NUMBERS:
+                    continue
+            else:
+                # the other meetings end when an official time block ends
+                if time_block.number in TimeBlock.LONG_NIGHT_NUMBERS:
+                    continue
+                if (time_block.day, start + minutes) not in ends:
+                    continue
+            covered = self.timetable.official(
+                timedelta(minutes=start), timedelta(minutes=start + minutes), time_block.day
+            )
+            placements.append(
+                Placement(
+                    time_block=time_block.pk,
+                    number=time_block.number,
+                    day=time_block.day,
+                    start=start,
+                    end=start + minutes,
+                    duration=duration,
+                    numbers=frozenset(t.number for t in covered),
+                    allocation_groups=frozenset(
+                        g for t in covered for g in t.allocation_groups
+                    ),
+                )
+            )
+        return placements
+
+    def placement_at(
+        self, day: str | None, start: time | timedelta | None, duration: timedelta
+    ) -> Placement | None:
+        """The legal meeting at the time (None if a meeting there is not legal)"""
+        if day is None or start is None:
+            return None
+        self.placements_of(duration)
+        return self.by_start.get((day, time_to_minutes(start), duration))
+
+    def patterns_of(
+        self, combination: tuple[timedelta, ...], singles: int = 0
+    ) -> list[Pattern]:
+        """
+        Placements for each duration of the combination on different days. One block
+        meetings come in pairs of the same number (MO/TH 1 and so on) except for the
+        singles (that complement meetings a section already has)
+        """
+        key = (combination, singles)
+        patterns = self.patterns.get(key)
+        if patterns is not None:
+            return patterns
+        patterns = self.build_patterns(combination, singles)
+        matrix = np.array(
+            [
+                [self.placement_positions[placement] for placement in pattern.placements]
+                for pattern in patterns
+            ],
+            dtype=np.intp,
+        ).reshape(len(patterns), len(combination))
+        with PatternTable._lock:
+            self.pattern_matrices.setdefault(key, matrix)
+            return self.patterns.setdefault(key, patterns)
+
+    def pattern_matrix(
+        self, combination: tuple[timedelta, ...], singles: int = 0
+    ) -> np.ndarray:
+        """patterns_of as (patterns x meetings) positions in indexed_placements"""
+        self.patterns_of(combination, singles)
+        return self.pattern_matrices[(combination, singles)]
+
+    def build_patterns(
+        self, combination: tuple[timedelta, ...], singles: int
+    ) -> list[Pattern]:
+        one_blocks = combination.count(TimeBlock.ONE_BLOCK)
+        pairs = max(0, one_blocks - singles) // 2
+        left = [d for d in combination if d != TimeBlock.ONE_BLOCK]
+        left += [TimeBlock.ONE_BLOCK] * (one_blocks - 2 * pairs)
+        one_block_pairs = [
+            (first, second)
+            for first, second in itertools.combinations(
+                self.placements_of(TimeBlock.ONE_BLOCK), 2
+            )
+            if first.number == second.number and first.day != second.day
+        ]
+
+        seen: set[frozenset[Placement]] = set()
+        patterns: list[Pattern] = []
+
+        def search(chosen: tuple[Placement, ...], pairs_left: int, left: list[timedelta]):
+            days = {placement.day for placement in chosen}
+            if pairs_left:
+                for first, second in one_block_pairs:
+                    if first.day in days or second.day in days:
+                        continue
+                    if chosen and first.order() <= chosen[-2].order():
+                        # each set of pairs is only tried in one order
+                        continue
+                    search(chosen + (first, second), pairs_left - 1, left)
+                return
+            if not left:
+                placements = frozenset(chosen)
+                if placements not in seen:
+                    seen.add(placements)
+                    patterns.append(Pattern.of(chosen))
+                return
+            previous = chosen[-1] if len(chosen) > 2 * pairs else None
+            for placement in self.placements_of(left[0]):
+                if placement.day in days:
+                    continue
+                if (
+                    previous is not None
+                    and previous.duration == placement.duration
+                    and placement.order() <= previous.order()
+                ):
+                    # same for meetings of the same duration
+                    continue
+                search(chosen + (placement,), 0, left[1:])
+
+        search((), pairs, left)
+        patterns.sort(key=lambda pattern: tuple(map(Placement.order, pattern.placements)))
+        return patterns
+
+    def for_credits(self, credits: int) -> list[Pattern]:
+        """Every legal pattern of a section of the credits"""
+        return [
+            pattern
+            for combination in self.credit_combinations.get(credits, [])
+            for pattern in self.patterns_of(combination)
+        ]
@@ -0,0 +1,132 @@
+import dataclasses
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.db.models import Count, QuerySet
+
+from .models import Meeting, Section, SnapshotVersion, Term
+
+# Building.recommend is asked for the same (course, term) many times while recommending
+#   meetings so the meeting counts of every course in a term are counted with one query
+#   and kept by the process until the SnapshotVersion stamp of the term changes. The
+#   process that saved/ deleted a meeting swaps in a copy with only its course recounted.
+#   See claim/signals.py
+
+
+@dataclass
+class BuildingRecommendations:
+    term: int
+    # SnapshotVersion stamp of the term
+    version: str = ""
+    # course -> building -> number of meetings
+    course_buildings: dict[int, Counter[int]] = field(default_factory=dict)
+    course_subjects: dict[int, int] = field(default_factory=dict)
+
+    _terms = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get(term: Term | int) -> "BuildingRecommendations":
+        term_pk = term if isinstance(term, int) else term.pk
+        version = SnapshotVersion.stamp_of(SnapshotVersion.term_name(term_pk))
+        with BuildingRecommendations._lock:
+            recommendations = BuildingRecommendations._terms.get(term_pk)
+        if recommendations is not None and recommendations.version == version:
+            return recommendations
+        recommendations = BuildingRecommendations.load(term_pk, version)
+        with BuildingRecommendations._lock:
+            BuildingRecommendations._terms[term_pk] = recommendations
+        return recommendations
+
+    @staticmethod
+    def invalidate(term_pk: int | None = None):
+        """Every process recounts the term (or every term) once the transaction commits"""
+        if term_pk is None:
+            SnapshotVersion.bump_terms()
+        else:
+            SnapshotVersion.bump(SnapshotVersion.term_name(term_pk))
+
+    @staticmethod
+    def load(term_pk: int, version: str = "") -> "BuildingRecommendations":
+        recommendations = BuildingRecommendations(term=term_pk, version=version)
+        recommendations.course_buildings = recommendations.count(
+            Meeting.objects.filter(section__term=term_pk)
+        )
+        return recommendations
+
+    @staticmethod
+    def update_section(section_pk: int, term_pk: int, previous: str, version: str):
+        """
+        Recounts the course of the section if its term is loaded at the stamp right
+        before the change (previous/ version like TermOccupancy.update_meeting)
+        """
+        with BuildingRecommendations._lock:
+            recommendations = BuildingRecommendations._terms.get(term_pk)
+        if recommendations is None or recommendations.version != previous:
+            return
+        section = (
+            Section.objects.filter(pk=section_pk).values("course", "course__subject").first()
+        )
+        if section is None:
+            return
+        recounted = recommendations.recounted(
+            section["course"], section["course__subject"], version
+        )
+        with BuildingRecommendations._lock:
+            # unless another thread already recounted the term
+            if BuildingRecommendations._terms.get(term_pk) is recommendations:
+                BuildingRecommendations._terms[term_pk] = recounted
+
+    def recounted(self, course: int, subject: int, version: str) -> "BuildingRecommendations":
+        """A copy with the course recounted, self is unchanged (other threads read it)"""
+        recommendations = dataclasses.replace(
+            self,
+            version=version,
+            course_buildings=dict(self.course_buildings),
+            course_subjects=dict(self.course_subjects),
+        )
+        counts = recommendations.count(
+            Meeting.objects.filter(section__term=self.term, section__course=course)
+        )
+        recommendations.course_subjects[course] = subject
+        recommendations.course_buildings[course] = counts.get(course, Counter())
+        return recommendations
+
+    def count(self, meetings: QuerySet[Meeting]) -> dict[int, Counter[int]]:
+        """course -> building -> number of meetings"""
+        rows = (
+            meetings.filter(room__building__isnull=False)
+            .values_list("section__course", "section__course__subject", "room__building")
+            .annotate(count=Count("pk"))
+            .order_by()
+        )
+        course_buildings: dict[int, Counter[int]] = {}
+        for course, subject, building, count in rows:
+            course_buildings.setdefault(course, Counter())[building] = count
+            self.course_subjects[course] = subject
+        return course_buildings
+
+    @staticmethod
+    def most_used(counts: Counter[int]) -> int | None:
+        """Building with the most meetings (ties go to the lowest pk like the old query)"""
+        if not counts:
+            return None
+        return min(counts, key=lambda building: (-counts[building], building))
+
+    def recommend(self, course: int, subject: int | None = None) -> int | None:
+        """
+        Building used the most by the course. If the course has no meetings in a room,
+        the building used most by its subject, then by the whole term
+        """
+        building = self.most_used(self.course_buildings.get(course, Counter()))
+        if building is not None:
+            return building
+
+        subject_counts: Counter[int] = Counter()
+        term_counts: Counter[int] = Counter()
+        for other_course, counts in list(self.course_buildings.items()):
+            term_counts.update(counts)
+            if subject is not None and self.course_subjects.get(other_course) == subject:
+                subject_counts.update(counts)
+        return self.most_used(subject_counts) or self.most_used(term_counts)
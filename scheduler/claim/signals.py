@@ -0,0 +1,238 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.db.models import QuerySet
+from django.dispatch import receiver
+
+from .course_search import CourseSearch
+from .models import (
+    AllocationGroup,
+    AllocationUsage,
+    Building,
+    Course,
+    DepartmentAllocation,
+    Meeting,
+    Room,
+    Section,
+    SnapshotVersion,
+    StartEndTime,
+    Subject,
+    TimeBlock,
+)
+from .occupancy import TermOccupancy
+from .recommendations import BuildingRecommendations
+from .timetable import Timetable
+
+
+# Bulk changes (like the banner imports) recount the allocation usage and change the
+#   stamps once themselves instead of once per meeting
+_is_muted: ContextVar[bool] = ContextVar("claim_signals_muted", default=False)
+
+
+@contextmanager
+def muted():
+    """Skips the meeting receivers below (for bulk changes that do their work themselves)"""
+    token = _is_muted.set(True)
+    try:
+        yield
+    finally:
+        _is_muted.reset(token)
+
+
+# EditMeetingRequest.realize goes through Meeting.save/ Meeting.delete so this also covers
+#   approved requests
+@receiver(post_save, sender=Meeting)
+@receiver(post_delete, sender=Meeting)
+def update_meeting_occupancy(sender, instance: Meeting, **_):
+    if _is_muted.get():
+        return
+    meeting_pk = instance.pk
+    section_pk = instance.section_id  # pyright: ignore
+    try:
+        term_pk = instance.section.term_id  # pyright: ignore
+    except Section.DoesNotExist:
+        TermOccupancy.invalidate()
+        return
+    name = SnapshotVersion.term_name(term_pk)
+    previous, version = SnapshotVersion.bump(name)[name]
+    # nothing is moved if the transaction is rolled back
+    transaction.on_commit(
+        lambda: TermOccupancy.update_meeting(meeting_pk, term_pk, previous, version)
+    )
+    transaction.on_commit(
+        lambda: BuildingRecommendations.update_section(
+            section_pk, term_pk, previous, version
+        )
+    )
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+# its rooms are left without a building (an update that sends no signals)
+@receiver(post_delete, sender=Building)
+def invalidate_all_terms(sender, **_):
+    TermOccupancy.invalidate()
+
+
+# The term occupancies are reloaded when the timetable they were loaded with changes
+@receiver(post_save, sender=AllocationGroup)
+@receiver(post_delete, sender=AllocationGroup)
+@receiver(post_save, sender=DepartmentAllocation)
+@receiver(post_delete, sender=DepartmentAllocation)
+@receiver(m2m_changed, sender=TimeBlock.allocation_groups.through)
+def invalidate_timetable(sender, **_):
+    Timetable.invalidate()
+
+
+# StartEndTime deletes go through the delete of their time blocks and the meetings of a
+#   deleted time block are set to null without their signals
+@receiver(post_save, sender=StartEndTime)
+@receiver(post_save, sender=TimeBlock)
+@receiver(pre_delete, sender=TimeBlock)
+def invalidate_time_block(sender, instance: StartEndTime | TimeBlock, created: bool = False, **_):
+    if created:
+        # like the ones EditMeetingRequest.realize creates, nothing uses it yet
+        if isinstance(instance, TimeBlock) and instance.number is not None:
+            Timetable.invalidate()
+        return
+    Timetable.invalidate()
+    if isinstance(instance, TimeBlock):
+        meetings = Meeting.objects.filter(time_block=instance.pk)
+    else:
+        meetings = Meeting.objects.filter(time_block__start_end_time=instance.pk)
+    # only the terms with meetings at the time moved
+    for term_pk in set(meetings.values_list("section__term", flat=True)):
+        TermOccupancy.invalidate(term_pk)
+
+
+# The fields of the rows above a meeting that its usage keys are made of
+REASSIGNED_FIELDS = {
+    Section: ("term_id", "course_id"),
+    Course: ("subject_id",),
+    Subject: ("department_id",),
+}
+
+
+def usage_meetings(instance: Meeting | Room | Section | Course | Subject) -> QuerySet[Meeting]:
+    if isinstance(instance, Room):
+        return Meeting.objects.filter(room=instance.pk)
+    if isinstance(instance, Section):
+        return Meeting.objects.filter(section=instance.pk)
+    if isinstance(instance, Course):
+        return Meeting.objects.filter(section__course=instance.pk)
+    if isinstance(instance, Subject):
+        return Meeting.objects.filter(section__course__subject=instance.pk)
+    return Meeting.objects.filter(pk=instance.pk)
+
+
+# The usages the meetings counted towards before the change also have to be recounted
+@receiver(pre_save, sender=Meeting)
+@receiver(pre_delete, sender=Meeting)
+@receiver(pre_save, sender=Room)
+@receiver(pre_delete, sender=Room)
+def remember_allocation_usage(sender, instance: Meeting | Room, signal, **_):
+    if _is_muted.get():
+        return
+    if (
+        signal is pre_save
+        and isinstance(instance, Meeting)
+        and instance.are_unchanged(*Meeting.USAGE_FIELDS)
+    ):
+        # like claiming a meeting, nothing it counts towards changes (None is nothing to do)
+        instance._allocation_usage_keys = None  # pyright: ignore
+        return
+    instance._allocation_usage_keys = (  # pyright: ignore
+        set() if instance.pk is None else AllocationUsage.keys_of(usage_meetings(instance))
+    )
+
+
+# The counts are written in the transaction of the save: the views that save meetings
+#   (claim_section, approving requests...) are atomic so they commit or roll back with it
+@receiver(post_save, sender=Meeting)
+@receiver(post_delete, sender=Meeting)
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def update_allocation_usage(sender, instance: Meeting | Room, signal, **_):
+    is_moved = not (
+        isinstance(instance, Meeting)
+        and instance.are_unchanged("section_id", "time_block_id")
+    )
+    if isinstance(instance, Meeting) and signal is post_save:
+        instance.remember_usage_fields()
+    if _is_muted.get():
+        return
+    keys: set | None = getattr(instance, "_allocation_usage_keys", set())
+    if keys is None:
+        return
+    # the keys only depend on the section and the time block (not the room)
+    if signal is post_save and is_moved:
+        keys = keys | AllocationUsage.keys_of(usage_meetings(instance))
+    AllocationUsage.refresh(keys)
+
+
+# Deleting them deletes their meetings which goes through the receivers above
+@receiver(pre_save, sender=Section)
+@receiver(pre_save, sender=Course)
+@receiver(pre_save, sender=Subject)
+def remember_reassigned_usage(sender, instance: Section | Course | Subject, **_):
+    instance._allocation_usage_keys = None  # pyright: ignore
+    if _is_muted.get() or instance.pk is None:
+        return
+    fields = REASSIGNED_FIELDS[sender]
+    loaded = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+    if loaded is None or loaded == tuple(getattr(instance, name) for name in fields):
+        return
+    instance._allocation_usage_keys = AllocationUsage.keys_of(  # pyright: ignore
+        usage_meetings(instance)
+    )
+
+
+@receiver(post_save, sender=Section)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Subject)
+def update_reassigned_usage(sender, instance: Section | Course | Subject, **_):
+    keys: set | None = getattr(instance, "_allocation_usage_keys", None)
+    if _is_muted.get() or keys is None:
+        return
+    AllocationUsage.refresh(keys | AllocationUsage.keys_of(usage_meetings(instance)))
+
+
+def time_block_meetings(instance: TimeBlock | AllocationGroup, reverse: bool, pk_set: set | None) -> QuerySet[Meeting]:
+    """The meetings at the time blocks whose allocation groups are changed"""
+    if not reverse:
+        return Meeting.objects.filter(time_block=instance.pk)
+    if pk_set is None:
+        # cleared from the allocation group
+        return Meeting.objects.filter(time_block__allocation_groups=instance.pk)
+    return Meeting.objects.filter(time_block__in=pk_set)
+
+
+@receiver(m2m_changed, sender=TimeBlock.allocation_groups.through)
+def refresh_time_block_usage(
+    sender, instance: TimeBlock | AllocationGroup, action: str, reverse: bool, pk_set: set | None, **_
+):
+    meetings = time_block_meetings(instance, reverse, pk_set)
+    if action.startswith("pre_"):
+        instance._allocation_usage_keys = AllocationUsage.keys_of(meetings)  # pyright: ignore
+        return
+    keys: set = getattr(instance, "_allocation_usage_keys", set())
+    AllocationUsage.refresh(keys | AllocationUsage.keys_of(meetings))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def update_course_search(sender, instance: Course, **_):
+    CourseSearch.update_courses([instance.pk])
+
+
+@receiver(post_save, sender=Subject)
+def update_subject_course_search(sender, instance: Subject, **_):
+    CourseSearch.update_courses(instance.courses.values_list("pk", flat=True))
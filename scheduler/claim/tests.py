@@ -0,0 +1,661 @@
+from datetime import time
+from io import StringIO
+from unittest import mock
+
+from authentication.models import Professor
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .course_search import CourseSearch
+from .identity_map import IdentityMap, IdentityMapMiddleware
+from .occupancy import Occupation, RoomInfo, TermOccupancy
+from .recommendations import BuildingRecommendations
+from .pagination import KeysetPage, encode_cursor
+from .models import (
+    AllocationGroup,
+    AllocationUsage,
+    Building,
+    Course,
+    Day,
+    Department,
+    DepartmentAllocation,
+    Meeting,
+    Room,
+    Section,
+    SnapshotVersion,
+    StartEndTime,
+    Subject,
+    Term,
+    TimeBlock,
+)
+from .timetable import time_to_minutes
+
+# Queries of a page of sections.html besides the ones of the view itself:
+#   the session, the user, the count of the page and the sections with their meetings
+#   (see Section.with_rows)
+SESSION_QUERIES = 2
+PAGE_QUERIES = 3
+
+
+class SectionRowsTestCase(TestCase):
+    """Sections (each with meetings in general purpose rooms) to show in sections.html"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="head", password="password")
+        cls.professor = Professor.objects.create(
+            first_name="Department",
+            last_name="Head",
+            is_department_head=True,
+            user=cls.user,
+        )
+        cls.department = Department.objects.create(
+            name="Computer Science", code="CS", chair=cls.professor
+        )
+        cls.subject = Subject.objects.create(code="CMPT", department=cls.department)
+        cls.term = Term.objects.create(season=Term.FALL, year=2023)
+        cls.allocation_group = AllocationGroup.objects.create()
+        building = Building.objects.create(name="Hancock", code="HC")
+        cls.room = Room.objects.create(
+            number="2023", building=building, capacity=30, is_general_purpose=True
+        )
+        cls.time_blocks = []
+        for number, (start, end) in enumerate([(8, 9), (9, 10), (10, 11)], start=1):
+            start_end_time = StartEndTime.objects.create(start=time(start), end=time(end, 15))
+            for day in (Day.MONDAY, Day.THURSDAY):
+                time_block = TimeBlock.objects.create(
+                    day=day, number=number, start_end_time=start_end_time
+                )
+                time_block.allocation_groups.add(cls.allocation_group)
+                cls.time_blocks.append(time_block)
+
+    def create_sections(self, count: int) -> list[Section]:
+        """Sections of different courses that meet twice a week"""
+        sections = []
+        for i in range(count):
+            course = Course.objects.create(
+                code=f"{100 + i}", credits=3, title=f"Course {i}", subject=self.subject
+            )
+            section = Section.objects.create(
+                banner_course=f"{1000 + i}",
+                number="111",
+                campus="Main",
+                term=self.term,
+                course=course,
+                primary_professor=self.professor,
+            )
+            for time_block in self.time_blocks[2 * (i % 3) : 2 * (i % 3) + 2]:
+                Meeting.objects.create(
+                    section=section,
+                    time_block=time_block,
+                    room=self.room,
+                    professor=self.professor,
+                )
+            sections.append(section)
+        return sections
+
+    def get_sections(self, view_name: str, data: dict, queries: int, rows: int):
+        """Gets the page and checks that it took the same queries for any number of rows"""
+        self.client.force_login(self.user)
+        with self.assertNumQueries(queries):
+            response = self.client.get(reverse(view_name), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["sections"]), rows)
+        for section in response.context["sections"]:
+            self.assertEqual(len(section.sorted_meetings), 2)
+
+
+class SectionSearchTest(SectionRowsTestCase):
+    def search(self, rows: int):
+        data = {
+            "term": self.term.pk,
+            "department": self.department.pk,
+            "subject": "any",
+        }
+        # the professor of the user
+        queries = SESSION_QUERIES + 1 + PAGE_QUERIES
+        self.get_sections("section_search", data, queries, rows)
+
+    def test_queries_do_not_grow_with_the_rows(self):
+        self.create_sections(2)
+        self.search(rows=2)
+        self.create_sections(Section.SEARCH_INTERVAL)
+        self.search(rows=Section.SEARCH_INTERVAL)
+
+
+class AllocationUsageTest(SectionRowsTestCase):
+    def setUp(self):
+        self.meeting = self.create_sections(1)[0].meetings.select_related("section").first()
+        building = Building.objects.get()
+        self.other_room = Room.objects.create(
+            number="2024", building=building, capacity=30, is_general_purpose=True
+        )
+
+    def used_rooms(self) -> int:
+        key = (self.department.pk, self.allocation_group.pk)
+        return DepartmentAllocation.get_usage(self.term).get(key, 0)
+
+    def assertUpToDate(self, used_rooms: int):
+        self.assertEqual(AllocationUsage.get_stale(), {})
+        self.assertEqual(self.used_rooms(), used_rooms)
+
+    def test_saving_meetings_keeps_the_usage_up_to_date(self):
+        # both meetings of the section are in the same room
+        self.assertUpToDate(1)
+        self.meeting.room = self.other_room
+        self.meeting.save()
+        self.assertUpToDate(2)
+        self.meeting.time_block = None
+        self.meeting.save()
+        self.assertUpToDate(1)
+        Meeting.objects.filter(section=self.meeting.section).delete()
+        self.assertUpToDate(0)
+        self.assertFalse(AllocationUsage.objects.exists())
+
+    def test_only_what_changed_is_recounted(self):
+        # claiming: the meeting and the stamp of the term
+        self.meeting.professor = None
+        with self.assertNumQueries(3):
+            self.meeting.save()
+        # a room: the keys before, the meeting, the stamp and the recount
+        self.meeting.room = self.other_room
+        with self.assertNumQueries(6):
+            self.meeting.save()
+        self.assertUpToDate(2)
+
+    def test_the_request_sees_the_new_usage(self):
+        with IdentityMap.scope():
+            self.assertEqual(self.used_rooms(), 1)
+            self.meeting.room = self.other_room
+            self.meeting.save()
+            self.assertEqual(self.used_rooms(), 2)
+
+    def test_reassigning_what_is_above_the_meetings(self):
+        section = self.meeting.section
+        other_department = Department.objects.create(name="Mathematics", code="MA")
+        other_subject = Subject.objects.create(code="MATH", department=other_department)
+        other_term = Term.objects.create(season=Term.SPRING, year=2024)
+
+        self.subject.department = other_department
+        self.subject.save()
+        self.assertUpToDate(0)
+        section.course.subject = other_subject
+        section.course.save()
+        self.assertUpToDate(0)
+        other_subject.department = self.department
+        other_subject.save()
+        self.assertUpToDate(1)
+        section.term = other_term
+        section.save()
+        self.assertUpToDate(0)
+        self.assertEqual(
+            list(AllocationUsage.objects.values_list("term", "department", "used_rooms")),
+            [(other_term.pk, self.department.pk, 1)],
+        )
+
+    def test_allocation_groups_of_the_time_blocks(self):
+        time_block = self.meeting.time_block
+        # only the time blocks that changed are recounted
+        AllocationUsage.objects.update(used_rooms=5)
+        stale = AllocationUsage.get_stale()
+        other_group = AllocationGroup.objects.create()
+        self.time_blocks[-1].allocation_groups.add(other_group)
+        self.assertEqual(AllocationUsage.get_stale(), stale)
+        AllocationUsage.rebuild()
+
+        time_block.allocation_groups.add(other_group)
+        self.assertUpToDate(1)
+        self.assertEqual(DepartmentAllocation.get_usage(self.term).get((self.department.pk, other_group.pk)), 1)
+        time_block.allocation_groups.remove(self.allocation_group)
+        self.assertUpToDate(1)
+        other_group.time_blocks.clear()
+        self.assertUpToDate(1)
+        self.assertEqual(DepartmentAllocation.get_usage(self.term), {(self.department.pk, self.allocation_group.pk): 1})
+
+    def test_rebuild_usage_check(self):
+        call_command("rebuildusage", "--check", stdout=StringIO())
+        AllocationUsage.objects.update(used_rooms=5)
+        with self.assertRaises(CommandError):
+            call_command("rebuildusage", "--check", stdout=StringIO())
+        call_command("rebuildusage", "--term", str(self.term.pk), stdout=StringIO())
+        call_command("rebuildusage", "--check", stdout=StringIO())
+        self.assertUpToDate(1)
+        with self.assertRaises(CommandError):
+            call_command("rebuildusage", "--term", str(self.term.pk + 1), stdout=StringIO())
+
+
+class CourseSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="Computer Science", code="CS")
+        subject = Subject.objects.create(code="CMPT", department=department)
+        courses = [
+            ("101", "Intro to Programming", None),
+            ("210", "Archaeology of Italy", None),
+            ("220", "C++ Programming", None),
+            ("230", "Data Structures", "Linked lists and programming with them"),
+        ]
+        for code, title, description in courses:
+            Course.objects.create(
+                code=code, credits=3, title=title, description=description, subject=subject
+            )
+
+    def search(self, query: str) -> list[str]:
+        return [course.title for course in CourseSearch.search(Course.objects.all(), query)]
+
+    def test_word_prefixes(self):
+        self.assertEqual(self.search("intro"), ["Intro to Programming"])
+        self.assertEqual(self.search("cmpt 10"), ["Intro to Programming"])
+        # the description counts less than the title
+        self.assertEqual(
+            self.search("program"),
+            ["C++ Programming", "Intro to Programming", "Data Structures"],
+        )
+        self.assertEqual(self.search("linked"), ["Data Structures"])
+
+    def test_falls_back_to_the_live_search(self):
+        for query in ("ology", "ming", "C++", "-", "", "++ prog"):
+            live_search = Course.objects.filter(Course.live_search_filter(query))
+            self.assertEqual(
+                sorted(self.search(query)), sorted(course.title for course in live_search)
+            )
+        self.assertEqual(self.search("ology"), ["Archaeology of Italy"])
+        self.assertEqual(self.search("C++"), ["C++ Programming"])
+        self.assertEqual(self.search("-"), [])
+
+    def test_one_query(self):
+        CourseSearch.is_available()
+        for query in ("program", "ology", "C++"):
+            with self.assertNumQueries(1):
+                self.search(query)
+
+
+class BuildingRecommendationsTest(SectionRowsTestCase):
+    def test_a_saved_meeting_swaps_in_a_recounted_copy(self):
+        section = self.create_sections(1)[0]
+        building = Building.objects.create(name="Donnelly", code="DN")
+        room = Room.objects.create(number="225", building=building, capacity=30)
+        recommendations = BuildingRecommendations.get(self.term)
+        course_buildings = {
+            course: counts.copy()
+            for course, counts in recommendations.course_buildings.items()
+        }
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for meeting in section.meetings.all():
+                meeting.room = room
+                meeting.save()
+        with mock.patch.object(BuildingRecommendations, "load", side_effect=AssertionError):
+            recounted = BuildingRecommendations.get(self.term)
+        self.assertIsNot(recounted, recommendations)
+        self.assertEqual(recommendations.course_buildings, course_buildings)
+        loaded = BuildingRecommendations.load(self.term.pk)
+        self.assertEqual(recounted.course_buildings, loaded.course_buildings)
+        self.assertEqual(recounted.recommend(section.course_id), building.pk)  # pyright: ignore
+
+    def test_no_building_without_rooms_or_buildings(self):
+        section = self.create_sections(1)[0]
+        Building.objects.all().delete()
+        term = Term.objects.create(season=Term.SPRING, year=2024)
+        self.assertIsNone(Building.recommend(section.course, term))
+
+
+class TimetableTest(SectionRowsTestCase):
+    def stamps(self) -> dict[str, str]:
+        return dict(SnapshotVersion.objects.values_list("name", "stamp"))
+
+    def test_saved_time_blocks_are_reloaded(self):
+        section = self.create_sections(1)[0]
+        other_term = Term.objects.create(season=Term.SPRING, year=2024)
+        TermOccupancy.get(self.term)
+        TermOccupancy.get(other_term)
+        other_stamp = SnapshotVersion.stamp_of(SnapshotVersion.term_name(other_term))
+
+        time_block = self.time_blocks[0]
+        time_block.number = 4
+        time_block.save()
+        self.assertIn(
+            {"day": Day.MONDAY, "start": time(8), "end": time(9, 15), "numbers": "4"},
+            TimeBlock.get_number_icons(),
+        )
+        start_end_time = time_block.start_end_time
+        start_end_time.start = time(7, 30)
+        start_end_time.save()
+        starts = {o.start for o in TermOccupancy.get(self.term).occupations.values() if o.section == section.pk}
+        self.assertEqual(starts, {time_to_minutes(time(7, 30))})
+        # the other term has no meetings at the time
+        self.assertEqual(SnapshotVersion.stamp_of(SnapshotVersion.term_name(other_term)), other_stamp)
+
+    def test_times_of_edited_meetings_change_nothing(self):
+        TermOccupancy.get(self.term)
+        stamps = self.stamps()
+        # like EditMeetingRequest.realize with a time that is not an official time block
+        start_end_time, _ = StartEndTime.objects.get_or_create(start=time(13), end=time(15))
+        TimeBlock.objects.get_or_create(day=Day.FRIDAY, start_end_time=start_end_time)
+        StartEndTime.objects.get_or_create(start=time(13), end=time(15))
+        self.assertEqual(self.stamps(), stamps)
+
+    def test_saved_allocations_are_shown(self):
+        allocation = DepartmentAllocation.objects.create(
+            department=self.department, allocation_group=self.allocation_group, number_of_classrooms=2
+        )
+        self.client.force_login(self.user)
+        data = {"department": self.department.pk, "term": self.term.pk}
+        for number_of_classrooms in (2, 5):
+            allocation.number_of_classrooms = number_of_classrooms
+            allocation.save()
+            self.assertEqual(TermOccupancy.get(self.term).department_allocations, {
+                (self.department.pk, self.allocation_group.pk): number_of_classrooms,
+            })
+            response = self.client.get(reverse("dep_allo"), data)
+            numbers = response.context["numbers"][self.time_blocks[0].start_end_time_id]  # pyright: ignore
+            self.assertEqual(numbers[Day.MONDAY]["max"], number_of_classrooms)
+
+
+class IdentityMapTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.building = Building.objects.create(name="Hancock", code="HC")
+        cls.room = Room.objects.create(number="2023", building=cls.building, capacity=30)
+
+    def test_second_get_does_not_query(self):
+        with IdentityMap.scope() as identity_map:
+            with self.assertNumQueries(1):
+                room = IdentityMap.get(Room, self.room.pk)
+                room.building
+            with self.assertNumQueries(0):
+                # the pk as it comes from a form
+                self.assertIs(IdentityMap.get(Room, str(self.room.pk)), room)
+                self.assertEqual(IdentityMap.get_many(Room, [self.room.pk]), {self.room.pk: room})
+        self.assertEqual((identity_map.hits, identity_map.misses), (2, 1))
+        # outside of a request it always queries
+        with self.assertNumQueries(2):
+            self.assertIsNot(IdentityMap.get(Room, self.room.pk), IdentityMap.get(Room, self.room.pk))
+
+    def test_forget_asks_the_factory_again(self):
+        factory = mock.Mock(side_effect=[1, 2])
+        with IdentityMap.scope():
+            self.assertEqual(IdentityMap.memoize("key", factory), 1)
+            self.assertEqual(IdentityMap.memoize("key", factory), 1)
+            IdentityMap.forget("key")
+            self.assertEqual(IdentityMap.memoize("key", factory), 2)
+        self.assertEqual(factory.call_count, 2)
+
+    def test_nothing_is_kept_between_requests(self):
+        seen = []
+
+        def view(request):
+            seen.append(dict(IdentityMap.current().instances))  # pyright: ignore
+            IdentityMap.get(Room, self.room.pk)
+            IdentityMap.get(Room, self.room.pk)
+            return HttpResponse()
+
+        middleware = IdentityMapMiddleware(view)
+        with override_settings(DEBUG=True):
+            responses = [middleware(RequestFactory().get("/")) for _ in range(2)]
+        self.assertEqual(seen, [{}, {}])
+        self.assertIsNone(IdentityMap.current())
+        for response in responses:
+            self.assertEqual(response["X-Identity-Map"], "hits=1; misses=1")
+        with override_settings(DEBUG=False):
+            self.assertNotIn("X-Identity-Map", middleware(RequestFactory().get("/")))
+
+
+class FreeRoomsTest(SimpleTestCase):
+    def setUp(self):
+        self.occupancy = TermOccupancy(term=1)
+        for room_pk in (1, 2, 3):
+            self.occupancy.rooms[room_pk] = RoomInfo(pk=room_pk, building=1, is_general_purpose=False)
+            self.occupancy.room_positions[room_pk] = len(self.occupancy.room_positions)
+        # (room, section, start, end) on monday, the second one is not on the 5 minute slots
+        occupations = [
+            (1, 1, time(8), time(9, 15)),
+            (2, 2, time(9, 32), time(10, 47)),
+            (3, 3, time(12), time(13)),
+            (None, 4, time(8), time(9, 15)),
+        ]
+        for meeting_pk, (room, section, start, end) in enumerate(occupations, start=1):
+            self.occupancy.insert(
+                Occupation(
+                    meeting=meeting_pk,
+                    section=section,
+                    course=1,
+                    department=None,
+                    room=room,
+                    professor=None,
+                    time_block=1,
+                    day=Day.MONDAY,
+                    start=time_to_minutes(start),
+                    end=time_to_minutes(end),
+                )
+            )
+
+    def test_free_rooms(self):
+        windows = [
+            (Day.MONDAY, time(8), time(9, 15)),
+            # the ends touch
+            (Day.MONDAY, time(9, 15), time(9, 30)),
+            (Day.MONDAY, time(10, 47), time(11)),
+            # only in the same 5 minute slots as the meetings of the first two rooms
+            (Day.MONDAY, time(9, 16), time(9, 19)),
+            (Day.MONDAY, time(9, 20), time(9, 31)),
+            (Day.MONDAY, time(12, 30), time(12, 45)),
+            (Day.TUESDAY, time(8), time(9, 15)),
+        ]
+        expected = [
+            [False, True, True],
+            [False, True, True],
+            [True, False, True],
+            [True, True, True],
+            [True, True, True],
+            [True, True, False],
+            [True, True, True],
+        ]
+        self.assertEqual(self.occupancy.free_rooms([1, 2, 3], windows).tolist(), expected)
+        # the rooms can be asked for in any order
+        self.assertEqual(
+            self.occupancy.free_rooms([3, 1], windows[:1]).tolist(), [[True, False]]
+        )
+
+    def test_excluded_sections_do_not_take_rooms(self):
+        windows = [(Day.MONDAY, time(8), time(9, 15)), (Day.MONDAY, time(12, 30), time(12, 45))]
+        free = self.occupancy.free_rooms([1, 2, 3], windows, {1, 3})
+        self.assertEqual(free.tolist(), [[True, True, True], [True, True, True]])
+
+
+class MovedOccupancyTest(SectionRowsTestCase):
+    def setUp(self):
+        self.section = self.create_sections(1)[0]
+        # on monday and thursday from 8:00 to 9:15 in the room
+        self.monday, self.thursday = self.section.meetings.order_by("pk")
+        self.other_room = Room.objects.create(number="301", building=Building.objects.get())
+        self.index = TermOccupancy.get(self.term)
+        self.index.room_slots()
+
+    def occupation(self, meeting: Meeting, room: Room, day: str, start: time, end: time) -> Occupation:
+        return Occupation(
+            meeting=meeting.pk,
+            section=self.section.pk,
+            course=self.section.course_id,  # pyright: ignore
+            department=self.department.pk,
+            room=room.pk,
+            professor=self.professor.pk,
+            time_block=meeting.time_block_id,  # pyright: ignore
+            day=day,
+            start=time_to_minutes(start),
+            end=time_to_minutes(end),
+        )
+
+    def save(self, meeting: Meeting, delete: bool = False) -> TermOccupancy:
+        """The index after the change, which has to be moved and not loaded again"""
+        with self.captureOnCommitCallbacks(execute=True):
+            if delete:
+                meeting.delete()
+            else:
+                meeting.save()
+        with mock.patch.object(TermOccupancy, "load", side_effect=AssertionError):
+            return TermOccupancy.get(self.term)
+
+    def test_moved_meeting(self):
+        self.monday.room = self.other_room
+        self.monday.time_block = self.time_blocks[2]
+        index = self.save(self.monday)
+
+        moved = self.occupation(self.monday, self.other_room, Day.MONDAY, time(9), time(10, 15))
+        thursday = self.occupation(self.thursday, self.room, Day.THURSDAY, time(8), time(9, 15))
+        self.assertEqual(index.occupations, {self.monday.pk: moved, self.thursday.pk: thursday})
+        self.assertEqual(index.by_room[self.other_room.pk], {Day.MONDAY: [moved]})
+        self.assertEqual(index.by_room[self.room.pk][Day.MONDAY], [])
+        self.assertEqual(index.by_professor[self.professor.pk][Day.MONDAY], [moved])
+        windows = [(Day.MONDAY, time(8), time(8, 30)), (Day.MONDAY, time(9, 30), time(10))]
+        self.assertEqual(
+            index.free_rooms([self.room.pk, self.other_room.pk], windows).tolist(),
+            [[True, True], [True, False]],
+        )
+        # the index it was copied from still has the meeting where it was
+        self.assertEqual(self.index.by_room[self.room.pk][Day.MONDAY][0].start, time_to_minutes(time(8)))
+        self.assertEqual(
+            self.index.free_rooms([self.room.pk], windows[:1]).tolist(), [[False]]
+        )
+
+    def test_deleted_and_off_slot_meetings(self):
+        index = self.save(self.thursday, delete=True)
+        self.assertEqual(list(index.occupations), [self.monday.pk])
+        self.assertEqual(index.by_room[self.room.pk][Day.THURSDAY], [])
+
+        self.monday.time_block = TimeBlock.objects.create(
+            start_end_time=StartEndTime.objects.create(start=time(7, 52), end=time(9, 7)),
+            day=Day.MONDAY,
+        )
+        index = self.save(self.monday)
+        windows = [(Day.MONDAY, time(9, 7), time(9, 10)), (Day.MONDAY, time(9, 8), time(9, 10))]
+        # the bits of the room are only a hint now
+        self.assertEqual(index.free_rooms([self.room.pk], windows).tolist(), [[False], [True]])
+
+
+class RoomsInNumberTest(SectionRowsTestCase):
+    def setUp(self):
+        hancock = Building.objects.get()
+        self.donnelly = Building.objects.create(name="Donnelly", code="DN")
+        self.hancock_301 = Room.objects.create(number="301", building=hancock)
+        self.donnelly_302 = Room.objects.create(number="302", building=self.donnelly, is_general_purpose=True)
+        donnelly_303 = Room.objects.create(number="303", building=self.donnelly)
+        # a room without a building is never available
+        Room.objects.create(number="Online")
+
+        # number 1 is monday and thursday 8:00-9:15
+        monday, thursday, monday_at_9 = self.time_blocks[0], self.time_blocks[1], self.time_blocks[2]
+        off_time = TimeBlock.objects.create(
+            start_end_time=StartEndTime.objects.create(start=time(8, 30), end=time(9, 45)),
+            day=Day.MONDAY,
+        )
+        section = self.create_sections(1)[0]
+        section.meetings.all().delete()
+        other_term_section = Section.objects.create(
+            banner_course="2000", number="111", campus="Main", course=section.course,
+            term=Term.objects.create(season=Term.SPRING, year=2024),
+        )
+        for meeting_section, time_block, room in [
+            (section, off_time, self.hancock_301),
+            (section, thursday, donnelly_303),
+            # starts before number 1 ends
+            (section, monday_at_9, donnelly_303),
+            # not in the term
+            (other_term_section, monday, self.room),
+        ]:
+            Meeting.objects.create(section=meeting_section, time_block=time_block, room=room)
+
+    def rooms(self, include_general: bool, both_open: bool, number: int = 1) -> list[Room]:
+        return list(Building.get_rooms_available_in_number(number, self.term, include_general, both_open))
+
+    def test_open_in_both_or_one_time_block(self):
+        self.assertEqual(self.rooms(include_general=True, both_open=True), [self.room, self.donnelly_302])
+        self.assertEqual(
+            self.rooms(include_general=True, both_open=False),
+            [self.room, self.hancock_301, self.donnelly_302],
+        )
+        self.assertEqual(self.rooms(include_general=False, both_open=True), [])
+        self.assertEqual(self.rooms(include_general=False, both_open=False), [self.hancock_301])
+        self.assertEqual(self.rooms(include_general=True, both_open=True, number=99), [])
+
+    def test_rooms_of_a_building(self):
+        rooms = self.donnelly.get_available_rooms_in_number(1, self.term, True, False)
+        self.assertEqual(list(rooms), [self.donnelly_302])
+
+
+class KeysetPageTest(TestCase):
+    SIZE = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="Computer Science", code="CS")
+        subject = Subject.objects.create(code="CMPT", department=department)
+        cls.term = Term.objects.create(season=Term.FALL, year=2023)
+        # titles that tie so the pk has to break the ties
+        titles = ["Logic", "Programming", "Logic", "Data Programming", "Logic", "Programming", "Data Programming"]
+        for code, title in enumerate(titles, start=101):
+            course = Course.objects.create(code=str(code), credits=3, title=title, subject=subject)
+            Section.objects.create(
+                banner_course=str(code), number="111", campus="Main", term=cls.term, course=course
+            )
+        CourseSearch.rebuild()
+
+    def walk(self, queryset: QuerySet) -> list[KeysetPage]:
+        """Every page from the first one on following the after cursors"""
+        pages = [KeysetPage.paginate(queryset, self.SIZE, count=True)]
+        # cursors that do not move forward would never get to the last page
+        while pages[-1].has_next and len(pages) <= queryset.count():
+            page = pages[-1]
+            pages.append(
+                KeysetPage.paginate(
+                    queryset, self.SIZE, after=page.last_cursor, start=page.end, count=True
+                )
+            )
+        return pages
+
+    def codes(self, pages: list[KeysetPage]) -> list[list[int]]:
+        return [
+            [int((item.course if isinstance(item, Section) else item).code) for item in page.items]
+            for page in pages
+        ]
+
+    def test_tied_titles(self):
+        sections = Section.objects.filter(term=self.term)
+        pages = self.walk(Section.sort_sections(sections, "sortTitle", "ascending"))
+        self.assertEqual(self.codes(pages), [[104, 107, 101], [103, 105, 102], [106]])
+        self.assertEqual([(page.start, page.has_previous, page.has_next) for page in pages], [
+            (0, False, True), (3, True, True), (6, True, False),
+        ])
+        self.assertEqual({page.count for page in pages}, {7})
+
+        pages = self.walk(Section.sort_sections(sections, "sortTitle", "descending"))
+        self.assertEqual(self.codes(pages), [[102, 106, 101], [103, 105, 104], [107]])
+
+    def test_back_from_the_last_page(self):
+        sections = Section.objects.filter(term=self.term).order_by("course__title")
+        last = self.walk(sections)[-1]
+        page = KeysetPage.paginate(sections, self.SIZE, before=last.first_cursor, start=3)
+        self.assertEqual(self.codes([page]), [[103, 105, 102]])
+        self.assertEqual((page.start, page.has_previous, page.has_next), (3, True, True))
+        # a before cursor that reaches the first page starts at 0 whatever start it got
+        page = KeysetPage.paginate(sections, self.SIZE, before=page.first_cursor, start=37)
+        self.assertEqual(self.codes([page]), [[104, 107, 101]])
+        self.assertEqual((page.start, page.has_previous), (0, False))
+
+    def test_ranked_search(self):
+        courses, has_results = Course.search("programming", self.term.pk)
+        self.assertTrue(has_results)
+        # the shorter titles rank first
+        self.assertEqual(self.codes(self.walk(courses)), [[102, 106, 104], [107]])
+
+    def test_bad_cursors_are_the_first_page(self):
+        sections = Section.objects.filter(term=self.term).order_by("-course__title")
+        first = KeysetPage.paginate(sections, self.SIZE)
+        for cursor in ("", "not a cursor", encode_cursor([1])):
+            page = KeysetPage.paginate(sections, self.SIZE, after=cursor, start=8)
+            self.assertEqual(page.items, first.items)
+            self.assertEqual(page.start, 0)
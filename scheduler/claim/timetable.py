@@ -0,0 +1,169 @@
+import threading
+from dataclasses import dataclass, field
+from datetime import time, timedelta
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from .models import DepartmentAllocation, StartEndTime
+
+# Time blocks, their start/ end times, allocation groups and department allocations only
+#   change when loadgeneral runs (or when someone uses the admin page) so every process
+#   keeps one snapshot of them instead of querying them on each request.
+# The snapshot knows the SnapshotVersion stamp it was loaded at. The stamp is changed in
+#   the same transaction as the time blocks so every process reloads its snapshot on
+#   its next request. See claim/signals.py
+
+
+def time_to_minutes(t: time | timedelta) -> int:
+    if isinstance(t, timedelta):
+        return int(t.total_seconds() // 60)
+    return t.hour * 60 + t.minute
+
+
+def minutes_to_time(minutes: int) -> time:
+    return time(hour=(minutes // 60) % 24, minute=minutes % 60)
+
+
+@dataclass(frozen=True)
+class OfficialTimeBlock:
+    pk: int
+    number: int
+    day: str
+    start_end_time: int
+    start: time
+    end: time
+    allocation_groups: frozenset[int]
+
+    @property
+    def allocation_group(self) -> int | None:
+        # same as .allocation_groups.first()
+        return min(self.allocation_groups) if self.allocation_groups else None
+
+    def start_minutes(self) -> int:
+        return time_to_minutes(self.start)
+
+    def end_minutes(self) -> int:
+        return time_to_minutes(self.end)
+
+
+@dataclass
+class Timetable:
+    # SnapshotVersion stamp of the timetable
+    version: str
+    # time blocks with a number ordered by pk
+    official_time_blocks: list[OfficialTimeBlock] = field(default_factory=list)
+    # every time block (numbered or not) -> its allocation groups
+    time_block_groups: dict[int, frozenset[int]] = field(default_factory=dict)
+    group_time_blocks: dict[int, list[int]] = field(default_factory=dict)
+    # ordered by pk
+    department_allocations: list["DepartmentAllocation"] = field(default_factory=list)
+    # start end times of official time blocks ordered by their end
+    start_end_times: list["StartEndTime"] = field(default_factory=list)
+
+    _snapshot = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def current_version() -> str:
+        from .models import SnapshotVersion
+
+        return SnapshotVersion.stamp_of(SnapshotVersion.TIMETABLE)
+
+    @staticmethod
+    def get() -> "Timetable":
+        version = Timetable.current_version()
+        with Timetable._lock:
+            snapshot: Timetable | None = Timetable._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        snapshot = Timetable.load(version)
+        with Timetable._lock:
+            Timetable._snapshot = snapshot
+        return snapshot
+
+    @staticmethod
+    def invalidate():
+        """Every process reloads the timetable once the transaction commits"""
+        from .models import SnapshotVersion
+
+        SnapshotVersion.bump(SnapshotVersion.TIMETABLE)
+
+    @staticmethod
+    def load(version: str) -> "Timetable":
+        from .models import DepartmentAllocation, StartEndTime, TimeBlock
+
+        timetable = Timetable(version=version)
+        groups: dict[int, set[int]] = {}
+        through = TimeBlock.allocation_groups.through
+        for row in through.objects.values("timeblock", "allocationgroup"):
+            groups.setdefault(row["timeblock"], set()).add(row["allocationgroup"])
+        for time_block_pk, time_block_groups in groups.items():
+            timetable.time_block_groups[time_block_pk] = frozenset(time_block_groups)
+            for group in time_block_groups:
+                timetable.group_time_blocks.setdefault(group, []).append(time_block_pk)
+
+        time_blocks = (
+            TimeBlock.objects.filter(number__isnull=False)
+            .order_by("pk")
+            .values(
+                "pk",
+                "number",
+                "day",
+                "start_end_time",
+                "start_end_time__start",
+                "start_end_time__end",
+            )
+        )
+        for time_block in time_blocks:
+            timetable.official_time_blocks.append(
+                OfficialTimeBlock(
+                    pk=time_block["pk"],
+                    number=time_block["number"],
+                    day=time_block["day"],
+                    start_end_time=time_block["start_end_time"],
+                    start=time_block["start_end_time__start"],
+                    end=time_block["start_end_time__end"],
+                    allocation_groups=timetable.time_block_groups.get(
+                        time_block["pk"], frozenset()
+                    ),
+                )
+            )
+
+        timetable.department_allocations = list(
+            DepartmentAllocation.objects.order_by("pk")
+        )
+        timetable.start_end_times = list(
+            StartEndTime.objects.exclude(time_blocks__number=None).order_by("end")
+        )
+        return timetable
+
+    def official(
+        self, start: time | timedelta | None, end: time | timedelta, day: str | None
+    ) -> list[OfficialTimeBlock]:
+        """Official time blocks on the day that overlap the start and end (inclusive)"""
+        if start is None or day is None:
+            return []
+        start_minutes = time_to_minutes(start)
+        end_minutes = time_to_minutes(end)
+        return [
+            time_block
+            for time_block in self.official_time_blocks
+            if time_block.day == day
+            and time_block.start_minutes() <= end_minutes
+            and time_block.end_minutes() >= start_minutes
+        ]
+
+    def department_allocations_of(
+        self, department: int, allocation_groups: set[int] | frozenset[int] | None = None
+    ) -> list["DepartmentAllocation"]:
+        return [
+            department_allocation
+            for department_allocation in self.department_allocations
+            if department_allocation.department_id == department  # pyright: ignore
+            and (
+                allocation_groups is None
+                or department_allocation.allocation_group_id  # pyright: ignore
+                in allocation_groups
+            )
+        ]
@@ -1,13 +1,14 @@
 from .models import *
+from .timetable import Timetable
 from datetime import timedelta
 
 def will_exceed_department_allocation(start_time: timedelta, end_time: timedelta, day: str, department: Department, term: Term) -> bool:
     
     group_time_blocks = TimeBlock.get_official_time_blocks(start_time, end_time, day)
 
-    department_allocations = DepartmentAllocation.objects.filter(
-        department=department,
-        allocation_group__in=group_time_blocks.values('allocation_groups').all()
-    )
+    allocation_groups: set[int] = set()
+    for time_block in group_time_blocks:
+        allocation_groups.update(time_block.allocation_groups)
+    department_allocations = Timetable.get().department_allocations_of(department.pk, allocation_groups)
 
-    return any(map(lambda d_a: d_a.exceeds_allocation(term), department_allocations.all()))
+    return any(map(lambda d_a: d_a.exceeds_allocation(term), department_allocations))
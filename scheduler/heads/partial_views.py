@@ -1,9 +1,15 @@
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
+from django.db.transaction import atomic
+from django.views.decorators.http import require_http_methods
+from django_htmx.http import HttpResponseClientRedirect
 from claim.models import *
+from claim.pagination import KeysetPage
+from claim.timetable import Timetable
 from django.db.models import Q
+from request.auto_scheduler import AutoScheduler
 from .page_views import only_department_heads
 
 
@@ -17,45 +23,42 @@ def dep_allo(request: HttpRequest) -> HttpResponse:
     department = request.GET.get('department')
     department = Department.objects.get(pk=department)
     term = request.GET['term']
-    print(department, term)
 
     
-    time_blocks = TimeBlock.objects.exclude(number=None)
+    timetable = Timetable.get()
     
     numbers: dict[int, dict[str, dict[str, dict]]] = {}
 
     # generating the allocation group data
     numbers_allo_group: dict[int, dict] = {}
-    for department_allocation in DepartmentAllocation.objects.filter(department=department).all():
+    for department_allocation in timetable.department_allocations_of(department.pk):
         number_dict = {}
 
         number_dict["count"] = department_allocation.count_rooms(term)
 
         number_dict["max"] = department_allocation.number_of_classrooms
-        numbers_allo_group[department_allocation.allocation_group.pk] = number_dict
+        numbers_allo_group[department_allocation.allocation_group_id] = number_dict # pyright: ignore
 
 
-    for time_block in time_blocks.all():
-        department_allo: AllocationGroup = time_block.allocation_groups.first()
-        number_dict = numbers_allo_group[department_allo.pk].copy()
-        number_dict["allocation_group"] = department_allo.pk
+    for time_block in timetable.official_time_blocks:
+        department_allo = time_block.allocation_group
+        number_dict = numbers_allo_group[department_allo].copy()
+        number_dict["allocation_group"] = department_allo
         number_dict["number"] = time_block.number
 
-        start_time_blob = numbers.get(time_block.start_end_time.pk)
-        if start_time_blob is None: numbers[time_block.start_end_time.pk] = {}
-        numbers[time_block.start_end_time.pk][time_block.day] = number_dict
+        numbers.setdefault(time_block.start_end_time, {})[time_block.day] = number_dict
 
     time_blocks_dict = {}
     for code, _ in Day.DAY_CHOICES:
         time_blocks_dict[code] = {}
-        for tb in time_blocks.filter(day=code).all():
-            time_blocks_dict[code][tb.number] = tb
+    for tb in timetable.official_time_blocks:
+        time_blocks_dict[tb.day][tb.number] = tb
 
     context = {
             "department": department,
             "time_blocks": time_blocks_dict,
             "numbers": numbers,
-            "start_end_times": StartEndTime.objects.exclude(time_blocks__number=None).order_by("end").all(),
+            "start_end_times": timetable.start_end_times,
             "days": Day.DAY_CHOICES,
             }
     response = render(request, "dep_allo.html", context=context)
@@ -73,8 +76,6 @@ def dep_allo_sections(request: HttpRequest) -> HttpResponse:
     sort_column = request.GET.get('sortColumn')
     sort_type = request.GET.get('sortType')
     group = request.GET.get('allocationGroup')
-    start_slice = int(request.GET.get('startSlice', 0))
-    end_slice = int(request.GET.get('endSlice', Section.SEARCH_INTERVAL))
     sections_qs = Section.objects.filter(course__subject__department=department, term=term)
     if (group is not None):
         allocation_group = AllocationGroup.objects.get(pk=group)
@@ -85,25 +86,22 @@ def dep_allo_sections(request: HttpRequest) -> HttpResponse:
 
 
     sections_qs = Section.sort_sections(section_qs=sections_qs, sort_column=sort_column, sort_type=sort_type)
-    original_length = len(sections_qs)
-    sections_qs = sections_qs[start_slice:end_slice]
+    page = Section.paginate(Section.with_rows(sections_qs), request.GET)
     context = {
         "refresh_url": reverse(request.resolver_match.view_name),
-        "sections": sections_qs,
+        "sections": page.items,
+        "page": page,
         "allocation": True,
         "allocation_group": group,
         "sort_column": sort_column,
         "sort_type": sort_type,
-        "start_slice": start_slice,
-        "end_slice": min(end_slice, original_length),
-        "original_length": original_length,
         "search_interval": Section.SEARCH_INTERVAL
     }
 
     return render(request, "sections.html", context=context) 
 
 @login_required
-def professor_search(request: HttpRequest, offset: int) -> HttpResponse:
+def professor_search(request: HttpRequest) -> HttpResponse:
     data = request.GET
 
     professor_query = data.get("professor_query", "")
@@ -112,15 +110,13 @@ def professor_search(request: HttpRequest, offset: int) -> HttpResponse:
         professor_filter |= Q(first_name__icontains=part)
         professor_filter |= Q(last_name__icontains=part)
         professor_filter |= Q(email__icontains=part)
-    possible_professor = Professor.objects.filter(professor_filter).all()
-    amount_of_professors = len(possible_professor)
+    possible_professor = Professor.objects.filter(professor_filter).order_by("last_name", "first_name")
+    page = KeysetPage.paginate(possible_professor, Professor.SEARCH_INTERVAL, after=data.get("after"))
 
     context = {
-        "professors": possible_professor[offset:offset + Professor.SEARCH_INTERVAL],
-        "offset": offset,
-        "get_more": amount_of_professors > (offset + Professor.SEARCH_INTERVAL),
-        "next_offset": offset + Professor.SEARCH_INTERVAL,
-        "has_results": amount_of_professors > 0,
+        "professors": page.items,
+        "page": page,
+        "has_results": len(page.items) > 0,
     }
 
     return render(request, "professor_results.html", context=context)
@@ -159,16 +155,10 @@ def get_head_sections(request: HttpRequest) -> HttpResponse:
 
     is_available = data.get("available", False)
 
-    start_slice = int(data.get("startSlice", 0))
-    end_slice = int(data.get("endSlice", Section.SEARCH_INTERVAL))
-    print(start_slice, end_slice)
-    original_length = 0
     context = {
         "sections": [],
+        "page": KeysetPage(count=0),
         "claim": True,
-        "start_slice": start_slice,
-        "end_slice": min(end_slice, original_length),
-        "original_length": original_length,
         "search_interval": Section.SEARCH_INTERVAL,
     }
 
@@ -198,35 +188,32 @@ def get_head_sections(request: HttpRequest) -> HttpResponse:
             sections_with_any_open_meetings | sections_with_any_open_primaries
         )
 
-    section_qs.order_by("course__pk")
-
-    # terrible way to do this lol i just dont like
-    #    the orm
-    course_hueristic: list[dict] = []
-    courses_left = Section.SEARCH_INTERVAL
-    last_course_pk = None
-    for section in section_qs.all():
-
-        if section.course.pk == last_course_pk:
-            pass
-        else:
-            course_hueristic.append({
-                "course": section.course,
-                "sections": [section],
-                })
-            courses_left -= 1
-
-        if courses_left == 0: break
-    # adding some more fields
-
+    section_qs = section_qs.order_by("course__pk")
+    page = Section.paginate(Section.with_rows(section_qs), data)
+    context["sections"] = page.items
+    context["page"] = page
 
+    return render(request, "head_sections.html", context=context)
 
 
+@login_required
+@require_http_methods(["POST"])
+@atomic
+def auto_schedule(request: HttpRequest) -> HttpResponse:
+    data = request.POST
+    term = Term.objects.get(pk=data["term"])
+    department = Department.objects.get(pk=data["department"])
+    professor: Professor = request.user.professor  # pyright: ignore
+
+    if department.chair_id != professor.pk:  # pyright: ignore
+        return HttpResponseForbidden(
+            f"Only the chair of {department} can schedule its sections!"
+        )
 
-    original_length = len(section_qs)
-    sections = section_qs[start_slice:end_slice]
-    context["sections"] = sections
-    context["end_slice"] = min(end_slice, original_length)
-    context["original_length"] = original_length
+    scheduler = AutoScheduler.for_department(term, department)
+    scheduler.run()
+    bundle = scheduler.save(professor)
+    if bundle is None:
+        return HttpResponse(f"There are no sections of {department} in {term} that could be placed")
 
-    return render(request, "head_sections.html", context=context)
+    return HttpResponseClientRedirect(reverse("message_hub"))
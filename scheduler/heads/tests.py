@@ -0,0 +1,53 @@
+from authentication.models import Professor
+from claim.models import Section
+from claim.tests import PAGE_QUERIES, SESSION_QUERIES, SectionRowsTestCase
+from django.contrib.auth.models import User
+from django.urls import reverse
+from request.models import EditRequestBundle
+
+
+class DepartmentAllocationSectionsTest(SectionRowsTestCase):
+    def allocation_sections(self, rows: int):
+        data = {
+            "term": self.term.pk,
+            "department": self.department.pk,
+            "allocationGroup": self.allocation_group.pk,
+        }
+        # the allocation group
+        queries = SESSION_QUERIES + 1 + PAGE_QUERIES
+        self.get_sections("dep_allo_sections", data, queries, rows)
+
+    def test_queries_do_not_grow_with_the_rows(self):
+        self.create_sections(2)
+        self.allocation_sections(rows=2)
+        self.create_sections(Section.SEARCH_INTERVAL)
+        self.allocation_sections(rows=Section.SEARCH_INTERVAL)
+
+
+class HeadSectionsTest(SectionRowsTestCase):
+    def head_sections(self, sections: list[Section], rows: int):
+        data = {
+            "term": self.term.pk,
+            "department": self.department.pk,
+            "subject": "any",
+            "course": [section.course.pk for section in sections],
+        }
+        queries = SESSION_QUERIES + PAGE_QUERIES
+        self.get_sections("get_head_sections", data, queries, rows)
+
+    def test_queries_do_not_grow_with_the_rows(self):
+        sections = self.create_sections(2)
+        self.head_sections(sections, rows=2)
+        sections += self.create_sections(Section.SEARCH_INTERVAL)
+        self.head_sections(sections, rows=Section.SEARCH_INTERVAL)
+
+
+class AutoScheduleTest(SectionRowsTestCase):
+    def test_only_the_chair_can_schedule(self):
+        user = User.objects.create_user(username="professor", password="password")
+        Professor.objects.create(first_name="Other", last_name="Professor", user=user)
+        self.client.force_login(user)
+        data = {"term": self.term.pk, "department": self.department.pk}
+        response = self.client.post(reverse("auto_schedule"), data)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(EditRequestBundle.objects.exists())
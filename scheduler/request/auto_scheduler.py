@@ -0,0 +1,236 @@
+import time as timer
+from dataclasses import dataclass, field
+from datetime import time
+
+from authentication.models import Professor
+from claim.identity_map import IdentityMap
+from claim.models import Building, Day, Department, Meeting, Section, Term
+from django.db import transaction
+from django.db.models import Prefetch, Q
+
+from .models import (
+    ConflictingCourseGroup,
+    EditMeeting,
+    EditMeetingMessageBundleRequest,
+    EditRequestBundle,
+    EditSectionRequest,
+)
+from .recommender import MeetingRecommender
+
+# Department heads used to place every section by hand. The auto scheduler places every
+#   section of a department in a term that has no meeting with a time block in one go:
+#   the most constrained sections go first and each one takes the best pattern of the
+#   recommender (request/recommender.py) around the sections that are already placed.
+#   A section that does not fit moves one placed section out of its way and puts it back
+#   somewhere else (or undoes the move). Nothing is changed in the meetings, the result
+#   is a request bundle that goes through the normal review
+
+# placed sections that are moved out of the way of one section before giving up on it
+MAX_EJECTIONS = 25
+# seconds spent moving sections out of the way for the whole department
+REPAIR_TIME_BUDGET = 5.0
+# the max length of EditMeetingMessageBundleRequest.message
+MAX_MESSAGE_LENGTH = 300
+
+
+@dataclass
+class AutoScheduler:
+    term: Term
+    department: Department
+    sections: list[Section]
+    # section -> meetings without a time block that the new meetings replace
+    originals: dict[int, list[Meeting]] = field(default_factory=dict)
+    # course -> courses that cannot meet at the same time
+    conflicting_courses: dict[int, set[int]] = field(default_factory=dict)
+    # section -> new meetings
+    placed: dict[int, list[EditMeeting]] = field(default_factory=dict)
+    unplaced: list[Section] = field(default_factory=list)
+    # sections that do not need any (more) meetings
+    skipped: list[Section] = field(default_factory=list)
+
+    @staticmethod
+    def for_department(term: Term, department: Department) -> "AutoScheduler":
+        """Every section of the department in the term without a meeting with a time block"""
+        sections = list(
+            Section.objects.filter(term=term, course__subject__department=department)
+            .exclude(meetings__time_block__isnull=False)
+            .select_related("term", "primary_professor", "course__subject__department")
+            .prefetch_related(
+                Prefetch("meetings", queryset=Meeting.objects.select_related("professor"))
+            )
+            .order_by("pk")
+        )
+        scheduler = AutoScheduler(term=term, department=department, sections=sections)
+        for section in sections:
+            scheduler.originals[section.pk] = list(section.meetings.all())
+        # the groups only go one way but whichever course is placed second has to move
+        courses = {section.course_id for section in sections}  # pyright: ignore
+        course_groups = ConflictingCourseGroup.objects.filter(
+            Q(selected_course__in=courses) | Q(dependant_course__in=courses)
+        ).values_list("selected_course", "dependant_course")
+        for selected_course, dependant_course in course_groups:
+            scheduler.conflicting_courses.setdefault(selected_course, set()).add(
+                dependant_course
+            )
+            scheduler.conflicting_courses.setdefault(dependant_course, set()).add(
+                selected_course
+            )
+        return scheduler
+
+    def professor_of(self, section: Section) -> Professor | None:
+        if section.primary_professor is not None:
+            return section.primary_professor
+        for meeting in self.originals.get(section.pk, []):
+            if meeting.professor is not None:
+                return meeting.professor
+        return None
+
+    def order(self) -> list[Section]:
+        """
+        Most constrained first: sections of professors with the most sections to place,
+        with the most conflicting courses and the largest caps
+        """
+        professor_loads: dict[int, int] = {}
+        for section in self.sections:
+            professor = self.professor_of(section)
+            if professor is not None:
+                professor_loads[professor.pk] = professor_loads.get(professor.pk, 0) + 1
+
+        def constraint(section: Section) -> tuple:
+            professor = self.professor_of(section)
+            return (
+                -(0 if professor is None else professor_loads[professor.pk]),
+                -len(self.conflicting_courses.get(section.course_id, ())),  # pyright: ignore
+                -(section.soft_cap or 0),
+                section.pk,
+            )
+
+        return sorted(self.sections, key=constraint)
+
+    def edit_meetings(self) -> list[EditMeeting]:
+        return [
+            edit_meeting
+            for edit_meetings in self.placed.values()
+            for edit_meeting in edit_meetings
+        ]
+
+    def place(self, section: Section) -> bool:
+        """Places the section around the placed sections (False if nothing fits)"""
+        professor = self.professor_of(section)
+        recommender = MeetingRecommender.for_section(
+            [e for e in self.edit_meetings() if e.section.pk != section.pk],
+            professor,
+            section,
+            self.conflicting_courses.get(section.course_id, set()),  # pyright: ignore
+        )
+        if not recommender.remaining_durations:
+            return True
+        recommendations = recommender.recommend_anywhere(k=1)
+        if not recommendations:
+            return False
+
+        building = None
+        if recommender.building is not None:
+            building = IdentityMap.get(Building, recommender.building)
+        self.placed[section.pk] = EditMeeting.from_recommendation(
+            recommendations[0], section, professor, building, counter=1
+        )
+        return True
+
+    def is_in_the_way(self, section: Section, other: Section) -> bool:
+        """If the other section takes something the section could use"""
+        professor = self.professor_of(section)
+        if professor is not None and professor == self.professor_of(other):
+            return True
+        conflicting_courses = self.conflicting_courses.get(section.course_id, set())  # pyright: ignore
+        return other.course_id in conflicting_courses  # pyright: ignore
+
+    def repair(self, section: Section, deadline: float) -> bool:
+        """Moves one placed section out of the way so the section fits"""
+        sections = {s.pk: s for s in self.sections}
+        # sections that share a professor or conflict are the likely reasons first
+        others = sorted(
+            (sections[pk] for pk in self.placed),
+            key=lambda other: not self.is_in_the_way(section, other),
+        )
+        for other in others[:MAX_EJECTIONS]:
+            if timer.monotonic() > deadline:
+                return False
+            other_meetings = self.placed.pop(other.pk)
+            if self.place(section):
+                if self.place(other):
+                    return True
+                self.placed.pop(section.pk, None)
+            self.placed[other.pk] = other_meetings
+        return False
+
+    def run(self, time_budget: float = REPAIR_TIME_BUDGET):
+        self.placed.clear()
+        self.unplaced.clear()
+        self.skipped.clear()
+        failed: list[Section] = []
+        for section in self.order():
+            if not self.place(section):
+                failed.append(section)
+            elif section.pk not in self.placed:
+                self.skipped.append(section)
+
+        deadline = timer.monotonic() + time_budget
+        for section in failed:
+            if not self.repair(section, deadline):
+                self.unplaced.append(section)
+
+    def message(self) -> str:
+        message = f"Automatically scheduled {len(self.placed)} section(s) of {self.department}."
+        if self.unplaced:
+            message += " Could not place: " + ", ".join(
+                str(section) for section in self.unplaced
+            )
+        if len(message) > MAX_MESSAGE_LENGTH:
+            message = message[: MAX_MESSAGE_LENGTH - 3] + "..."
+        return message
+
+    @staticmethod
+    def deleted(original: Meeting, counter: int) -> EditMeeting:
+        """Deletes an original that none of the new meetings replaced"""
+        edit_meeting = EditMeeting.from_meeting(original, counter)
+        edit_meeting.is_deleted = True
+        # the originals have no time block but the request needs one (realize ignores it)
+        edit_meeting.start_time = time(0)
+        edit_meeting.day = Day.MONDAY
+        return edit_meeting
+
+    @transaction.atomic
+    def save(self, requester: Professor) -> EditRequestBundle | None:
+        """
+        The placed sections as a request bundle (None when nothing was placed).
+        The meetings without a time block are given the new times in order, the ones
+        left over are deleted and the new meetings past them are created
+        """
+        if not self.placed:
+            return None
+        bundle = EditRequestBundle()
+        bundle.save()
+        message_bundle = EditMeetingMessageBundleRequest(
+            message=self.message(), requester=requester, request=bundle
+        )
+        message_bundle.save()
+
+        for section in self.sections:
+            edit_meetings = self.placed.get(section.pk)
+            if edit_meetings is None:
+                continue
+            edit_section_request = EditSectionRequest(section=section, bundle=bundle)
+            edit_section_request.save()
+            originals = self.originals[section.pk]
+            for edit_meeting, original in zip(edit_meetings, originals):
+                edit_meeting.meeting = original
+            deleted = [
+                AutoScheduler.deleted(original, counter)
+                for counter, original in enumerate(
+                    originals[len(edit_meetings) :], start=len(edit_meetings) + 1
+                )
+            ]
+            for edit_meeting in edit_meetings + deleted:
+                edit_meeting.save_as_request(edit_section_request)
+        return bundle
@@ -0,0 +1,49 @@
+from authentication.models import Professor
+from claim.identity_map import IdentityMap
+from claim.models import Department, Term
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from request.auto_scheduler import AutoScheduler
+
+class Command(BaseCommand):
+    help = "Places every section of a department without meeting times and sends the result as a request bundle"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--term", type=int, required=True, help="The term (pk) to schedule")
+        parser.add_argument("--department", type=int, required=True, help="The department (pk) to schedule")
+        parser.add_argument("--requester", type=int, default=None, help="The professor (pk) the request is from (required unless --dry-run)")
+        parser.add_argument("--dry-run", action="store_true", help="Only report where the sections would go")
+
+    def handle(self, *_, **options) -> None:
+        term = Term.objects.filter(pk=options["term"]).first()
+        if term is None:
+            raise CommandError(f"There is no term with the pk {options['term']}")
+        department = Department.objects.filter(pk=options["department"]).first()
+        if department is None:
+            raise CommandError(f"There is no department with the pk {options['department']}")
+        requester = None
+        if not options["dry_run"]:
+            if options["requester"] is None:
+                raise CommandError("--requester is required unless it is a --dry-run")
+            requester = Professor.objects.filter(pk=options["requester"]).first()
+            if requester is None:
+                raise CommandError(f"There is no professor with the pk {options['requester']}")
+
+        with IdentityMap.scope():
+            scheduler = AutoScheduler.for_department(term, department)
+            scheduler.run()
+            for section in scheduler.sections:
+                edit_meetings = scheduler.placed.get(section.pk)
+                if edit_meetings is None:
+                    continue
+                times = ", ".join(f"{e.day} {e.start_time:%H:%M}-{e.get_end_time():%H:%M} {e.room or e.building}" for e in edit_meetings)
+                self.stdout.write(f"{section}: {times}")
+            for section in scheduler.unplaced:
+                self.stdout.write(self.style.WARNING(f"{section}: could not be placed"))
+            if requester is None:
+                self.stdout.write(self.style.SUCCESS(f'Would place {len(scheduler.placed)} of {len(scheduler.sections)} section(s)'))
+                return
+            bundle = scheduler.save(requester)
+        if bundle is None:
+            self.stdout.write(self.style.WARNING('Nothing was placed so no request was made'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'Successfully requested {len(scheduler.placed)} of {len(scheduler.sections)} section(s) in bundle {bundle.pk}'))
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.4 on 2026-10-18 21:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('claim', '0013_course_search'),
+        ('request', '0013_remove_editmeetingrequest_end_time_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConflictingCourseGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dependant_course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dependant_course_groups', to='claim.course')),
+                ('selected_course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='selected_course_groups', to='claim.course')),
+            ],
+            options={
+                'unique_together': {('selected_course', 'dependant_course')},
+            },
+        ),
+    ]
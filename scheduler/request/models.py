@@ -1,9 +1,11 @@
 # pyright does not like me importing * here bc of the type checking import i think
 from dataclasses import dataclass
 from datetime import time, timedelta
-from typing import TypedDict
+from typing import TYPE_CHECKING, TypedDict
 
+import numpy as np
 from authentication.models import Professor
+from claim.identity_map import IdentityMap
 from claim.models import (
     Building,
     Course,
@@ -17,10 +19,16 @@ from claim.models import (
     Term,
     TimeBlock,
 )
+from claim.occupancy import TermOccupancy
+from claim.patterns import PatternTable
+from claim.timetable import minutes_to_time, time_to_minutes
 from django.db import models
 from django.db.models import Q, QuerySet
 from django.http import QueryDict
 
+if TYPE_CHECKING:
+    from .recommender import Recommendation
+
 
 class TimeSlot(TypedDict):
     start: time
@@ -40,35 +48,6 @@ class Problem:
         self.text = text
 
 
-@dataclass
-class Node:
-    id: int
-    meeting: "EditMeeting"
-    overlapping_nodes: list["Node"]
-    is_seen: bool
-
-    def __eq__(self, other):
-        return isinstance(other, Node) and self.id == other.id
-
-    def __hash__(self):
-        return hash(self.id)
-
-
-def add_children(
-    nodes: list[Node],
-    running_group: list["EditMeeting"],
-    nodes_in_group: set[Node],
-):
-    if len(nodes) == 0:
-        return
-    for node in nodes:
-        node.is_seen = True
-        if node not in nodes_in_group:
-            nodes_in_group.add(node)
-            running_group.append(node.meeting)
-            add_children(node.overlapping_nodes, running_group, nodes_in_group)
-
-
 @dataclass
 class EditMeeting:
     start_time: time | None
@@ -109,41 +88,48 @@ class EditMeeting:
         each intersection group is like the different isolated groups of nodes if edges
         are made on connections. Connections are made on time overlap and for the same section
         """
-
-        # make all meetings into nodes
-        nodes: list[Node] = []
+        parents = list(range(len(meetings)))
+
+        def find(i: int) -> int:
+            while parents[i] != i:
+                parents[i] = parents[parents[i]]
+                i = parents[i]
+            return i
+
+        def union(i: int, j: int):
+            root_i, root_j = find(i), find(j)
+            # the lowest index stays the root so groups keep the order of meetings
+            parents[max(root_i, root_j)] = min(root_i, root_j)
+
+        # meetings of the same section are always connected
+        section_first_meeting: dict[int, int] = {}
+        day_intervals: dict[str, list[tuple[timedelta, timedelta, int]]] = {}
         for i, meeting in enumerate(meetings):
-            nodes.append(
-                Node(id=i, meeting=meeting, overlapping_nodes=[], is_seen=False)
-            )
-
-        # add the initial edges to the nodes if their times overlap or
-        # if their sections are the same
-        for node1 in nodes:
-            meeting1 = node1.meeting
-            for node2 in nodes:
-                if node1 == node2:
-                    continue
-                meeting2 = node2.meeting
-                if (
-                    meeting1.section.pk == meeting2.section.pk
-                    or meeting1.overlaps_with(meeting2)
-                ):
-                    # we also know meeting 2 overlaps
-                    # but that will be added later anyway
-                    node1.overlapping_nodes.append(node2)
-
-        intersection_groups: list[list[EditMeeting]] = []
-        for node in nodes:
-            if node.is_seen:
-                # the node was traversed in a different iteration so is already part of another group
+            union(section_first_meeting.setdefault(meeting.section.pk, i), i)
+            if meeting.day is None or meeting.start_time is None:
                 continue
-            intersection_group = [node.meeting]
-            node.is_seen = True
-            add_children(node.overlapping_nodes, intersection_group, set())
-            intersection_groups.append(intersection_group)
+            start = meeting.start_time_d()
+            day_intervals.setdefault(meeting.day, []).append(
+                (start, start + meeting.duration, i)
+            )
+
+        # sweep each day by start time, a meeting overlaps the current run of meetings
+        #   as long as it starts before the furthest end of that run (same as overlaps_with)
+        for intervals in day_intervals.values():
+            intervals.sort(key=lambda interval: interval[0])
+            run_first, run_end = None, None
+            for start, end, i in intervals:
+                if run_end is not None and start <= run_end:
+                    union(run_first, i)  # pyright: ignore
+                    run_end = max(run_end, end)
+                else:
+                    run_first, run_end = i, end
+
+        intersection_groups: dict[int, list[EditMeeting]] = {}
+        for i, meeting in enumerate(meetings):
+            intersection_groups.setdefault(find(i), []).append(meeting)
 
-        return intersection_groups
+        return list(intersection_groups.values())
 
     @staticmethod
     def from_meeting(meeting: Meeting, counter: int) -> "EditMeeting":
@@ -199,10 +185,22 @@ class EditMeeting:
         changed_section = data.get("outerSection")
         changed_counter = data.get("outerCounter")
 
+        # resolve every row with one query per model instead of one per row and model
+        #   related fields that the other EditMeeting methods use are loaded as well
+        #   and rows already seen this request are not queried again
+        def pks(values: list[str], *nones: str) -> set[int]:
+            return {int(v) for v in values if v not in nones}
+
+        section_objs = IdentityMap.get_many(Section, pks(sections))
+        building_objs = IdentityMap.get_many(Building, pks(buildings, "any"))
+        room_objs = IdentityMap.get_many(Room, pks(rooms, "any"))
+        meeting_objs = IdentityMap.get_many(Meeting, pks(originals, "None"))
+        professor_objs = IdentityMap.get_many(Professor, pks(professors, "None"))
+
         edit_meetings: list[EditMeeting] = []
         for i in range(len(are_deleted)):
             section_pk = sections[i]
-            section = Section.objects.get(pk=section_pk)
+            section = section_objs[int(section_pk)]
             counter = int(counters[i])
 
             start_time = start_times[i]
@@ -222,26 +220,25 @@ class EditMeeting:
             if building == "any":
                 building = None
             else:
-                building = Building.objects.get(pk=building)
+                building = building_objs[int(building)]
 
             room = rooms[i]
             if room == "any":
                 room = None
             else:
-                room = Room.objects.get(pk=room)
+                room = room_objs[int(room)]
 
             meeting = originals[i]
             if meeting == "None":
                 meeting = None
             else:
-                meeting = Meeting.objects.get(pk=meeting)
+                meeting = meeting_objs[int(meeting)]
 
             professor = professors[i]
             if professor == "None":
                 professor = None
             else:
-
-                professor = Professor.objects.get(pk=professor)
+                professor = professor_objs[int(professor)]
 
             is_deleted = are_deleted[i] == "true"
             edit_meeting = EditMeeting(
@@ -270,95 +267,6 @@ class EditMeeting:
 
         return time_intervals
 
-    def room_problems(
-        self, sections_to_exclude: list[Section] | None = None, check_allocation=True
-    ) -> list[Problem]:
-        if sections_to_exclude is None:
-            sections_to_exclude = [self.section]
-
-        overlaps_time = Q(
-            time_block__start_end_time__start__lte=self.get_end_time(),
-            time_block__start_end_time__end__gte=self.start_time,
-            time_block__day=self.day,
-        )
-
-        meetings = (
-            Meeting.objects.filter(section__term=self.section.term)
-            .exclude(section__in=sections_to_exclude)
-            .filter(overlaps_time)
-        )
-
-        problems = []
-        if self.room is None:
-            return problems
-
-        sections = list(
-            map(
-                lambda s: str(Section.objects.get(pk=s["section"])),
-                meetings.filter(room=self.room).values("section").distinct(),
-            )
-        )
-        if sections:
-            sections_text = ", ".join(sections)
-            text = f"Meeting {self.counter} overlaps {self.room} with {sections_text}."
-            problems.append(Problem(Problem.DANGER, text))
-
-        if not (self.room.is_general_purpose and check_allocation):
-            return problems
-
-        if not self.start_time:
-            return problems
-        time_blocks = TimeBlock.get_official_time_blocks(
-            self.start_time, self.get_end_time(), day=self.day
-        )
-        department_allocations = DepartmentAllocation.objects.filter(
-            department=self.section.course.subject.department,
-            allocation_group__in=time_blocks.values("allocation_groups"),
-        )
-
-        if any(
-            map(
-                lambda d_a: d_a.exceeds_allocation(self.section.term),
-                department_allocations.all(),
-            )
-        ):
-            text = f"Meeting {self.counter} exceeds department constraints for that time slot."
-            problems.append(Problem(Problem.WARNING, text))
-
-        return problems
-
-    def professor_problems(
-        self, sections_to_exclude: list[Section] | None = None
-    ) -> list[Problem]:
-        if sections_to_exclude is None:
-            sections_to_exclude = [self.section]
-
-        overlaps_time = Q(
-            time_block__start_end_time__start__lte=self.get_end_time(),
-            time_block__start_end_time__end__gte=self.start_time,
-            time_block__day=self.day,
-        )
-
-        meetings = (
-            Meeting.objects.filter(section__term=self.section.term)
-            .exclude(section__in=sections_to_exclude)
-            .filter(overlaps_time)
-        )
-
-        problems = []
-        if self.professor is None:
-            return problems
-
-        sections = set(
-            map(lambda m: str(m.section), meetings.filter(professor=self.professor))
-        )
-        if sections:
-            sections_text = ", ".join(sections)
-            text = f"Meeting {self.counter} overlaps with {sections_text} that {self.professor} also teaches."
-            problems.append(Problem(Problem.DANGER, text))
-
-        return problems
-
     @staticmethod
     def get_group_problems(edit_meetings: list["EditMeeting"]) -> list[Problem]:
         problems: list[Problem] = []
@@ -401,51 +309,140 @@ class EditMeeting:
         first_section = next(iter(sections), None)
         assert first_section is not None
 
-        problems: list[Problem] = []
-        section = edit_meetings[0].section
-
-        for edit_meeting in edit_meetings:
-            meeting_problems = edit_meeting.room_problems(
-                sections_to_exclude, check_allocation=False
-            )
-            problems.extend(meeting_problems)
-            problems.extend(edit_meeting.professor_problems(sections_to_exclude))
-
-        total_time = sum(map(lambda t: t.duration, edit_meetings), start=timedelta())
-
-        if total_time not in section.course.get_approximate_times():
-            message = f"The total time for this section does not match {section.course.credits} credit hours."
-            problems.append(Problem(Problem.WARNING, message))
-        in_meetings = Q()
-        for edit_meeting in edit_meetings:
-            in_meetings |= Q(
-                day=edit_meeting.day,
-                start_end_time__start__lte=edit_meeting.get_end_time(),
-                start_end_time__end__gte=edit_meeting.start_time,
-            )
-        official_time_blocks = (
-            TimeBlock.objects.filter(number__isnull=False)
-            .filter(in_meetings)
-            .distinct()
-        )
-        exceeds_allocation = False
-        dep_allocations = DepartmentAllocation.objects.filter(
-            allocation_group__in=official_time_blocks.values("allocation_groups")
+        section_problems = EditMeeting.get_bundle_problems(
+            {first_section: edit_meetings}, sections_to_exclude
         )
+        return section_problems[0][1]
+
+    @staticmethod
+    def get_bundle_problems(
+        section_edit_meetings: dict[Section, list["EditMeeting"]],
+        sections_to_exclude: list[Section],
+    ) -> list[tuple[Section, list[Problem]]]:
+        """
+        Checks every section of a bundle in one pass against the occupancy of their terms:
+        the other sections in the room and of the professor of every meeting and then
+        the section as a whole
+        """
+        section_pks_to_exclude = {s.pk for s in sections_to_exclude}
+
+        # meeting -> section pks that it conflicts with in its room/ with its professor
+        room_conflicts: dict[int, list[int]] = {}
+        professor_conflicts: dict[int, list[int]] = {}
+        term_edit_meetings: dict[int, list[EditMeeting]] = {}
+        for section, edit_meetings in section_edit_meetings.items():
+            term_edit_meetings.setdefault(section.term_id, []).extend(  # pyright: ignore
+                edit_meetings
+            )
+
+        for term_pk, edit_meetings in term_edit_meetings.items():
+            occupancy = TermOccupancy.get(term_pk)
+            arrays = occupancy.arrays()
+            overlaps = occupancy.overlap_matrix(
+                days=[e.day for e in edit_meetings],
+                starts=[
+                    None if e.start_time is None else time_to_minutes(e.start_time)
+                    for e in edit_meetings
+                ],
+                ends=[time_to_minutes(e.get_end_time()) for e in edit_meetings],
+                sections_to_exclude=section_pks_to_exclude,
+            )
+            rooms = np.array([-1 if e.room is None else e.room.pk for e in edit_meetings])
+            professors = np.array(
+                [-1 if e.professor is None else e.professor.pk for e in edit_meetings]
+            )
+            same_room = (arrays.room[None, :] == rooms[:, None]) & (rooms[:, None] >= 0)
+            same_professor = (arrays.professor[None, :] == professors[:, None]) & (
+                professors[:, None] >= 0
+            )
+            for i, edit_meeting in enumerate(edit_meetings):
+                room_hits = arrays.section[overlaps[i] & same_room[i]]
+                professor_hits = arrays.section[overlaps[i] & same_professor[i]]
+                # dict keeps the first seen order unlike a set
+                room_conflicts[id(edit_meeting)] = list(dict.fromkeys(room_hits.tolist()))
+                professor_conflicts[id(edit_meeting)] = list(
+                    dict.fromkeys(professor_hits.tolist())
+                )
 
-        for dep_allocation in dep_allocations:
+        conflicting_section_pks = set()
+        for section_pks in (*room_conflicts.values(), *professor_conflicts.values()):
+            conflicting_section_pks.update(section_pks)
+        section_names = {
+            s.pk: str(s)
+            for s in Section.objects.filter(pk__in=conflicting_section_pks).select_related(
+                "course__subject"
+            )
+        }
+
+        pattern_table = PatternTable.get()
+        section_problems: list[tuple[Section, list[Problem]]] = []
+        for section, edit_meetings in section_edit_meetings.items():
+            problems: list[Problem] = []
+            for edit_meeting in edit_meetings:
+                room_sections = room_conflicts[id(edit_meeting)]
+                if edit_meeting.room is not None and room_sections:
+                    sections_text = ", ".join(section_names[s] for s in room_sections)
+                    text = f"Meeting {edit_meeting.counter} overlaps {edit_meeting.room} with {sections_text}."
+                    problems.append(Problem(Problem.DANGER, text))
+                professor_sections = professor_conflicts[id(edit_meeting)]
+                if edit_meeting.professor is not None and professor_sections:
+                    sections_text = ", ".join(section_names[s] for s in professor_sections)
+                    text = f"Meeting {edit_meeting.counter} overlaps with {sections_text} that {edit_meeting.professor} also teaches."
+                    problems.append(Problem(Problem.DANGER, text))
+                room = edit_meeting.room
+                if room is not None and room.capacity and room.capacity < (section.soft_cap or 0):
+                    text = f"Meeting {edit_meeting.counter} is in {room} that seats {room.capacity} for a cap of {section.soft_cap}."
+                    problems.append(Problem(Problem.WARNING, text))
+
+            total_time = sum(map(lambda t: t.duration, edit_meetings), start=timedelta())
+
+            if total_time not in section.course.get_approximate_times():
+                message = f"The total time for this section does not match {section.course.credits} credit hours."
+                problems.append(Problem(Problem.WARNING, message))
+
+            occupancy = TermOccupancy.get(section.term_id)  # pyright: ignore
+            allocation_groups: set[int] = set()
+            for edit_meeting in edit_meetings:
+                if edit_meeting.start_time is None:
+                    continue
+                placement = pattern_table.placement_at(
+                    edit_meeting.day, edit_meeting.start_time, edit_meeting.duration
+                )
+                if placement is not None:
+                    allocation_groups.update(placement.allocation_groups)
+                    continue
+                # meetings that are not at an official time
+                start = time_to_minutes(edit_meeting.start_time)
+                end = time_to_minutes(edit_meeting.get_end_time())
+                for time_block in occupancy.official_time_blocks:
+                    if time_block.day != edit_meeting.day:
+                        continue
+                    if time_block.start_minutes() > end:
+                        continue
+                    if time_block.end_minutes() < start:
+                        continue
+                    allocation_groups.update(
+                        occupancy.time_block_groups.get(time_block.pk, set())
+                    )
             # Maybe think about making this not add one for the section
-            if dep_allocation.exceeds_allocation(first_section.term):
-                exceeds_allocation = True
-                break
-        if exceeds_allocation:
-            message = f"The department allocation is exceeded for one or more of these meetings."
-            problems.append(Problem(Problem.WARNING, message))
+            usage = DepartmentAllocation.get_usage(section.term_id)  # pyright: ignore
+            department = section.course.subject.department_id  # pyright: ignore
+            allocations = occupancy.department_allocations
+            exceeds_allocation = any(
+                usage.get((department, group), 0) + 1 > allocations[(department, group)]
+                for group in allocation_groups
+                if (department, group) in allocations
+            )
+            if exceeds_allocation:
+                message = f"The department allocation is exceeded for one or more of these meetings."
+                problems.append(Problem(Problem.WARNING, message))
 
-        # TODO insure that time slots are followed
-        # TODO? implement a warning for giving a professor too many teaching hours
+            # TODO insure that time slots are followed
+            # TODO? implement a warning for giving a professor too many teaching hours
 
-        return problems
+            section_problems.append((section, problems))
+
+        return section_problems
 
     def is_changed(self) -> bool:
         if self.is_deleted:
@@ -495,31 +492,6 @@ class EditMeeting:
 
         return meetings
 
-    @staticmethod
-    def get_timeblock_exclusion_filter(
-        conflicting_meetings: QuerySet[Meeting], duration: timedelta
-    ) -> Q:
-        duration_after_time_block = duration - TimeBlock.ONE_BLOCK
-        in_meetings = Q()
-        for meeting in conflicting_meetings.all():
-            if meeting.time_block is None:
-                continue
-            new_start_d = (
-                meeting.time_block.start_end_time.start_d() - duration_after_time_block
-            )
-            new_start_t = time(
-                hour=new_start_d.seconds // 3600,
-                minute=(new_start_d.seconds % 3600) // 60,
-            )
-            in_meetings |= Q(
-                day=meeting.time_block.day,
-                start_end_time__start__lte=meeting.time_block.start_end_time.end,
-                start_end_time__end__gte=new_start_t,
-            )
-
-        return in_meetings
-
-    # This is now a completely different thing from open_slots
     # just used to show the VISUALLY open slots
     @staticmethod
     def get_open_slots(
@@ -542,30 +514,31 @@ class EditMeeting:
             conflicting_courses=conflicting_courses,
         )
 
-        time_block_filter = EditMeeting.get_timeblock_exclusion_filter(
-            conflicting_meetings=meetings, duration=duration
-        )
-        time_blocks = TimeBlock.objects.filter(number__isnull=False).exclude(
-            time_block_filter
+        occupancy = TermOccupancy.get(term)
+        section_pks_to_exclude = {s.pk for s in sections_to_exclude}
+        conflicts = occupancy.conflicting(
+            room=None if room is None else room.pk,
+            professor=None if professor is None else professor.pk,
+            courses=[c.pk for c in conflicting_courses],
+            sections_to_exclude=section_pks_to_exclude,
         )
+        time_blocks = occupancy.open_time_blocks(conflicts, duration)
 
+        assert department is not None
         open_slots = []
-        for time_block in time_blocks.all():
-            new_end_d = time_block.start_end_time.start_d() + duration
-            new_end_t = time(
-                hour=new_end_d.seconds // 3600, minute=(new_end_d.seconds % 3600) // 60
+        for time_block in time_blocks:
+            new_end_t = minutes_to_time(
+                time_block.start_minutes() + time_to_minutes(duration)
             )
-            allocation_group = time_block.allocation_groups.first()
-            assert allocation_group is not None
+            assert time_block.allocation_group is not None
             # TODO MAYBE CLEAN UP DATABASE SO I CAN SAFELY USE .get()
-            department_allocation = allocation_group.department_allocations.filter(
-                department=department
-            ).first()
+            department_allocation = occupancy.allocation(
+                department.pk, time_block.allocation_group
+            )
             assert department_allocation is not None
-            allocation_max = department_allocation.number_of_classrooms
-            allocation = department_allocation.count_rooms(term)
+            allocation_max, allocation = department_allocation
             slot: TimeSlot = {
-                "start": time_block.start_end_time.start,
+                "start": time_block.start,
                 "end": new_end_t,
                 "day": time_block.day,
                 "allocation_max": allocation_max,
@@ -575,16 +548,16 @@ class EditMeeting:
 
             if room is None and building:
                 # have to check if there is any other room
-                available_rooms = building.get_available_rooms(
-                    start_time=slot["start"],
-                    end_time=slot["end"],
+                available_rooms = occupancy.available_rooms(
+                    building=building.pk,
+                    start=slot["start"],
+                    end=slot["end"],
                     day=slot["day"],
-                    term=term,
                     include_general=(slot["allocation_max"] > slot["allocation"])
                     or (not enforce_allocation),
-                    sections_to_exclude=sections_to_exclude,
+                    sections_to_exclude=section_pks_to_exclude,
                 )
-                if not available_rooms.exists():
+                if not available_rooms:
                     continue
                 open_slots.append(slot)
             elif not enforce_allocation:
@@ -596,231 +569,71 @@ class EditMeeting:
 
         return meetings, open_slots
 
-    # There are still a lot problems with this and probably with forever have a lot of problems but at this points
-    # it does not need to be perfect
     @staticmethod
-    def open_slots(
-        *_,
-        room: Room | None,
+    def recommend_meetings(
+        edit_meetings: list["EditMeeting"],
         professor: Professor | None,
-        building: Building | None,
         section: Section,
-        duration: timedelta,
-        edit_meetings: list["EditMeeting"],
-        meetings: QuerySet[Meeting],
-        enforce_allocation: bool = True,
-    ) -> list[TimeSlot]:
-        if building is None:
-            building = Building.recommend(section.course, term=section.term)
-        in_edit_meetings = Q()
-        # duration is always greater than or equal to TimeBlock.ONE_BLOCK
-        duration_after_time_block = duration - TimeBlock.ONE_BLOCK
-        sections_to_exclude: set[Section] = set()
-        for edit_meeting in edit_meetings:
-            sections_to_exclude.add(edit_meeting.section)
-            same_professor = (professor == edit_meeting.professor) and (
-                professor is not None
-            )
-            same_room = (room == edit_meeting.room) and (room is not None)
-
-            if not (same_professor or same_room):
-                continue
-            new_start_d = edit_meeting.start_time_d() - duration_after_time_block
-            new_start_t = time(
-                hour=new_start_d.seconds // 3600,
-                minute=(new_start_d.seconds % 3600) // 60,
-            )
-            in_edit_meetings |= Q(
-                day=edit_meeting.day,
-                start_end_time__start__lte=edit_meeting.get_end_time(),
-                start_end_time__end__gte=new_start_t,
-            )
-
-        in_meetings = Q()
-        for meeting in meetings.all():
-            if meeting.time_block is None:
-                continue
-            new_start_d = (
-                meeting.time_block.start_end_time.start_d() - duration_after_time_block
-            )
-            new_start_t = time(
-                hour=new_start_d.seconds // 3600,
-                minute=(new_start_d.seconds % 3600) // 60,
-            )
-            in_meetings |= Q(
-                day=meeting.time_block.day,
-                start_end_time__start__lte=meeting.time_block.start_end_time.end,
-                start_end_time__end__gte=new_start_t,
-            )
-        time_blocks = (
-            TimeBlock.objects.filter(number__isnull=False)
-            .exclude(number__in=TimeBlock.LONG_NIGHT_NUMBERS)
-            .exclude(in_edit_meetings)
-            .exclude(in_meetings)
+    ) -> list["EditMeeting"]:
+        """The meetings of the best pattern of request/recommender.py for the section"""
+        from .recommender import MeetingRecommender
+
+        last_counter = max(
+            [1]
+            + [
+                edit_meeting.counter
+                for edit_meeting in edit_meetings
+                if edit_meeting.section == section
+            ]
         )
-        open_slots = []
-        for time_block in time_blocks.all():
-            new_end_d = time_block.start_end_time.start_d() + duration
-            new_end_t = time(
-                hour=new_end_d.seconds // 3600, minute=(new_end_d.seconds % 3600) // 60
-            )
-            tbs = TimeBlock.objects.filter(
-                number__isnull=False, day=time_block.day, start_end_time__end=new_end_t
-            )
-            if not tbs.exists():
-                continue
-            department_allocation = DepartmentAllocation.objects.get(
-                department=section.course.subject.department,
-                allocation_group=time_block.allocation_groups.first(),
+        conflicting_courses = ConflictingCourseGroup.objects.filter(
+            selected_course=section.course
+        ).values_list("dependant_course", flat=True)
+        recommender = MeetingRecommender.for_section(
+            edit_meetings, professor, section, conflicting_courses
+        )
+        recommendations = recommender.recommend_anywhere(k=1)
+        building = None
+        if recommender.building is not None:
+            building = IdentityMap.get(Building, recommender.building)
+        if not recommendations:
+            no_recommendation = EditMeeting.no_recommendation(
+                section=section, counter=last_counter + 1, building=building
             )
+            no_recommendation.professor = professor
+            return [no_recommendation]
 
-            allocation_max = department_allocation.number_of_classrooms
-            # STILL COUNTS WITHOUT CHANGES WHEN EDITING
-            allocation = department_allocation.count_rooms(section.term)
-            slot: TimeSlot = {
-                "start": time_block.start_end_time.start,
-                "end": new_end_t,
-                "day": time_block.day,
-                "allocation_max": allocation_max,
-                "allocation": allocation,
-                "numbers": [str(time_block.number)],
-            }
-            if room is None:
-                # DOES NOT INCLUDE ONES FROM EDIT MEETINGS
-                available_rooms = building.get_available_rooms(
-                    start_time=slot["start"],
-                    end_time=slot["end"],
-                    day=slot["day"],
-                    term=section.term,
-                    include_general=(slot["allocation_max"] > slot["allocation"])
-                    or (not enforce_allocation),
-                    sections_to_exclude=sections_to_exclude,
-                )
-                if not available_rooms.exists():
-                    continue
-                open_slots.append(slot)
-                continue
-
-            if not enforce_allocation:
-                open_slots.append(slot)
-                continue
-            if slot["allocation_max"] > slot["allocation"]:
-                open_slots.append(slot)
-                continue
-            if not room.is_general_purpose:
-                open_slots.append(slot)
-                continue
-
-        return open_slots
-
-    # Recommending meeting is painfully complex and pretty slow doing it this way.
-    # To remove some of the complexity open_slots is used which probably is not the best way
-    # There should be A LOT better of way to recommend bulk subjects without requesting
-    # A lot of time improvements can be made here but like idk
+        return EditMeeting.from_recommendation(
+            recommendations[0], section, professor, building, last_counter + 1
+        )
 
     @staticmethod
-    def recommend_meetings(
-        edit_meetings: list["EditMeeting"],
-        professor: Professor | None,
+    def from_recommendation(
+        recommendation: "Recommendation",
         section: Section,
+        professor: Professor | None,
+        building: Building | None,
+        counter: int,
     ) -> list["EditMeeting"]:
-        total_duration = timedelta()
-        sections_to_exclude = set()
-        number_room_complement: list[tuple[int, Room | None]] = []
-        last_counter = 1
-        for edit_meeting in edit_meetings:
-            sections_to_exclude.add(edit_meeting.section)
-            if edit_meeting.section != section:
-                continue
-            last_counter = max(last_counter, edit_meeting.counter)
-            if edit_meeting.is_deleted:
-                continue
-            tms = TimeBlock.get_official_time_blocks(
-                edit_meeting.start_time, edit_meeting.get_end_time(), edit_meeting.day
-            )
-            for tm in tms.all():
-                in_complements_flag = False
-                for i, (num, _) in enumerate(number_room_complement):
-                    if num != tm.number:
-                        continue
-                    del number_room_complement[i]
-                    in_complements_flag = True
-                if in_complements_flag:
-                    continue
-                assert tm.number is not None
-                number_room_complement.append((tm.number, edit_meeting.room))
-            total_duration += edit_meeting.duration
-        edit_meetings = list(filter(lambda m: not m.is_deleted, edit_meetings))
-        building = Building.recommend(section.course, term=section.term)
-        no_recommendation = EditMeeting(
-            start_time=time(0),
-            duration=TimeBlock.ONE_BLOCK,
-            day="MO",
-            building=building,
-            room=None,
-            meeting=None,
-            section=section,
-            counter=last_counter + 1,
-            professor=professor,
-        )
-
-        valid_times = section.course.get_approximate_times()
-        valid_added_times = list(map(lambda t: t - total_duration, valid_times))
-        base_meetings = Meeting.objects.none()
-        if professor:
-            base_meetings |= professor.meetings.filter(
-                section__term=section.term
-            ).exclude(section__in=sections_to_exclude)
-
-        # purposefully slow to ensure that the same logic as open_slots is used
-        # I also hate this code
-        if timedelta(0) in valid_added_times:
-            return [no_recommendation]
-        elif TimeBlock.ONE_BLOCK in valid_added_times:
-            return EditMeeting.recommend_one_block(
-                edit_meetings=edit_meetings,
-                professor=professor,
-                base_meetings=base_meetings,
-                section=section,
-                number_room_complements=number_room_complement,
-                sections_to_exclude=sections_to_exclude,
-                last_counter=last_counter,
-            )
-        elif (TimeBlock.ONE_BLOCK * 2) in valid_added_times:
-            return EditMeeting.recommend_two_block(
-                edit_meetings=edit_meetings,
-                professor=professor,
-                base_meetings=base_meetings,
+        """New meetings (counted up from counter) for each placement of the recommendation"""
+        room = None
+        if recommendation.room is not None:
+            room = IdentityMap.get(Room, recommendation.room)
+            building = room.building
+        return [
+            EditMeeting(
+                start_time=minutes_to_time(placement.start),
+                duration=placement.duration,
+                day=placement.day,
+                building=building,
+                room=room,
+                meeting=None,
                 section=section,
-                number_room_complements=number_room_complement,
-                sections_to_exclude=sections_to_exclude,
-                last_counter=last_counter,
-            )
-        elif any(map(lambda t: t == TimeBlock.ONE_BLOCK * 3, valid_added_times)):
-            recommended_edit_meetings = EditMeeting.recommend_two_block(
-                edit_meetings=edit_meetings,
+                counter=counter + i,
                 professor=professor,
-                base_meetings=base_meetings,
-                section=section,
-                number_room_complements=number_room_complement,
-                sections_to_exclude=sections_to_exclude,
-                last_counter=last_counter,
             )
-            edit_meetings.extend(recommended_edit_meetings)
-            recommended_edit_meetings.extend(
-                EditMeeting.recommend_one_block(
-                    edit_meetings=edit_meetings,
-                    professor=professor,
-                    base_meetings=base_meetings,
-                    section=section,
-                    number_room_complements=number_room_complement,
-                    sections_to_exclude=sections_to_exclude,
-                    last_counter=last_counter + len(recommended_edit_meetings),
-                )
-            )
-            return recommended_edit_meetings
-
-        return [no_recommendation]
+            for i, placement in enumerate(recommendation.placements)
+        ]
 
     @staticmethod
     def no_recommendation(
@@ -838,227 +651,6 @@ class EditMeeting:
             professor=section.primary_professor,
         )
 
-    @staticmethod
-    def recommend_one_block(
-        *_,
-        edit_meetings: list["EditMeeting"],
-        professor: Professor | None,
-        base_meetings: QuerySet[Meeting],
-        section: Section,
-        number_room_complements: list[tuple[int, Room | None]],
-        sections_to_exclude: set[Section],
-        last_counter: int,
-    ) -> list["EditMeeting"]:
-
-        for num, room in number_room_complements:
-            if room:
-                meetings = base_meetings | Meeting.objects.filter(
-                    room=room, section__term=section.term
-                ).exclude(section__in=sections_to_exclude)
-            else:
-                meetings = base_meetings
-            building = (
-                Building.recommend(section.course, term=section.term)
-                if room is None
-                else room.building
-            )
-            open_slots: list[TimeSlot] = EditMeeting.open_slots(
-                room=room,
-                professor=professor,
-                building=building,
-                duration=TimeBlock.ONE_BLOCK,
-                section=section,
-                edit_meetings=edit_meetings,
-                meetings=meetings,
-                enforce_allocation=False,
-            )
-            for open_slot in open_slots:
-                if num not in open_slot["numbers"]:
-                    continue
-                return [
-                    EditMeeting(
-                        start_time=open_slot["start"],
-                        duration=TimeBlock.ONE_BLOCK,
-                        day=open_slot["day"],
-                        building=building,
-                        room=room,
-                        meeting=None,
-                        section=section,
-                        counter=last_counter + 1,
-                        professor=professor,
-                    )
-                ]
-        building = Building.recommend(section.course, term=section.term)
-        open_slots: list[TimeSlot] = EditMeeting.open_slots(
-            room=None,
-            professor=professor,
-            building=building,
-            duration=TimeBlock.ONE_BLOCK,
-            edit_meetings=edit_meetings,
-            section=section,
-            meetings=base_meetings,
-            enforce_allocation=False,
-        )
-        open_slots.sort(key=lambda s: s["allocation"] / s["allocation_max"])
-        best_open_slot = open_slots[0]
-        return [
-            EditMeeting(
-                start_time=best_open_slot["start"],
-                duration=TimeBlock.ONE_BLOCK,
-                day=best_open_slot["day"],
-                building=building,
-                room=None,
-                meeting=None,
-                section=section,
-                counter=last_counter + 1,
-                professor=professor,
-            )
-        ]
-
-    @staticmethod
-    def recommend_two_block(
-        *_,
-        edit_meetings: list["EditMeeting"],
-        professor: Professor | None,
-        base_meetings: QuerySet[Meeting],
-        section: Section,
-        number_room_complements: list[tuple[int, Room | None]],
-        sections_to_exclude: set[Section],
-        last_counter: int,
-    ) -> list["EditMeeting"]:
-        recommended = []
-        # There should at most only be one complement
-        if number_room_complements:
-            num, room = number_room_complements[0]
-            if room:
-                meetings = base_meetings | Meeting.objects.filter(
-                    room=room, section__term=section.term
-                ).exclude(section__in=sections_to_exclude)
-            else:
-                meetings = base_meetings
-
-            building = (
-                Building.recommend(section.course, term=section.term)
-                if room is None
-                else room.building
-            )
-            open_slots: list[TimeSlot] = EditMeeting.open_slots(
-                room=room,
-                professor=professor,
-                building=building,
-                duration=TimeBlock.ONE_BLOCK,
-                edit_meetings=edit_meetings,
-                meetings=meetings,
-                enforce_allocation=False,
-                section=section,
-            )
-            for open_slot in open_slots:
-                if num not in open_slot["numbers"]:
-                    continue
-                building = building if room is None else room.building
-                last_counter += 1
-                recommended.append(
-                    EditMeeting(
-                        start_time=open_slot["start"],
-                        duration=TimeBlock.ONE_BLOCK,
-                        day=open_slot["day"],
-                        building=building,
-                        room=room,
-                        meeting=None,
-                        section=section,
-                        counter=last_counter,
-                        professor=professor,
-                    )
-                )
-                recommended.extend(
-                    EditMeeting.recommend_one_block(
-                        edit_meetings=edit_meetings,
-                        professor=professor,
-                        base_meetings=base_meetings,
-                        section=section,
-                        number_room_complements=[],
-                        sections_to_exclude=sections_to_exclude,
-                        last_counter=last_counter,
-                    )
-                )
-                return recommended
-        building = Building.recommend(section.course, term=section.term)
-        open_slots = EditMeeting.open_slots(
-            room=None,
-            professor=professor,
-            building=building,
-            duration=TimeBlock.ONE_BLOCK,
-            edit_meetings=edit_meetings,
-            meetings=base_meetings,
-            enforce_allocation=False,
-            section=section,
-        )
-        # yeah... i know
-        seen_numbers: list[str] = []
-        for i, slot1 in enumerate(open_slots):
-            if any(number in seen_numbers for number in slot1["numbers"]):
-                continue
-            available_rooms_slot1 = building.get_available_rooms(
-                start_time=slot1["start"],
-                end_time=slot1["end"],
-                day=slot1["day"],
-                term=section.term,
-                include_general=False,
-                sections_to_exclude=sections_to_exclude,
-            )
-            slot2 = None
-            if i + 1 == len(open_slots):
-                continue
-            for s in open_slots[i + 1 :]:
-                if s["numbers"] == slot1["numbers"]:
-                    slot2 = s
-            if slot2 is None:
-                continue
-            available_rooms_slot2 = building.get_available_rooms(
-                start_time=slot2["start"],
-                end_time=slot2["end"],
-                day=slot2["day"],
-                term=section.term,
-                include_general=False,
-                sections_to_exclude=sections_to_exclude,
-            )
-            intersecting_rooms = available_rooms_slot1 & available_rooms_slot2
-            if not intersecting_rooms.exists():
-                continue
-
-            room = intersecting_rooms.first()
-            assert room is not None
-
-            m1 = EditMeeting(
-                start_time=slot1["start"],
-                duration=TimeBlock.ONE_BLOCK,
-                day=slot1["day"],
-                building=room.building,
-                room=room,
-                meeting=None,
-                section=section,
-                counter=last_counter + 1,
-                professor=professor,
-            )
-            m2 = EditMeeting(
-                start_time=slot2["start"],
-                duration=TimeBlock.ONE_BLOCK,
-                day=slot2["day"],
-                building=room.building,
-                room=room,
-                meeting=None,
-                section=section,
-                counter=last_counter + 2,
-                professor=professor,
-            )
-            return [m1, m2]
-
-        return [
-            EditMeeting.no_recommendation(
-                section=section, counter=last_counter + 1, building=building
-            )
-        ]
-
     def save_as_request(
         self, edit_section: "EditSectionRequest"
     ) -> "EditMeetingRequest":
@@ -1082,19 +674,14 @@ class EditMeeting:
     def get_end_time(self) -> time:
         if self.start_time is None:
             return time()
-        total_seconds = self.duration.total_seconds()
-        total_seconds += self.start_time.hour * (60 * 60)
-        total_seconds += self.start_time.second * 60
-        hour = int(total_seconds // (60 * 60))
-        minute = int((total_seconds % (60 * 60)) // 60)
-        return time(hour=hour, minute=minute)
+        return minutes_to_time(
+            time_to_minutes(self.start_time) + time_to_minutes(self.duration)
+        )
 
     def start_time_d(self) -> timedelta:
         if self.start_time is None:
             return timedelta()
-        total_seconds = self.start_time.hour * (60 * 60)
-        total_seconds += self.start_time.second * 60
-        return timedelta(seconds=total_seconds)
+        return timedelta(minutes=time_to_minutes(self.start_time))
 
 
 class EditRequestBundle(models.Model):
@@ -1237,14 +824,16 @@ class EditMeetingRequest(models.Model):
     def get_end_time(self) -> time:
         if self.start_time is None:
             return time()
-        total_seconds = self.duration.total_seconds()
-        total_seconds += self.start_time.hour * (60 * 60)
-        total_seconds += self.start_time.second * 60
-        hour = int(total_seconds // (60 * 60))
-        minute = int((total_seconds % (60 * 60)) // 60)
-        return time(hour=hour, minute=minute)
+        return minutes_to_time(
+            time_to_minutes(self.start_time) + time_to_minutes(self.duration)
+        )
 
     def realize(self) -> None:
+        if self.original and self.is_deleted:
+            # the time of a deleted meeting does not matter
+            self.original.delete()
+            return
+
         start_end_time, _ = StartEndTime.objects.get_or_create(
             start=self.start_time,
             end=self.get_end_time(),
@@ -1254,13 +843,10 @@ class EditMeetingRequest(models.Model):
         )
 
         if self.original:
-            if self.is_deleted:
-                self.original.delete()
-            else:
-                self.original.room = self.room
-                self.original.professor = self.professor
-                self.original.time_block = time_block
-                self.original.save()
+            self.original.room = self.room
+            self.original.professor = self.professor
+            self.original.time_block = time_block
+            self.original.save()
             return
 
         meeting = Meeting(
@@ -1,3 +1,4 @@
+from claim.identity_map import IdentityMap
 from claim.models import *
 from django.contrib.auth.decorators import login_required
 from django.db.models import Max
@@ -10,7 +11,7 @@ from .partial_views import get_update_meeting_context
 
 @login_required
 def edit_section(request: HttpRequest, section_pk: int) -> HttpResponse:
-    section: Section = Section.objects.get(pk=section_pk)
+    section: Section = IdentityMap.get(Section, section_pk)
     edit_section = (
         EditSectionRequest.objects.filter(section=section)
         .filter(bundle__request_message__isnull=False)
@@ -1,10 +1,12 @@
 from datetime import time
 from typing import TypedDict
 
+from claim.identity_map import IdentityMap
 from claim.models import *
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import IntegrityError
+from django.db.models import Prefetch
 from django.db.transaction import atomic
 from django.http import HttpRequest, HttpResponse, HttpResponseForbidden, QueryDict
 from django.shortcuts import render
@@ -101,13 +103,12 @@ def generate_update_meeting_context(
     sections: set[Section] = set()
     section_pks = data.getlist("sectionGrouper")
     assert section_pks is not None
-    for pk in section_pks:
-        sections.add(Section.objects.get(pk=pk))
+    sections.update(IdentityMap.get_many(Section, section_pks).values())
     if added_section is not None:
         sections.add(added_section)
     first_edit_meeting = next(iter(edit_meetings), None)
     first_section_pk = data.get("sectionGrouper")
-    first_section = Section.objects.get(pk=first_section_pk)
+    first_section = IdentityMap.get(Section, first_section_pk)
     term = first_section.term
     if data.get("thisDuration"):
         start_end_time = str(data.get("thisDuration"))
@@ -126,7 +127,7 @@ def generate_update_meeting_context(
     if building == "any":
         building = Building.recommend(first_section.course, term=term)
     elif building is not None:
-        building = Building.objects.get(pk=building)
+        building = IdentityMap.get(Building, building)
     elif edit_meeting is not None:
         building = edit_meeting.building
     elif first_edit_meeting is not None:
@@ -138,7 +139,7 @@ def generate_update_meeting_context(
     if room == "any":
         room = None
     elif room is not None:
-        room = Room.objects.get(pk=room)
+        room = IdentityMap.get(Room, room)
     elif edit_meeting is not None:
         room = edit_meeting.room
     elif first_edit_meeting is not None:
@@ -148,7 +149,7 @@ def generate_update_meeting_context(
     if professor == "None" or professor == "":
         professor = None
     if professor is not None:
-        professor = Professor.objects.get(pk=professor)
+        professor = IdentityMap.get(Professor, professor)
     elif edit_meeting is not None:
         professor = edit_meeting.professor
     elif first_edit_meeting is not None:
@@ -309,7 +310,7 @@ def add_rows(request: HttpRequest) -> HttpResponse:
     data = QueryDict(request.body)  # pyright: ignore
     edit_meetings, _ = EditMeeting.create_all(data)
     section_pk = data.get("selectedSection")
-    section = Section.objects.get(pk=section_pk)
+    section = IdentityMap.get(Section, section_pk)
     recommended = EditMeeting.recommend_meetings(
         edit_meetings, section.primary_professor, section
     )
@@ -339,7 +340,7 @@ def add_section(request: HttpRequest) -> HttpResponse:
     sections = data.getlist("sectionGrouper")
     if section_pk in sections:
         return HttpResponse(request)
-    section = Section.objects.get(pk=section_pk)
+    section = IdentityMap.get(Section, section_pk)
     added_sections = EditMeeting.from_section(section)
     section_context = {
         "section_meetings": added_sections,
@@ -373,7 +374,6 @@ def soft_submit(request: HttpRequest) -> HttpResponse:
 
     edit_meetings = list(filter(lambda e: not e.is_deleted, edit_meetings))
     group_problems = EditMeeting.get_group_problems(edit_meetings)
-    section_problems: list[tuple[Section, list[Problem]]] = []
     section_edit_meetings: dict[Section, list[EditMeeting]] = {}
     for meeting in edit_meetings:
         if section_edit_meetings.get(meeting.section) is not None:
@@ -382,15 +382,9 @@ def soft_submit(request: HttpRequest) -> HttpResponse:
         section_edit_meetings[meeting.section] = [meeting]
 
     sections_to_exclude = list(section_edit_meetings.keys())
-    for section, meetings in section_edit_meetings.items():
-        section_problems.append(
-            (
-                section,
-                EditMeeting.get_section_problems(
-                    meetings, sections_to_exclude=sections_to_exclude
-                ),
-            )
-        )
+    section_problems = EditMeeting.get_bundle_problems(
+        section_edit_meetings, sections_to_exclude=sections_to_exclude
+    )
 
     context = {
         "is_changed": is_changed,
@@ -445,13 +439,26 @@ def hard_submit(request: HttpRequest) -> HttpResponse:
 def soft_approve(request: HttpRequest) -> HttpResponse:
     data = request.POST
     request_bundle_pk = data.get("messageBundle")
-    request_bundle = EditMeetingMessageBundleRequest.objects.get(pk=request_bundle_pk)
+    request_bundle = EditMeetingMessageBundleRequest.objects.select_related("request").get(
+        pk=request_bundle_pk
+    )
     professor: Professor = request.user.professor  # pyright: ignore
     # TODO ensure that professor is department head
 
+    # everything the problems read of the requests with a query per relation
+    edit_sections = request_bundle.request.edit_sections.select_related(
+        "section__course__subject"
+    ).prefetch_related(
+        Prefetch(
+            "edit_meetings",
+            queryset=EditMeetingRequest.objects.select_related(
+                "building", "room__building", "professor", "original"
+            ),
+        )
+    )
     edit_meetings: list[EditMeeting] = []
     section_edit_meetings: dict[Section, list[EditMeeting]] = {}
-    for edit_section in request_bundle.request.edit_sections.all():
+    for edit_section in edit_sections:
         section_edit_meetings[edit_section.section] = []
         for i, edit_meeting_request in enumerate(
             edit_section.edit_meetings.all(), start=1
@@ -463,12 +470,9 @@ def soft_approve(request: HttpRequest) -> HttpResponse:
     group_problems = EditMeeting.get_group_problems(edit_meetings)
     sections_to_exclude = section_edit_meetings.keys()
 
-    section_problems: list[tuple[Section, list[Problem]]] = []
-    for section, meetings in section_edit_meetings.items():
-        problems = EditMeeting.get_section_problems(
-            meetings, sections_to_exclude=list(sections_to_exclude)
-        )
-        section_problems.append((section, problems))
+    section_problems = EditMeeting.get_bundle_problems(
+        section_edit_meetings, sections_to_exclude=list(sections_to_exclude)
+    )
 
     context = {
         "is_approve": True,
@@ -569,7 +573,7 @@ def read_bundle(request: HttpRequest) -> HttpResponse:
 @login_required
 @require_http_methods(["GET"])
 def add_conflicting_course_pill(request: HttpRequest, course: int) -> HttpResponse:
-    course_obj = Course.objects.get(pk=course)
+    course_obj = IdentityMap.get(Course, course)
     context = {
         "course": course_obj,
     }
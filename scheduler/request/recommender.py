@@ -0,0 +1,432 @@
+import time as timer
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import TYPE_CHECKING, Iterable
+
+import numpy as np
+from authentication.models import Professor
+from claim.models import Building, Course, DepartmentAllocation, Section, TimeBlock
+from claim.occupancy import TermOccupancy, Window
+from claim.patterns import PatternTable, Placement, duration_combinations
+from claim.timetable import time_to_minutes
+from django.conf import settings
+
+if TYPE_CHECKING:
+    from .models import EditMeeting
+
+# Recommending meetings used to chain open_slots calls which each went back to the
+#   database for every candidate. Instead the legal meeting patterns of the section's
+#   credit hours (claim/patterns.py) are checked in memory against the term's occupancy:
+#   the professor, the rooms of the building, the conflicting courses and the meetings
+#   that are being edited are hard constraints and the patterns are ranked by how well
+#   they complement the meetings the section already has, if one room fits every meeting,
+#   if that room holds the section and how full the department allocations are.
+# Every pattern of a combination of durations is scored at once over numpy matrices of
+#   placement positions so even the thousands of patterns of a four credit course with
+#   complements take milliseconds. The time budget bounds add_rows either way
+
+# (day, start, end) in minutes
+Interval = tuple[str, int, int]
+
+# seconds that recommend scores patterns for when RECOMMENDATION_TIME_BUDGET is not set
+DEFAULT_TIME_BUDGET = 0.5
+# patterns scored at once
+CHUNK_SIZE = 4096
+
+# columns of the score matrix
+UNMET, NIGHT, NO_ROOM, SMALL, COMBINATION, PRESSURE, POSITION, ROOM = range(8)
+COLUMNS = (UNMET, NIGHT, NO_ROOM, SMALL, COMBINATION, PRESSURE, POSITION, ROOM)
+# what a pattern is ranked by (lower first): complements that are not met, if it is at
+#   night, if one room does not fit every meeting, if that room is smaller than the
+#   section, the order of the durations, how full the department allocations are and
+#   then the order of the patterns
+SCORE_COLUMNS = (UNMET, NIGHT, NO_ROOM, SMALL, COMBINATION, PRESSURE, POSITION)
+
+
+@dataclass(frozen=True)
+class Recommendation:
+    placements: tuple[Placement, ...]
+    room: int | None
+    score: tuple
+
+
+def _window(interval: Interval) -> Window:
+    day, start, end = interval
+    return day, timedelta(minutes=start), timedelta(minutes=end)
+
+
+def _overlaps_any(placement: Placement, intervals: Iterable[Interval]) -> bool:
+    return any(placement.overlaps(*interval) for interval in intervals)
+
+
+@dataclass
+class MeetingRecommender:
+    section: Section
+    occupancy: TermOccupancy
+    pattern_table: PatternTable
+    # None is every building
+    building: int | None
+    department: int | None
+    # durations the new meetings can add up to in order of preference
+    remaining_durations: list[timedelta]
+    # busy for every meeting of the pattern (professor, conflicting courses, the section)
+    busy: list[Interval] = field(default_factory=list)
+    # rooms that are taken by the meetings that are being edited
+    room_busy: dict[int, list[Interval]] = field(default_factory=dict)
+    # (number, room) of official time blocks the section meets in only on one day
+    complements: list[tuple[int, int | None]] = field(default_factory=list)
+    sections_to_exclude: set[int] = field(default_factory=set)
+    # rooms smaller than this are only used when no room that holds the section is free
+    #   at any of the times (rooms without a capacity always hold it)
+    min_capacity: int = 0
+    # (department, allocation group) -> general purpose rooms used in the term
+    allocation_usage: dict[tuple[int, int], int] = field(default_factory=dict)
+    # (department, allocation group) -> general purpose rooms of the edited meetings that
+    #   the usage does not count yet
+    allocation_rooms: dict[tuple[int, int], set[int]] = field(default_factory=dict)
+
+    @staticmethod
+    def for_section(
+        edit_meetings: list["EditMeeting"],
+        professor: Professor | None,
+        section: Section,
+        conflicting_courses: Iterable[int] = (),
+    ) -> "MeetingRecommender":
+        pattern_table = PatternTable.get()
+        timetable = pattern_table.timetable
+        occupancy = TermOccupancy.get(section.term_id)  # pyright: ignore
+        sections_to_exclude = {edit_meeting.section.pk for edit_meeting in edit_meetings}
+        conflicting_courses = set(conflicting_courses)
+
+        busy: list[Interval] = []
+        room_busy: dict[int, list[Interval]] = {}
+        allocation_rooms: dict[tuple[int, int], set[int]] = {}
+        course: Course = section.course
+        department = course.subject.department_id  # pyright: ignore
+        total_duration = timedelta()
+        # number -> (times the section meets in it, room)
+        section_numbers: dict[int, tuple[int, int | None]] = {}
+        for edit_meeting in edit_meetings:
+            if edit_meeting.is_deleted:
+                continue
+            is_section = edit_meeting.section.pk == section.pk
+            if is_section:
+                total_duration += edit_meeting.duration
+            if edit_meeting.start_time is None or edit_meeting.day is None:
+                continue
+            start = time_to_minutes(edit_meeting.start_time)
+            interval = (
+                edit_meeting.day,
+                start,
+                start + time_to_minutes(edit_meeting.duration),
+            )
+            is_same_professor = (
+                professor is not None and edit_meeting.professor == professor
+            )
+            is_conflicting = edit_meeting.section.course_id in conflicting_courses  # pyright: ignore
+            if is_section or is_same_professor or is_conflicting:
+                busy.append(interval)
+            if edit_meeting.room is not None:
+                room_busy.setdefault(edit_meeting.room.pk, []).append(interval)
+                room_info = occupancy.rooms.get(edit_meeting.room.pk)
+                if (
+                    room_info is not None
+                    and room_info.is_general_purpose
+                    and edit_meeting.section.course.subject.department_id == department  # pyright: ignore
+                ):
+                    for time_block in timetable.official(*_window(interval)[1:], day=interval[0]):
+                        if time_block.allocation_group is None:
+                            continue
+                        if occupancy.uses_room(
+                            department, time_block.allocation_group, edit_meeting.room.pk
+                        ):
+                            continue
+                        key = (department, time_block.allocation_group)
+                        allocation_rooms.setdefault(key, set()).add(edit_meeting.room.pk)
+            if not is_section:
+                continue
+            for time_block in timetable.official(*_window(interval)[1:], day=interval[0]):
+                count, _ = section_numbers.get(time_block.number, (0, None))
+                room = None if edit_meeting.room is None else edit_meeting.room.pk
+                section_numbers[time_block.number] = (count + 1, room)
+
+        intervals = []
+        if professor is not None:
+            intervals.append(occupancy.by_professor.get(professor.pk, {}))
+        for conflicting_course in conflicting_courses:
+            intervals.append(occupancy.by_course.get(conflicting_course, {}))
+        for days in intervals:
+            for occupations in days.values():
+                for occupation in occupations:
+                    if occupation.section in sections_to_exclude:
+                        continue
+                    busy.append((occupation.day, occupation.start, occupation.end))
+
+        # only numbers that are on more than one day can be complemented
+        complements = [
+            (number, room)
+            for number, (count, room) in section_numbers.items()
+            if count % 2 == 1 and len(pattern_table.number_days.get(number, ())) > 1
+        ]
+
+        valid_durations = course.get_approximate_times()
+        remaining_durations = []
+        if total_duration not in valid_durations:
+            remaining_durations = sorted(
+                duration - total_duration
+                for duration in valid_durations
+                if duration > total_duration
+            )
+        building = Building.recommend(course, term=section.term)
+        return MeetingRecommender(
+            section=section,
+            occupancy=occupancy,
+            pattern_table=pattern_table,
+            building=None if building is None else building.pk,
+            department=department,
+            remaining_durations=remaining_durations,
+            busy=busy,
+            room_busy=room_busy,
+            complements=complements,
+            sections_to_exclude=sections_to_exclude,
+            min_capacity=section.soft_cap or 0,
+            allocation_usage=DepartmentAllocation.get_usage(section.term_id),  # pyright: ignore
+            allocation_rooms=allocation_rooms,
+        )
+
+    def is_small(self, room_pk: int) -> bool:
+        capacity = self.occupancy.rooms[room_pk].capacity
+        return bool(capacity) and capacity < self.min_capacity  # pyright: ignore
+
+    def room_pks(self) -> list[int]:
+        # rooms that hold the section and then rooms that are not general purpose are
+        #   tried first
+        return sorted(
+            self.occupancy.building_room_pks(self.building, include_general=True),
+            key=lambda room_pk: (
+                self.is_small(room_pk),
+                self.occupancy.rooms[room_pk].is_general_purpose,
+            ),
+        )
+
+    def allocation(self, allocation_group: int) -> tuple[int, int] | None:
+        """(number of classrooms, general purpose rooms used) of the department allocation"""
+        if self.department is None:
+            return None
+        key = (self.department, allocation_group)
+        allocation_max = self.occupancy.department_allocations.get(key)
+        if allocation_max is None:
+            return None
+        used = self.allocation_usage.get(key, 0)
+        return allocation_max, used + len(self.allocation_rooms.get(key, ()))
+
+    def allocation_pressure(self, placement: Placement) -> float:
+        """How full the department allocations of the placement are (0 is empty)"""
+        if self.department is None:
+            return 0
+        ratios = []
+        for group in placement.allocation_groups:
+            allocation = self.allocation(group)
+            if allocation is None:
+                continue
+            allocation_max, used = allocation
+            ratios.append(1 if allocation_max <= 0 else used / allocation_max)
+        return sum(ratios) / len(ratios) if ratios else 0
+
+    def can_use_general(self, placement: Placement, room_pk: int) -> bool:
+        """If a general purpose room fits in the department allocations of the placement"""
+        if self.department is None:
+            return True
+        for group in placement.allocation_groups:
+            allocation = self.allocation(group)
+            if allocation is None:
+                continue
+            allocation_max, used = allocation
+            if used < allocation_max:
+                continue
+            # a room that is already counted does not add to the usage
+            if room_pk in self.allocation_rooms.get((self.department, group), ()):
+                continue
+            if not self.occupancy.uses_room(self.department, group, room_pk):
+                return False
+        return True
+
+    def usable_rooms(self, placements: list[Placement], room_pks: list[int]) -> np.ndarray:
+        """(placements x rooms) of which rooms could hold each placement"""
+        usable = self.occupancy.free_rooms(
+            room_pks,
+            [_window((p.day, p.start, p.end)) for p in placements],
+            self.sections_to_exclude,
+        )
+        for j, room_pk in enumerate(room_pks):
+            is_general = self.occupancy.rooms[room_pk].is_general_purpose
+            busy = self.room_busy.get(room_pk, [])
+            if not is_general and not busy:
+                continue
+            for i, placement in enumerate(placements):
+                if not usable[i, j]:
+                    continue
+                if busy and _overlaps_any(placement, busy):
+                    usable[i, j] = False
+                elif is_general and not self.can_use_general(placement, room_pk):
+                    usable[i, j] = False
+        return usable
+
+    def recommend(
+        self, k: int = 5, time_budget: float | None = None
+    ) -> list[Recommendation]:
+        """
+        The k best patterns for the meetings the section still needs. The patterns are
+        scored as whole matrices a chunk at a time and when the time budget (seconds,
+        settings.RECOMMENDATION_TIME_BUDGET by default) runs out the best ones scored so
+        far are returned
+        """
+        if time_budget is None:
+            time_budget = getattr(
+                settings, "RECOMMENDATION_TIME_BUDGET", DEFAULT_TIME_BUDGET
+            )
+        deadline = timer.monotonic() + time_budget
+
+        combinations: list[tuple[timedelta, ...]] = []
+        for duration in self.remaining_durations:
+            for combination in duration_combinations(duration):
+                if combination not in combinations:
+                    combinations.append(combination)
+        if not combinations:
+            return []
+
+        table = self.pattern_table
+        singles = len(self.complements)
+        matrices = [table.pattern_matrix(combination, singles) for combination in combinations]
+        placements = list(table.indexed_placements)
+        candidates = [
+            position
+            for position in sorted(
+                {position for matrix in matrices for position in np.unique(matrix)}
+            )
+            if not _overlaps_any(placements[position], self.busy)
+        ]
+        room_pks = self.room_pks()
+        usable = np.zeros((len(placements), len(room_pks)), dtype=bool)
+        usable[candidates] = self.usable_rooms(
+            [placements[position] for position in candidates], room_pks
+        )
+        is_small = np.array([self.is_small(room_pk) for room_pk in room_pks], dtype=bool)
+        if usable[:, ~is_small].any():
+            usable[:, is_small] = False
+        allowed = usable.any(axis=1)
+        pressure = np.zeros(len(placements))
+        for position in candidates:
+            pressure[position] = self.allocation_pressure(placements[position])
+        is_night = np.array(
+            [p.number in TimeBlock.LONG_NIGHT_NUMBERS for p in placements], dtype=bool
+        )
+        complements = [
+            (
+                np.array(
+                    [
+                        number in p.numbers and p.duration == TimeBlock.ONE_BLOCK
+                        for p in placements
+                    ],
+                    dtype=bool,
+                ),
+                room_pks.index(room) if room in room_pks else None,
+            )
+            for number, room in self.complements
+        ]
+
+        # one row for each pattern that fits (see the columns above)
+        scored: list[np.ndarray] = []
+        for combination_index, matrix in enumerate(matrices):
+            for chunk_start in range(0, len(matrix), CHUNK_SIZE):
+                if scored and timer.monotonic() > deadline:
+                    break
+                rows = matrix[chunk_start : chunk_start + CHUNK_SIZE]
+                fits = np.flatnonzero(allowed[rows].all(axis=1))
+                if len(fits) == 0:
+                    continue
+                scores = self.score(
+                    rows[fits], usable, is_small, pressure, is_night, complements
+                )
+                scores[:, COMBINATION] = combination_index
+                scores[:, POSITION] = chunk_start + fits
+                scored.append(scores)
+        if not scored:
+            return []
+
+        scores = np.concatenate(scored)
+        best = np.lexsort(
+            [scores[:, column] for column in reversed(SCORE_COLUMNS)]
+        )[:k]
+        recommendations = []
+        for row in scores[best]:
+            combination = combinations[int(row[COMBINATION])]
+            pattern = table.patterns_of(combination, singles)[int(row[POSITION])]
+            room = int(row[ROOM])
+            recommendations.append(
+                Recommendation(
+                    placements=pattern.placements,
+                    room=None if room < 0 else room_pks[room],
+                    score=tuple(row[column].item() for column in SCORE_COLUMNS),
+                )
+            )
+        return recommendations
+
+    def recommend_anywhere(self, k: int = 5) -> list[Recommendation]:
+        """
+        recommend, but when the best pattern in the building has no room that holds the
+        section every building is tried as well (building is then None if that is better
+        or if only it has a room that holds the section)
+        """
+
+        def holds(recommendation: Recommendation) -> bool:
+            return not any(
+                recommendation.score[SCORE_COLUMNS.index(column)]
+                for column in (NO_ROOM, SMALL)
+            )
+
+        recommendations = self.recommend(k)
+        if self.building is None:
+            return recommendations
+        if recommendations and holds(recommendations[0]):
+            return recommendations
+        building, self.building = self.building, None
+        anywhere = self.recommend(k)
+        if anywhere and (
+            not recommendations
+            or holds(anywhere[0])
+            or anywhere[0].score < recommendations[0].score
+        ):
+            return anywhere
+        self.building = building
+        return recommendations
+
+    @staticmethod
+    def score(
+        rows: np.ndarray,
+        usable: np.ndarray,
+        is_small: np.ndarray,
+        pressure: np.ndarray,
+        is_night: np.ndarray,
+        complements: list[tuple[np.ndarray, int | None]],
+    ) -> np.ndarray:
+        """Score columns of each (patterns x meetings) row of placement positions"""
+        scores = np.zeros((len(rows), len(COLUMNS)))
+        # (patterns x rooms) of the rooms that fit every meeting of the pattern
+        common = usable[rows].all(axis=1)
+        has_room = common.any(axis=1)
+        room = np.where(has_room, common.argmax(axis=1), -1)
+        for covers, complement_room in complements:
+            is_met = covers[rows].any(axis=1)
+            scores[:, UNMET] += ~is_met
+            if complement_room is None:
+                continue
+            # the room of the meeting that is complemented is kept if it is free
+            keeps_room = is_met & common[:, complement_room]
+            room = np.where(keeps_room, complement_room, room)
+        scores[:, NIGHT] = is_night[rows].any(axis=1)
+        scores[:, NO_ROOM] = room < 0
+        scores[:, SMALL] = (room >= 0) & is_small[np.maximum(room, 0)]
+        scores[:, PRESSURE] = np.round(pressure[rows].mean(axis=1), 3)
+        scores[:, ROOM] = room
+        return scores
@@ -0,0 +1,754 @@
+from datetime import time, timedelta
+from unittest import mock
+
+from authentication.models import Professor
+from banner.management.create_static import create_all
+from claim.models import (
+    AllocationGroup,
+    Building,
+    Course,
+    Department,
+    DepartmentAllocation,
+    Meeting,
+    Room,
+    Section,
+    StartEndTime,
+    Subject,
+    Term,
+    TimeBlock,
+)
+from claim.patterns import Pattern, PatternTable, Placement
+from claim.identity_map import IdentityMap
+from claim.occupancy import TermOccupancy
+from claim.timetable import OfficialTimeBlock, Timetable, minutes_to_time, time_to_minutes
+from django.contrib.auth.models import User
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from .auto_scheduler import AutoScheduler
+from .models import (
+    ConflictingCourseGroup,
+    EditMeeting,
+    EditMeetingMessageBundleRequest,
+    EditMeetingRequest,
+    EditRequestBundle,
+    EditSectionRequest,
+    Problem,
+    minutes_to_time,
+)
+from .recommender import SCORE_COLUMNS, SMALL, UNMET, MeetingRecommender, Recommendation
+
+
+class EditMeetingTimesTest(SimpleTestCase):
+    def edit_meeting(self, start_time: time | None) -> EditMeeting:
+        return EditMeeting(
+            start_time=start_time,
+            duration=timedelta(hours=1, minutes=15),
+            day="MO",
+            building=None,
+            room=None,
+            meeting=None,
+            section=None,  # pyright: ignore
+            counter=1,
+        )
+
+    def test_end_time_keeps_the_start_minutes(self):
+        self.assertEqual(self.edit_meeting(time(9, 30)).get_end_time(), time(10, 45))
+        self.assertEqual(self.edit_meeting(time(18, 30)).get_end_time(), time(19, 45))
+        request = EditMeetingRequest(start_time=time(9, 30), duration=timedelta(hours=1))
+        self.assertEqual(request.get_end_time(), time(10, 30))
+
+    def test_start_time_d_keeps_the_start_minutes(self):
+        self.assertEqual(
+            self.edit_meeting(time(9, 30)).start_time_d(), timedelta(hours=9, minutes=30)
+        )
+
+    def test_without_a_start_time(self):
+        self.assertEqual(self.edit_meeting(None).get_end_time(), time())
+        self.assertEqual(self.edit_meeting(None).start_time_d(), timedelta())
+
+
+class IntersectionGroupsTest(SimpleTestCase):
+    def groups(self, meetings: list[tuple[int, str | None, time | None, timedelta]]) -> list[list[int]]:
+        """Counters of the groups of (section, day, start, duration) meetings counted from 1"""
+        edit_meetings = [
+            EditMeeting(
+                start_time=start,
+                duration=duration,
+                day=day,
+                building=None,
+                room=None,
+                meeting=None,
+                section=Section(pk=section),
+                counter=counter,
+            )
+            for counter, (section, day, start, duration) in enumerate(meetings, start=1)
+        ]
+        groups = EditMeeting.get_intersection_groups(edit_meetings)
+        return [[meeting.counter for meeting in group] for group in groups]
+
+    def test_overlaps_and_sections_connect(self):
+        one = TimeBlock.ONE_BLOCK
+        meetings = [
+            (1, "MO", time(8), one),
+            (2, "MO", time(9), one),
+            # starts when the one before ends
+            (3, "MO", time(10, 15), one),
+            (4, "MO", time(12), one),
+            (4, "TU", time(8), one),
+            (5, "WE", None, one),
+            (6, "TU", time(8, 30), one),
+            (7, "TU", time(11), one),
+            # no time but the same section as the third one
+            (3, None, None, one),
+        ]
+        self.assertEqual(self.groups(meetings), [[1, 2, 3, 9], [4, 5, 7], [6], [8]])
+
+    def test_a_long_meeting_joins_the_ones_it_covers(self):
+        meetings = [
+            (1, "TH", time(8, 30), TimeBlock.ONE_BLOCK),
+            (2, "TH", time(10), TimeBlock.ONE_BLOCK),
+            (3, "TH", time(8), TimeBlock.DOUBLE_BLOCK),
+            (4, "TH", time(11, 30), TimeBlock.ONE_BLOCK),
+        ]
+        self.assertEqual(self.groups(meetings), [[1, 2, 3], [4]])
+        self.assertEqual(self.groups([]), [])
+
+
+class RecommenderTestCase(TestCase):
+    """The static data of loadgeneral and a department without allocations"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_all()
+        cls.professor = Professor.objects.create(first_name="Some", last_name="Professor")
+        department = Department.objects.create(name="Computer Science", code="CS")
+        cls.department = department
+        cls.subject = Subject.objects.create(code="CMPT", department=department)
+        cls.term = Term.objects.create(season=Term.FALL, year=2023)
+        cls.building = Building.objects.create(name="Test Hall", code="TT")
+        cls.room = Room.objects.create(
+            number="101", building=cls.building, capacity=20, classification=Room.LECTURE
+        )
+
+    def create_section(
+        self,
+        credits: int,
+        soft_cap: int = 0,
+        professor: Professor | None = None,
+        originals: int = 0,
+    ) -> Section:
+        """A section of a new course with meetings that do not have a time yet"""
+        code = str(100 + Course.objects.count())
+        course = Course.objects.create(
+            code=code, credits=credits, title=f"Course {code}", subject=self.subject
+        )
+        section = Section.objects.create(
+            banner_course=code,
+            number="111",
+            campus="Main",
+            soft_cap=soft_cap,
+            term=self.term,
+            course=course,
+            primary_professor=professor or self.professor,
+        )
+        for _ in range(originals):
+            Meeting.objects.create(section=section, professor=section.primary_professor)
+        return section
+
+    def meet(self, section: Section, placement: Placement, professor: Professor | None):
+        Meeting.objects.create(
+            section=section,
+            time_block=TimeBlock.objects.get(pk=placement.time_block),
+            professor=professor,
+        )
+
+    def recommender(
+        self,
+        section: Section,
+        edit_meetings: tuple[EditMeeting, ...] = (),
+        conflicting_courses: tuple[int, ...] = (),
+    ) -> MeetingRecommender:
+        recommender = MeetingRecommender.for_section(
+            list(edit_meetings), self.professor, section, conflicting_courses
+        )
+        recommender.building = self.building.pk
+        return recommender
+
+
+class PatternTableTest(SimpleTestCase):
+    def table(self) -> PatternTable:
+        """
+        Number 1 (8:00-9:15) and 2 (9:30-10:45) on MO and TH and the long night number
+        21 (18:30-21:15) on WE
+        """
+        rows = [
+            (1, "MO", time(8), time(9, 15)),
+            (1, "TH", time(8), time(9, 15)),
+            (2, "MO", time(9, 30), time(10, 45)),
+            (2, "TH", time(9, 30), time(10, 45)),
+            (21, "WE", time(18, 30), time(21, 15)),
+        ]
+        timetable = Timetable(
+            version="test",
+            official_time_blocks=[
+                OfficialTimeBlock(
+                    pk=pk,
+                    number=number,
+                    day=day,
+                    start_end_time=pk,
+                    start=start,
+                    end=end,
+                    allocation_groups=frozenset(),
+                )
+                for pk, (number, day, start, end) in enumerate(rows, start=1)
+            ],
+        )
+        return PatternTable.load(timetable)
+
+    def meetings(self, patterns: list[Pattern]) -> list[tuple[tuple[str, time], ...]]:
+        return [
+            tuple((p.day, minutes_to_time(p.start)) for p in pattern.placements)
+            for pattern in patterns
+        ]
+
+    def test_three_credit_patterns(self):
+        self.assertEqual(
+            self.meetings(self.table().for_credits(3)),
+            [
+                # DOUBLE_BLOCK_NIGHT
+                (("WE", time(18, 30)),),
+                # ONE_BLOCK pairs of the same number
+                (("MO", time(8)), ("TH", time(8))),
+                (("MO", time(9, 30)), ("TH", time(9, 30))),
+                # DOUBLE_BLOCK (8:00-10:45), it does not fit after 9:30
+                (("MO", time(8)),),
+                (("TH", time(8)),),
+            ],
+        )
+
+    def test_singles_do_not_pair(self):
+        # what is left of a section that already has a one block meeting
+        patterns = self.table().patterns_of((TimeBlock.ONE_BLOCK, TimeBlock.ONE_BLOCK), 1)
+        self.assertEqual(
+            self.meetings(patterns),
+            [
+                (("MO", time(8)), ("TH", time(8))),
+                (("MO", time(8)), ("TH", time(9, 30))),
+                (("MO", time(9, 30)), ("TH", time(8))),
+                (("MO", time(9, 30)), ("TH", time(9, 30))),
+            ],
+        )
+
+
+class MeetingRecommenderTest(RecommenderTestCase):
+    def assertFree(self, recommendations, placement: Placement):
+        self.assertTrue(recommendations)
+        for recommendation in recommendations:
+            for other in recommendation.placements:
+                self.assertFalse(
+                    other.overlaps(placement.day, placement.start, placement.end)
+                )
+
+    def test_patterns_are_legal_for_the_credits(self):
+        table = PatternTable.get()
+        for credits in Course.CREDIT_HOUR_POSSIBILITIES:
+            section = self.create_section(credits)
+            patterns = {pattern.placements for pattern in table.for_credits(credits)}
+            recommendations = self.recommender(section).recommend(k=10)
+            self.assertEqual(len(recommendations), 10)
+            for recommendation in recommendations:
+                self.assertIn(recommendation.placements, patterns)
+                self.assertEqual(recommendation.room, self.room.pk)
+
+    def test_complements_the_meetings_of_the_section(self):
+        section = self.create_section(credits=3)
+        edit_meeting = EditMeeting(
+            start_time=time(8),
+            duration=TimeBlock.ONE_BLOCK,
+            day="MO",
+            building=self.building,
+            room=self.room,
+            meeting=None,
+            section=section,
+            counter=1,
+        )
+        recommendation = self.recommender(section, (edit_meeting,)).recommend(k=1)[0]
+        (placement,) = recommendation.placements
+        self.assertEqual((placement.day, placement.start), ("TH", 8 * 60))
+        self.assertEqual(placement.duration, TimeBlock.ONE_BLOCK)
+        self.assertEqual(recommendation.room, self.room.pk)
+
+    def test_the_professor_is_busy(self):
+        section = self.create_section(credits=3)
+        best = self.recommender(section).recommend(k=1)[0].placements[0]
+        self.meet(self.create_section(credits=3), best, self.professor)
+        self.assertFree(self.recommender(section).recommend(k=20), best)
+
+    def test_conflicting_courses_are_busy(self):
+        section = self.create_section(credits=3)
+        best = self.recommender(section).recommend(k=1)[0].placements[0]
+        other = self.create_section(credits=3)
+        self.meet(other, best, professor=None)
+        # the room is free so only the conflict moves it
+        recommendation = self.recommender(section).recommend(k=1)[0]
+        self.assertIn(best, recommendation.placements)
+        recommendations = self.recommender(section, conflicting_courses=(other.course_id,))
+        self.assertFree(recommendations.recommend(k=20), best)
+
+    def test_small_rooms_only_when_nothing_holds_the_section(self):
+        section = self.create_section(credits=3, soft_cap=25)
+        recommendation = self.recommender(section).recommend(k=1)[0]
+        self.assertEqual(recommendation.room, self.room.pk)
+        self.assertEqual(recommendation.score[SCORE_COLUMNS.index(SMALL)], 1)
+
+        room = Room.objects.create(
+            number="102", building=self.building, capacity=30, classification=Room.LECTURE
+        )
+        recommendation = self.recommender(section).recommend(k=1)[0]
+        self.assertEqual(recommendation.room, room.pk)
+        self.assertEqual(recommendation.score[SCORE_COLUMNS.index(SMALL)], 0)
+
+        # the small room is not used while the room that holds the section is free elsewhere
+        best = recommendation.placements[0]
+        self.meet(self.create_section(credits=3), best, professor=None)
+        Meeting.objects.filter(time_block=best.time_block).update(room=room)
+        recommendations = self.recommender(section).recommend(k=10000, time_budget=60)
+        self.assertEqual({r.room for r in recommendations}, {room.pk})
+        self.assertFree(recommendations, best)
+
+    def test_any_building_when_nothing_fits(self):
+        section = self.create_section(credits=3)
+        recommender = self.recommender(section)
+        recommender.building = Building.objects.create(name="Empty", code="EM").pk
+        self.assertEqual(recommender.recommend(k=1), [])
+        self.assertEqual(len(recommender.recommend_anywhere(k=1)), 1)
+        self.assertIsNone(recommender.building)
+
+    def test_every_building_when_there_are_none(self):
+        Building.objects.all().delete()
+        section = self.create_section(credits=3)
+        recommender = MeetingRecommender.for_section([], self.professor, section, [])
+        self.assertIsNone(recommender.building)
+
+    def test_time_budget_keeps_the_best_so_far(self):
+        section = self.create_section(credits=4)
+        recommender = self.recommender(section)
+        with mock.patch("request.recommender.CHUNK_SIZE", 2):
+            # only the first chunk is scored
+            self.assertEqual(len(recommender.recommend(k=5, time_budget=0)), 2)
+            self.assertEqual(len(recommender.recommend(k=5, time_budget=60)), 5)
+
+
+class RecommendationBudgetTest(RecommenderTestCase):
+    def setUp(self):
+        # a four credit section that already meets on TH 9:25 (number 2) in the second of
+        #   two rooms that hold it
+        Room.objects.create(
+            number="100", building=self.building, capacity=40, classification=Room.LECTURE
+        )
+        self.room_102 = Room.objects.create(
+            number="102", building=self.building, capacity=40, classification=Room.LECTURE
+        )
+        self.section = self.create_section(credits=4, soft_cap=30)
+        self.edit_meeting = EditMeeting(
+            start_time=time(9, 25),
+            duration=TimeBlock.ONE_BLOCK,
+            day="TH",
+            building=self.building,
+            room=self.room_102,
+            meeting=None,
+            section=self.section,
+            counter=1,
+        )
+
+    def meetings(self, recommendation: Recommendation) -> list[tuple[str, time, timedelta]]:
+        return [
+            (p.day, minutes_to_time(p.start), p.duration) for p in recommendation.placements
+        ]
+
+    def test_complements_the_meeting_it_has(self):
+        recommender = self.recommender(self.section, (self.edit_meeting,))
+        recommendations = recommender.recommend(k=3, time_budget=60)
+        self.assertEqual(
+            [self.meetings(r) for r in recommendations],
+            [
+                [("MO", time(9, 30), TimeBlock.ONE_BLOCK), ("TU", time(8), TimeBlock.ONE_BLOCK)],
+                [
+                    ("MO", time(9, 30), TimeBlock.ONE_BLOCK),
+                    ("TU", time(9, 30), TimeBlock.ONE_BLOCK),
+                ],
+                [("MO", time(9, 30), TimeBlock.ONE_BLOCK), ("TU", time(11), TimeBlock.ONE_BLOCK)],
+            ],
+        )
+        # the room of the meeting is kept (not the first one that fits)
+        self.assertEqual({r.room for r in recommendations}, {self.room_102.pk})
+        self.assertEqual({r.score[SCORE_COLUMNS.index(UNMET)] for r in recommendations}, {0})
+
+    def test_time_budget_keeps_the_first_chunk(self):
+        recommender = self.recommender(self.section, (self.edit_meeting,))
+        with mock.patch("request.recommender.CHUNK_SIZE", 50):
+            recommendations = recommender.recommend(k=2, time_budget=0)
+        # only the night meetings (the first combination) are scored and they do not
+        #   complement TH 9:25
+        self.assertEqual(
+            [self.meetings(r) for r in recommendations],
+            [
+                [("MO", time(18, 30), TimeBlock.DOUBLE_BLOCK_NIGHT)],
+                [("TU", time(18, 30), TimeBlock.DOUBLE_BLOCK_NIGHT)],
+            ],
+        )
+        self.assertEqual({r.score[SCORE_COLUMNS.index(UNMET)] for r in recommendations}, {1})
+
+
+class AutoSchedulerTest(RecommenderTestCase):
+    def run_scheduler(self) -> AutoScheduler:
+        scheduler = AutoScheduler.for_department(self.term, self.department)
+        scheduler.run()
+        self.assertEqual(scheduler.unplaced, [])
+        return scheduler
+
+    def assertApart(self, edit_meetings: list[EditMeeting]):
+        for i, edit_meeting in enumerate(edit_meetings):
+            start = time_to_minutes(edit_meeting.start_time)  # pyright: ignore
+            end = start + time_to_minutes(edit_meeting.duration)
+            for other in edit_meetings[i + 1 :]:
+                other_start = time_to_minutes(other.start_time)  # pyright: ignore
+                other_end = other_start + time_to_minutes(other.duration)
+                self.assertFalse(
+                    edit_meeting.day == other.day and start < other_end and other_start < end
+                )
+
+    def test_no_professor_or_room_overlaps(self):
+        for _ in range(6):
+            self.create_section(credits=3, originals=2)
+        others = [
+            Professor.objects.create(first_name="Other", last_name=str(i)) for i in range(6)
+        ]
+        for professor in others:
+            self.create_section(credits=4, professor=professor, originals=1)
+        scheduler = self.run_scheduler()
+        self.assertEqual(len(scheduler.placed), 12)
+
+        edit_meetings = scheduler.edit_meetings()
+        by_professor: dict[int, list[EditMeeting]] = {}
+        by_room: dict[int, list[EditMeeting]] = {}
+        for edit_meeting in edit_meetings:
+            self.assertIsNotNone(edit_meeting.room)
+            by_professor.setdefault(edit_meeting.professor.pk, []).append(edit_meeting)  # pyright: ignore
+            by_room.setdefault(edit_meeting.room.pk, []).append(edit_meeting)  # pyright: ignore
+        self.assertEqual(len(by_professor[self.professor.pk]), 12)
+        for same in list(by_professor.values()) + list(by_room.values()):
+            self.assertApart(same)
+
+    def test_conflicting_courses(self):
+        first = self.create_section(credits=3, originals=2)
+        second = self.create_section(
+            credits=3,
+            professor=Professor.objects.create(first_name="Other", last_name="Professor"),
+            originals=2,
+        )
+        ConflictingCourseGroup.objects.create(
+            selected_course=first.course, dependant_course=second.course
+        )
+        scheduler = self.run_scheduler()
+        self.assertApart(scheduler.placed[first.pk] + scheduler.placed[second.pk])
+
+    def test_department_allocation(self):
+        # no general purpose rooms for the department, only the room of Test Hall
+        for group in AllocationGroup.objects.all():
+            DepartmentAllocation.objects.create(
+                department=self.department, allocation_group=group, number_of_classrooms=0
+            )
+        for i in range(4):
+            professor = Professor.objects.create(first_name="Other", last_name=str(i))
+            self.create_section(credits=3, professor=professor, originals=2)
+        scheduler = self.run_scheduler()
+        edit_meetings = scheduler.edit_meetings()
+        self.assertEqual(len(edit_meetings), 8)
+        for edit_meeting in edit_meetings:
+            self.assertEqual(edit_meeting.room, self.room)
+        self.assertApart(edit_meetings)
+
+    def test_rooms_hold_the_sections(self):
+        sections = [self.create_section(credits=3, soft_cap=60, originals=2) for _ in range(2)]
+        scheduler = self.run_scheduler()
+        for section in sections:
+            for edit_meeting in scheduler.placed[section.pk]:
+                self.assertGreaterEqual(edit_meeting.room.capacity, 60)  # pyright: ignore
+
+    def test_only_an_undersized_room_is_free(self):
+        # the general purpose rooms are taken by the allocations, the room of Test Hall seats 20
+        for group in AllocationGroup.objects.all():
+            DepartmentAllocation.objects.create(
+                department=self.department, allocation_group=group, number_of_classrooms=0
+            )
+        section = self.create_section(credits=3, soft_cap=40, originals=2)
+        scheduler = self.run_scheduler()
+        self.assertEqual([e.room for e in scheduler.placed[section.pk]], [self.room, self.room])
+
+        bundle = scheduler.save(self.professor)
+        assert bundle is not None
+        edit_section = bundle.edit_sections.get()
+        edit_meetings = [
+            edit_meeting.reformat(i)
+            for i, edit_meeting in enumerate(edit_section.edit_meetings.all(), start=1)
+        ]
+        [(_, problems)] = EditMeeting.get_bundle_problems({section: edit_meetings}, [section])
+        self.assertEqual(
+            [(problem.type, problem.text) for problem in problems],
+            [
+                (Problem.WARNING, f"Meeting {i} is in {self.room} that seats 20 for a cap of 40.")
+                for i in (1, 2)
+            ]
+            # the allocation check counts every meeting of the section
+            + [(Problem.WARNING, "The department allocation is exceeded for one or more of these meetings.")],
+        )
+
+    def test_realizing_replaces_the_originals(self):
+        # three originals for two meetings and one original for two meetings
+        extra = self.create_section(credits=3, originals=3)
+        missing = self.create_section(credits=3, originals=1)
+        extra_originals = set(extra.meetings.values_list("pk", flat=True))
+        missing_originals = set(missing.meetings.values_list("pk", flat=True))
+        scheduler = self.run_scheduler()
+        bundle = scheduler.save(self.professor)
+        assert bundle is not None
+        bundle.realize()
+
+        extra_meetings = extra.meetings.all()
+        self.assertEqual(len(extra_meetings), 2)
+        self.assertLess({meeting.pk for meeting in extra_meetings}, extra_originals)
+        missing_meetings = missing.meetings.all()
+        self.assertEqual(len(missing_meetings), 2)
+        self.assertLess(missing_originals, {meeting.pk for meeting in missing_meetings})
+        for meeting in list(extra_meetings) + list(missing_meetings):
+            self.assertIsNotNone(meeting.time_block)
+            self.assertIsNotNone(meeting.room)
+        self.assertEqual(AutoScheduler.for_department(self.term, self.department).sections, [])
+
+
+class OpenSlotsTest(RecommenderTestCase):
+    def setUp(self):
+        for group in AllocationGroup.objects.all():
+            DepartmentAllocation.objects.create(
+                department=self.department, allocation_group=group, number_of_classrooms=2
+            )
+        other = Professor.objects.create(first_name="Other", last_name="Professor")
+        self.conflicting = self.create_section(credits=3, professor=other)
+        self.excluded = self.create_section(credits=3)
+        section = self.create_section(credits=3)
+        off_time = TimeBlock.objects.create(
+            day="MO", start_end_time=StartEndTime.objects.create(start=time(12), end=time(14))
+        )
+        # (section, time block, room, professor) on monday
+        meetings = [
+            (section, self.monday(time(9, 30)), None, self.professor),
+            (section, off_time, None, self.professor),
+            (self.create_section(credits=3, professor=other), self.monday(time(14)), self.room, other),
+            (self.conflicting, self.monday(time(17)), None, other),
+            # not in the way since the section is being edited
+            (self.excluded, self.monday(time(8)), self.room, self.professor),
+        ]
+        self.meetings = [
+            Meeting.objects.create(section=s, time_block=t, room=r, professor=p)
+            for s, t, r, p in meetings
+        ]
+
+    def monday(self, start: time) -> TimeBlock:
+        return TimeBlock.objects.get(
+            day="MO", start_end_time__start=start, number__isnull=False
+        )
+
+    def open_mondays(self, duration: timedelta) -> list[tuple[time, int]]:
+        meetings, open_slots = EditMeeting.get_open_slots(
+            term=self.term,
+            building=None,
+            room=self.room,
+            department=self.department,
+            professor=self.professor,
+            sections_to_exclude={self.excluded},
+            duration=duration,
+            conflicting_courses={self.conflicting.course},
+        )
+        self.assertEqual(set(meetings), set(self.meetings[:4]))
+        return sorted(
+            (slot["start"], int(slot["numbers"][0])) for slot in open_slots if slot["day"] == "MO"
+        )
+
+    def test_one_block(self):
+        # 9:30, 11:00-14:00 (the meeting at 12:00-14:00 touches 14:00) and 17:00 are taken
+        self.assertEqual(
+            self.open_mondays(TimeBlock.ONE_BLOCK),
+            [(time(8), 1), (time(15, 30), 13), (time(18, 30), 17), (time(18, 30), 21), (time(20), 19)],
+        )
+
+    def test_longer_meetings_cannot_run_into_a_taken_block(self):
+        self.assertEqual(
+            self.open_mondays(TimeBlock.DOUBLE_BLOCK),
+            [(time(18, 30), 17), (time(18, 30), 21), (time(20), 19)],
+        )
+
+
+class CreateAllTest(RecommenderTestCase):
+    def setUp(self):
+        time_blocks = TimeBlock.objects.filter(number__isnull=False).order_by("pk")[:4]
+        self.meetings = [
+            Meeting.objects.create(
+                section=self.create_section(credits=3),
+                time_block=time_block,
+                room=self.room,
+                professor=self.professor,
+            )
+            for time_block in time_blocks
+        ]
+
+    def data(self, meetings: list[Meeting]) -> QueryDict:
+        """The rows the edit form posts for the meetings as they are"""
+        data = QueryDict(mutable=True)
+        for meeting in meetings:
+            data.update({
+                "isDeleted": "false",
+                "section": meeting.section_id,  # pyright: ignore
+                "startTime": "08:00",
+                "duration": "1:15",
+                "day": "MO",
+                "building": self.building.pk,
+                "room": self.room.pk,
+                "professor": self.professor.pk,
+                "counter": 1,
+                "original": meeting.pk,
+            })
+        return data
+
+    def test_one_query_per_model(self):
+        for count in (1, len(self.meetings)):
+            data = self.data(self.meetings[:count])
+            # sections, buildings, rooms, meetings and professors
+            with self.assertNumQueries(5):
+                edit_meetings, _ = EditMeeting.create_all(data)
+            self.assertEqual(len(edit_meetings), count)
+            with self.assertNumQueries(0):
+                for edit_meeting in edit_meetings:
+                    edit_meeting.meeting.time_block.start_end_time  # pyright: ignore
+                    edit_meeting.meeting.room.building  # pyright: ignore
+                    edit_meeting.room.building  # pyright: ignore
+                    edit_meeting.section.course.subject.department
+
+    def test_rows_seen_in_the_request_are_not_queried(self):
+        data = self.data(self.meetings)
+        with IdentityMap.scope():
+            EditMeeting.create_all(data)
+            with self.assertNumQueries(0):
+                edit_meetings, _ = EditMeeting.create_all(data)
+        self.assertEqual([e.meeting for e in edit_meetings], self.meetings)
+
+
+class BundleProblemsTest(RecommenderTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="head", password="password")
+        self.head = Professor.objects.create(first_name="Department", last_name="Head", user=self.user)
+        self.other = Professor.objects.create(first_name="Other", last_name="Professor")
+        self.general_room = Room.objects.create(
+            number="201", building=self.building, capacity=30, is_general_purpose=True
+        )
+        monday, wednesday = (
+            TimeBlock.objects.get(day=day, start_end_time__start=time(8), number__isnull=False)
+            for day in ("MO", "WE")
+        )
+        # the department can use one general purpose room on wednesday morning
+        DepartmentAllocation.objects.create(
+            department=self.department,
+            allocation_group=wednesday.allocation_groups.get(),
+            number_of_classrooms=1,
+        )
+        self.taken = self.create_section(credits=3)
+        Meeting.objects.create(section=self.taken, time_block=monday, room=self.room)
+        self.busy = self.create_section(credits=3)
+        Meeting.objects.create(
+            section=self.busy, time_block=wednesday, room=self.general_room, professor=self.other
+        )
+        self.first = self.create_section(credits=3)
+        self.second = self.create_section(credits=3)
+        # (section, day, room, professor) of the bundle, each meeting is 75 minutes at 8
+        self.bundle = [
+            (self.first, "MO", self.room, self.professor),
+            (self.first, "TH", self.general_room, self.professor),
+            (self.second, "TH", self.general_room, None),
+            (self.second, "WE", None, self.other),
+        ]
+        # loaded once for every request after this
+        TermOccupancy.get(self.term)
+        PatternTable.get()
+
+    def expected(self) -> tuple[list[tuple[str, str]], list[list[tuple[str, str]]]]:
+        group_problems = [
+            ("danger", "Meeting 2 from CMPT 102-111 overlaps Test Hall 201 with meeting 1 from CMPT 103-111."),
+        ]
+        section_problems = [
+            [("danger", "Meeting 1 overlaps Test Hall 101 with CMPT 100-111.")],
+            [
+                ("danger", "Meeting 2 overlaps with CMPT 101-111 that Other Professor also teaches."),
+                ("warning", "The department allocation is exceeded for one or more of these meetings."),
+            ],
+        ]
+        return group_problems, section_problems
+
+    def problems(self, response) -> tuple[list[tuple[str, str]], list[list[tuple[str, str]]]]:
+        self.assertEqual(response.status_code, 200)
+        group_problems = [(p.type, p.text) for p in response.context["group_problems"]]
+        section_problems = [
+            [(p.type, p.text) for p in problems]
+            for _, problems in response.context["section_problems"]
+        ]
+        return group_problems, section_problems
+
+    def test_soft_submit(self):
+        counters = {}
+        data = QueryDict(mutable=True)
+        for section, day, room, professor in self.bundle:
+            counters[section] = counters.get(section, 0) + 1
+            data.update({
+                "isDeleted": "false",
+                "section": section.pk,
+                "startTime": "08:00",
+                "duration": "1:15",
+                "day": day,
+                "building": self.building.pk,
+                "room": "any" if room is None else room.pk,
+                "professor": "None" if professor is None else professor.pk,
+                "counter": counters[section],
+                "original": "None",
+            })
+        self.client.force_login(self.user)
+        # the session and user, the rows of the bundle (a query per model), the snapshot
+        #   stamps, the names of the conflicting sections and the allocation usage
+        with self.assertNumQueries(9):
+            response = self.client.post(reverse("soft_submit"), data.urlencode(), content_type="application/x-www-form-urlencoded")
+        self.assertEqual(self.problems(response), self.expected())
+
+    def test_soft_approve(self):
+        bundle = EditRequestBundle.objects.create()
+        message_bundle = EditMeetingMessageBundleRequest.objects.create(requester=self.head, request=bundle)
+        edit_sections = {}
+        for section, day, room, professor in self.bundle:
+            if section not in edit_sections:
+                edit_sections[section] = EditSectionRequest.objects.create(section=section, bundle=bundle)
+            EditMeetingRequest.objects.create(
+                start_time=time(8),
+                duration=TimeBlock.ONE_BLOCK,
+                day=day,
+                is_deleted=False,
+                building=self.building,
+                room=room,
+                professor=professor,
+                edit_section=edit_sections[section],
+            )
+        self.client.force_login(self.user)
+        # the session and user, the savepoint of the view, the bundle, the professor of
+        #   the user, the sections and the meetings of the bundle, the snapshot stamps, the
+        #   names of the conflicting sections and the allocation usage
+        with self.assertNumQueries(11):
+            response = self.client.post(reverse("soft_approve"), {"messageBundle": message_bundle.pk})
+        self.assertEqual(self.problems(response), self.expected())
@@ -61,7 +61,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    "django_htmx.middleware.HtmxMiddleware"
+    "django_htmx.middleware.HtmxMiddleware",
+    "claim.identity_map.IdentityMapMiddleware",
 ]
 
 ROOT_URLCONF = 'scheduler.urls'
@@ -158,3 +159,7 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Seconds that the meeting recommender (request/recommender.py) scores patterns for
+#   before it returns the best ones it has found
+RECOMMENDATION_TIME_BUDGET = 0.5
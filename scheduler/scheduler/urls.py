@@ -98,7 +98,7 @@ urlpatterns = [
         name="get_course_search",
     ),
     path(
-        "get_course_results/<int:offset>",
+        "get_course_results",
         claim_partial_views.get_course_results,
         name="get_course_results",
     ),
@@ -141,7 +141,7 @@ urlpatterns = [
     path("generate_reports/", heads_page_views.generate_reports, name="generate_reports"),
     ## partial responses.
     path("dep_allo/", heads_partial_views.dep_allo, name="dep_allo"),
-    path("professor_search/<int:offset>", heads_partial_views.professor_search, name="professor_search"),
+    path("professor_search", heads_partial_views.professor_search, name="professor_search"),
     path("professor_display/<str:professor_pk>", heads_partial_views.professor_display, name="professor_display"),
     path("professor_live_search/", heads_partial_views.professor_live_search, name="professor_live_search"),
     path("get_head_sections/", heads_partial_views.get_head_sections, name="get_head_sections"),
@@ -150,4 +150,5 @@ urlpatterns = [
         heads_partial_views.dep_allo_sections,
         name="dep_allo_sections",
     ),
+    path("auto_schedule/", heads_partial_views.auto_schedule, name="auto_schedule"),
 ]